@@ -0,0 +1,199 @@
+# analysis.py
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .recorder import INDEX_FILE, open_columns
+from .storage import RunRow, get_run_snapshot, get_cached_analysis, put_cached_analysis
+
+# Bump when the algorithm or result shape changes; old cache rows are then ignored.
+ANALYSIS_VERSION = 3
+
+G_TO_N = 9.80665e-3
+
+# A reversal is the furthest point of a stroke, found once position has
+# retreated this fraction of the travel range from it (hysteresis against
+# sensor noise; livestats.py counts live cycles the same way).
+REVERSAL_HYSTERESIS = 0.2
+# stroke_bounds scans per-block min/max pairs rather than every sample
+REVERSAL_BLOCK = 64
+
+# Static friction = peak |force| in the first BREAKAWAY_FRACTION of a stroke;
+# kinetic friction = mean |force| over the middle KINETIC_WINDOW of a stroke.
+BREAKAWAY_FRACTION = 0.15
+KINETIC_WINDOW = (0.25, 0.75)
+
+
+def stroke_bounds(pos: np.ndarray) -> np.ndarray:
+    """
+    Return sample indices [b0, b1, ..., bn] so that stroke k spans
+    [b_k, b_{k+1}). Boundaries are position reversals, independent of the
+    sample rate.
+    """
+    n = len(pos)
+    if n < 3:
+        return np.array([0, n], dtype=np.int64)
+
+    p = np.asarray(pos, dtype=np.float64)
+    h = REVERSAL_HYSTERESIS * max(float(p.max() - p.min()), 1e-9)
+
+    # Every reversal is the min or max of its block, so scanning each block's
+    # min and max (in time order) finds the same reversals as scanning every
+    # sample, with 2/REVERSAL_BLOCK of the Python-level work.
+    nb = -(-n // REVERSAL_BLOCK)
+    blocks = np.pad(p, (0, nb * REVERSAL_BLOCK - n), mode="edge").reshape(nb, REVERSAL_BLOCK)
+    base = np.arange(nb) * REVERSAL_BLOCK
+    lo = base + blocks.argmin(axis=1)
+    hi = base + blocks.argmax(axis=1)
+    cand = np.minimum(np.column_stack([np.minimum(lo, hi), np.maximum(lo, hi)]).ravel(), n - 1)
+
+    turns = []
+    d = 0
+    ext_i = int(cand[0])
+    ext = float(p[ext_i])
+    for i, x in zip(cand.tolist(), p[cand].tolist()):
+        if d == 0:
+            # direction unknown until we've moved one hysteresis away from the start
+            if abs(x - ext) > h:
+                d = 1 if x > ext else -1
+                ext, ext_i = x, i
+        elif d > 0:
+            if x > ext:
+                ext, ext_i = x, i
+            elif ext - x > h:
+                turns.append(ext_i)
+                d, ext, ext_i = -1, x, i
+        else:
+            if x < ext:
+                ext, ext_i = x, i
+            elif x - ext > h:
+                turns.append(ext_i)
+                d, ext, ext_i = 1, x, i
+    return np.array([0] + turns + [n], dtype=np.int64)
+
+
+def _segment_mean(cs: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Mean over [a, b) per segment from a prefix-sum array cs (len n+1)."""
+    return (cs[b] - cs[a]) / np.maximum(b - a, 1)
+
+
+def _segment_max(x: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Max over [a, b) per segment (segments must be non-empty)."""
+    bounds = np.empty(2 * len(a), dtype=np.int64)
+    bounds[0::2] = a
+    bounds[1::2] = b
+    # b may be len(x); one extra element keeps that a valid reduceat index
+    # (only the [b, next a) reductions, which are discarded, touch it)
+    return np.maximum.reduceat(np.append(x, x[-1:]), bounds)[0::2]
+
+
+def analyze_samples(pos: np.ndarray, force: np.ndarray, clamp_force_g: float) -> Dict[str, Any]:
+    """
+    Split a run into stroke cycles (two strokes = one cycle) and compute,
+    per cycle: static/kinetic friction force, mean/peak/RMS |force| and the
+    static/kinetic coefficients of friction against the clamp normal force.
+    """
+    normal_n = float(clamp_force_g) * G_TO_N
+    f = np.abs(force.astype(np.float64))
+
+    bounds = stroke_bounds(pos)
+    a, b = bounds[:-1], bounds[1:]
+    keep = (b - a) >= 3
+    a, b = a[keep], b[keep]
+
+    n_cycles = len(a) // 2
+    if n_cycles == 0:
+        return {"version": ANALYSIS_VERSION, "cycles": 0, "normal_force_n": normal_n}
+
+    cs = np.concatenate(([0.0], np.cumsum(f)))
+    cs2 = np.concatenate(([0.0], np.cumsum(f * f)))
+    length = b - a
+
+    # per stroke
+    brk_end = a + np.maximum((length * BREAKAWAY_FRACTION).astype(np.int64), 1)
+    static = _segment_max(f, a, brk_end)
+    ka = a + (length * KINETIC_WINDOW[0]).astype(np.int64)
+    kb = np.maximum(a + (length * KINETIC_WINDOW[1]).astype(np.int64), ka + 1)
+    kinetic = _segment_mean(cs, ka, kb)
+
+    # per cycle (stroke pairs)
+    m = 2 * n_cycles
+    ca, cb = a[0:m:2], b[1:m:2]
+    static_c = np.maximum(static[0:m:2], static[1:m:2])
+    kinetic_c = (kinetic[0:m:2] + kinetic[1:m:2]) / 2
+    mean_c = _segment_mean(cs, ca, cb)
+    rms_c = np.sqrt(_segment_mean(cs2, ca, cb))
+    peak_c = _segment_max(f, ca, cb)
+
+    def _lst(x: np.ndarray):
+        return np.round(x, 6).tolist()
+
+    per_cycle: Dict[str, Any] = {
+        "static_n": _lst(static_c),
+        "kinetic_n": _lst(kinetic_c),
+        "mean_n": _lst(mean_c),
+        "peak_n": _lst(peak_c),
+        "rms_n": _lst(rms_c),
+    }
+    overall: Dict[str, Any] = {
+        "static_n": float(static_c.mean()),
+        "kinetic_n": float(kinetic_c.mean()),
+        "peak_n": float(peak_c.max()),
+        "rms_n": float(np.sqrt(np.mean(rms_c ** 2))),
+    }
+    if normal_n > 0:
+        per_cycle["cof_static"] = _lst(static_c / normal_n)
+        per_cycle["cof_kinetic"] = _lst(kinetic_c / normal_n)
+        overall["cof_static"] = overall["static_n"] / normal_n
+        overall["cof_kinetic"] = overall["kinetic_n"] / normal_n
+
+    return {
+        "version": ANALYSIS_VERSION,
+        "cycles": n_cycles,
+        "normal_force_n": normal_n,
+        "overall": overall,
+        "per_cycle": per_cycle,
+    }
+
+
+def data_hash(run_dir: Path, clamp_force_g: float) -> str:
+    """
+    Identify the analysed inputs cheaply: the sample index holds a CRC per
+    committed chunk, so hashing it covers the data without reading it.
+    """
+    h = hashlib.sha1()
+    idx = Path(run_dir) / INDEX_FILE
+    if idx.exists():
+        h.update(idx.read_bytes())
+    h.update(f"|{clamp_force_g}|{ANALYSIS_VERSION}".encode())
+    return h.hexdigest()
+
+
+def get_run_analysis(conn: sqlite3.Connection, run: RunRow, compute: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached analysis for a run, computing and caching it if the
+    run's data (or the analysis version) changed. None if there is no data,
+    or with compute=False, if there is no current cached analysis.
+    """
+    clamp = float(get_run_snapshot(run).get("clamp_force_g") or 0)
+    key = data_hash(Path(run.run_dir), clamp)
+
+    cached = get_cached_analysis(conn, run.id, key)
+    if cached is not None:
+        return json.loads(cached)
+    if not compute:
+        return None
+
+    cols = open_columns(Path(run.run_dir))
+    if len(cols["t"]) == 0:
+        return None
+
+    result = analyze_samples(cols["pos"], cols["force"], clamp)
+    put_cached_analysis(conn, run.id, key, json.dumps(result))
+    return result
@@ -1,20 +1,46 @@
 # api.py
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException
+import json
+import logging
+import sqlite3
+
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Iterator
+
+import numpy as np
 
 from .storage import (
-    connect, init_db,
-    list_protocols, get_protocol,
+    get_pool, close_pool, init_db,
+    list_protocols, get_protocol, cached_protocols, protocol_changes_since, transaction,
     create_protocol, update_protocol, delete_protocol,
     create_run, mark_run_status,
-    list_runs, get_run, delete_run, get_run_snapshot,
-    export_run_csv, write_export_file,
+    list_runs, get_run, delete_run, get_run_snapshot, run_protocol_name,
+    search_runs, search_protocols,
+    iter_run_csv, write_export_file,
+    get_job, list_jobs, fail_stale_jobs,
+    FINISHED_STATUSES,
     Protocol
 )
+from .recorder import get_recorder, close_recorder, sample_summary
+from .analysis import get_run_analysis
+from .livestats import LiveRunStats, get_live_stats, drop_live_stats
+from .livefeed import get_feed, attach_viewer, detach_viewer, close_feed
+from .lod import ensure_pyramid, query_series
+from .archive import iter_runs_zip
+from .compare import METRICS, compare_runs
+from .journal import STARTUP_BUDGET_S, forget_run, note_heartbeat, recover_orphaned_runs, start_sweeper, stop_sweeper
+from .jobs import PUBLIC_JOB_KINDS, get_runner, stop_runner, job_dict
+from .library import (
+    MAX_REPORTED_ERRORS, DuplicateProtocolsError, export_csv, export_document, import_protocols,
+    parse_document, validate_rows,
+)
+
 
+log = logging.getLogger(__name__)
 
 app = FastAPI(title="FrictionTester Backend")
 
@@ -50,9 +76,48 @@ class RunOut(BaseModel):
     finished_at: Optional[str] = None
     run_dir: str
     notes: Optional[str] = None
+    end_reason: Optional[str] = None
 
 class RunStatusIn(BaseModel):
-    status: str   # queued/running/completed/aborted/failed
+    status: str   # queued/running/completed/aborted/failed/interrupted
+    reason: Optional[str] = None   # why a run ended early, shown in history
+
+class SamplesIn(BaseModel):
+    samples: List[Tuple[float, float, float, float]]   # (t, pos, force, temp)
+
+class BulkExportIn(BaseModel):
+    # explicit ids, or else every run matching the filter
+    run_ids: Optional[List[int]] = None
+    status: Optional[str] = None
+    protocol_id: Optional[int] = None
+    started_from: Optional[str] = None
+    started_to: Optional[str] = None
+    per_run: bool = True          # runs/run_<id>/samples.csv
+    combined: bool = True         # samples.parquet (or samples.csv) with a run_id column
+
+class ProtocolBatchOp(BaseModel):
+    op: str                                 # create, update, delete
+    id: Optional[int] = None                # update, delete
+    protocol: Optional[ProtocolIn] = None   # create
+    fields: Optional[Dict[str, Any]] = None # update
+
+class ProtocolBatchIn(BaseModel):
+    operations: List[ProtocolBatchOp]
+
+class RunBatchOp(BaseModel):
+    op: str                                 # status, delete
+    id: int
+    status: Optional[str] = None            # status
+    reason: Optional[str] = None            # status
+
+class RunBatchIn(BaseModel):
+    operations: List[RunBatchOp]
+    delete_files: bool = False    # delete ops: remove the run folders from a background job
+
+class JobIn(BaseModel):
+    kind: str                     # see jobs.PUBLIC_JOB_KINDS
+    run_id: Optional[int] = None
+    params: Dict[str, Any] = {}
 
 
 # ---------- Startup ----------
@@ -60,173 +125,753 @@ class RunStatusIn(BaseModel):
 def health():
     return {"ok": True}
 
+def _configure_logging() -> None:
+    # under uvicorn stderr goes to logs/backend.log (run_pi.sh); an in-process
+    # backend gets its handler from main.py, so leave one already set alone
+    logger = logging.getLogger("backend")
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
 @app.on_event("startup")
 def _startup():
-    conn = connect()
-    init_db(conn)
-    conn.close()
+    _configure_logging()
+    with get_pool().connection() as conn:
+        applied = init_db(conn)
+        if applied:
+            log.info("Schema: applied migrations %s", ", ".join(applied))
+        fail_stale_jobs(conn)
+        for r in recover_orphaned_runs(conn, budget_s=STARTUP_BUDGET_S):
+            log.warning("Run journal: run %s %s: %s", r["id"], r["status"], r["reason"])
+    start_sweeper()
+
+@app.on_event("shutdown")
+def _shutdown():
+    stop_sweeper()
+    stop_runner()
+    close_pool()
+
+
+def get_db() -> Iterator[sqlite3.Connection]:
+    """Dependency: a pooled connection for the duration of one request."""
+    with get_pool().connection() as conn:
+        yield conn
 
 # ---------- Endpoints ----------
+# encoded GET /protocols body for one revision: (revision, bytes)
+_protocols_body: Optional[Tuple[int, bytes]] = None
+
+
+def _protocol_etag(revision: int) -> str:
+    return f'"protocols-{revision}"'
+
+
 @app.get("/protocols", response_model=List[ProtocolOut])
-def api_list_protocols():
-    conn = connect()
-    try:
-        items = list_protocols(conn)
-        return [ProtocolOut(**p.__dict__) for p in items]  # dataclass -> dict
-    finally:
-        conn.close()
+def api_list_protocols(if_none_match: Optional[str] = Header(None),
+                       conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Served from the protocol cache (storage.cached_protocols) with an ETag of
+    the list's revision; If-None-Match with the current one gets a 304.
+    """
+    global _protocols_body
+    revision, items = cached_protocols(conn)
+    etag = _protocol_etag(revision)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    cached = _protocols_body
+    if cached is None or cached[0] != revision:
+        body = json.dumps([ProtocolOut(**p.__dict__).model_dump() for p in items]).encode()  # dataclass -> dict
+        cached = _protocols_body = (revision, body)
+    return Response(content=cached[1], media_type="application/json", headers=headers)
+
+
+@app.get("/protocols/changes", response_model=Dict[str, Any])
+def api_protocol_changes(since: int = 0, conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Protocol list changes after revision `since` (from a previous call; 0 for
+    the first): {"revision", "reset", "protocols", "deleted"}. With reset the
+    client replaces its list with protocols; otherwise it updates or inserts
+    protocols and removes the ids in deleted.
+    """
+    changes = protocol_changes_since(conn, since)
+    changes["protocols"] = [ProtocolOut(**p.__dict__) for p in changes["protocols"]]
+    return changes
 
 @app.post("/protocols", response_model=Dict[str, int])
-def api_create_protocol(p: ProtocolIn):
-    conn = connect()
-    try:
-        pid = create_protocol(conn, Protocol(
-            id=None,
-            name=p.name,
-            speed=p.speed,
-            stroke_length_mm=p.stroke_length_mm,
-            clamp_force_g=p.clamp_force_g,
-            water_temp_c=p.water_temp_c,
-            cycles=p.cycles,
-            fixed_start_enabled=p.fixed_start_enabled,
-            fixed_start_mm=p.fixed_start_mm,
-        ))
-        return {"id": pid}
-    finally:
-        conn.close()
+def api_create_protocol(p: ProtocolIn, conn: sqlite3.Connection = Depends(get_db)):
+    pid = create_protocol(conn, Protocol(
+        id=None,
+        name=p.name,
+        speed=p.speed,
+        stroke_length_mm=p.stroke_length_mm,
+        clamp_force_g=p.clamp_force_g,
+        water_temp_c=p.water_temp_c,
+        cycles=p.cycles,
+        fixed_start_enabled=p.fixed_start_enabled,
+        fixed_start_mm=p.fixed_start_mm,
+    ))
+    return {"id": pid}
 
 @app.put("/protocols/{protocol_id}")
-def api_update_protocol(protocol_id: int, fields: Dict[str, Any]):
-    conn = connect()
-    try:
-        if not get_protocol(conn, protocol_id):
-            raise HTTPException(status_code=404, detail="Protocol not found")
-        update_protocol(conn, protocol_id, fields)
-        return {"ok": True}
-    finally:
-        conn.close()
+def api_update_protocol(protocol_id: int, fields: Dict[str, Any], conn: sqlite3.Connection = Depends(get_db)):
+    if not get_protocol(conn, protocol_id):
+        raise HTTPException(status_code=404, detail="Protocol not found")
+    update_protocol(conn, protocol_id, fields)
+    return {"ok": True}
 
 @app.delete("/protocols/{protocol_id}")
-def api_delete_protocol(protocol_id: int):
-    conn = connect()
+def api_delete_protocol(protocol_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    if not get_protocol(conn, protocol_id):
+        raise HTTPException(status_code=404, detail="Protocol not found")
+    delete_protocol(conn, protocol_id)
+    return {"ok": True}
+
+@app.get("/protocols/export")
+def api_export_protocols(fmt: str = "json", conn: sqlite3.Connection = Depends(get_db)):
+    """The whole protocol library as one JSON or CSV document (see library.py)."""
+    protocols = list_protocols(conn)
+    if fmt == "json":
+        content, media_type = json.dumps(export_document(protocols), indent=2).encode(), "application/json"
+    elif fmt == "csv":
+        content, media_type = export_csv(protocols).encode(), "text/csv"
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    return Response(content=content, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="protocols.{fmt}"'})
+
+
+@app.post("/protocols/import", response_model=Dict[str, Any])
+def api_import_protocols(
+    document: bytes = Body(..., media_type="application/octet-stream"),
+    fmt: Optional[str] = None,
+    mode: str = "skip",
+    skip_invalid: bool = False,
+    dry_run: bool = False,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Import a document from /protocols/export (the request body; fmt is
+    json or csv, guessed from the content when omitted). All rows are
+    validated first: invalid rows reject the import (422) unless
+    skip_invalid. mode skip|update|error decides what happens to duplicates
+    by name or parameters (see library.py); with dry_run nothing is written.
+    """
+    if fmt is None:
+        fmt = "json" if document.lstrip()[:1] in (b"{", b"[") else "csv"
     try:
-        if not get_protocol(conn, protocol_id):
-            raise HTTPException(status_code=404, detail="Protocol not found")
-        delete_protocol(conn, protocol_id)
-        return {"ok": True}
-    finally:
-        conn.close()
+        rows = parse_document(document, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    valid, invalid = validate_rows(rows, ProtocolIn)
+    if invalid and not skip_invalid:
+        raise HTTPException(status_code=422, detail={
+            "detail": f"{len(invalid)} invalid row(s)",
+            "invalid": invalid[:MAX_REPORTED_ERRORS],
+        })
+    try:
+        result = import_protocols(conn, valid, mode=mode, dry_run=dry_run)
+    except DuplicateProtocolsError as e:
+        raise HTTPException(status_code=409, detail={"detail": str(e), "duplicates": e.duplicates})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["rows"] = len(rows)
+    result["invalid"] = invalid[:MAX_REPORTED_ERRORS]
+    result["invalid_count"] = len(invalid)
+    return result
+
+
+# Batches run in one transaction (one commit, one fsync) and are all or
+# nothing: the first failing operation rolls back the batch, and the error
+# detail names it by index.
+BATCH_MAX_OPS = 5000
+
+
+def _batch_error(index: int, op: str, status_code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail={"index": index, "op": op, "detail": detail})
+
+
+def _check_batch_size(ops: List[Any]) -> None:
+    if len(ops) > BATCH_MAX_OPS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_OPS} operations per batch")
+
+
+@app.post("/protocols:batch", response_model=Dict[str, Any])
+def api_protocols_batch(req: ProtocolBatchIn, conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Create, update and delete protocols in one transaction. Returns one
+    result per operation, in order (created ids for creates).
+    """
+    _check_batch_size(req.operations)
+    results = []
+    with transaction(conn):
+        for i, o in enumerate(req.operations):
+            if o.op == "create":
+                if o.protocol is None:
+                    raise _batch_error(i, o.op, 400, "create needs protocol")
+                p = o.protocol
+                pid = create_protocol(conn, Protocol(id=None, **p.model_dump()), commit=False)
+                results.append({"op": o.op, "id": pid})
+            elif o.op in ("update", "delete"):
+                if o.id is None or not get_protocol(conn, o.id):
+                    raise _batch_error(i, o.op, 404, "Protocol not found")
+                try:
+                    if o.op == "update":
+                        update_protocol(conn, o.id, o.fields or {}, commit=False)
+                    else:
+                        delete_protocol(conn, o.id, commit=False)
+                except ValueError as e:
+                    raise _batch_error(i, o.op, 400, str(e))
+                except sqlite3.IntegrityError:
+                    raise _batch_error(i, o.op, 409, "Protocol is used by runs")
+                results.append({"op": o.op, "id": o.id})
+            else:
+                raise _batch_error(i, o.op, 400, f"Unknown operation: {o.op}")
+    return {"results": results}
+
 
 @app.post("/runs", response_model=RunCreateOut)
-def api_create_run(req: RunCreateIn):
-    conn = connect()
-    try:
-        p = get_protocol(conn, req.protocol_id)
-        if not p:
-            raise HTTPException(status_code=404, detail="Protocol not found")
-        run_id = create_run(conn, p, notes=req.notes)
-        return RunCreateOut(run_id=run_id)
-    finally:
-        conn.close()
+def api_create_run(req: RunCreateIn, conn: sqlite3.Connection = Depends(get_db)):
+    p = get_protocol(conn, req.protocol_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Protocol not found")
+    run_id = create_run(conn, p, notes=req.notes)
+    return RunCreateOut(run_id=run_id)
 
 @app.get("/runs", response_model=List[RunOut])
-def api_list_runs():
-    conn = connect()
-    try:
-        items = list_runs(conn)
-        out: List[RunOut] = []
-        for r in items:
-            snap = get_run_snapshot(r)
-            out.append(RunOut(
+def api_list_runs(
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    protocol_id: Optional[int] = None,
+    started_from: Optional[str] = None,
+    started_to: Optional[str] = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Newest first, one page at a time. For the next page pass the last id
+    seen as before_id; a short page means there are no more.
+    status may be a comma-separated list (e.g. completed,aborted).
+    """
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+    items = list_runs(
+        conn,
+        before_id=before_id,
+        limit=limit,
+        statuses=statuses,
+        protocol_id=protocol_id,
+        started_from=started_from,
+        started_to=started_to,
+    )
+    return [
+        RunOut(
+            id=r.id,
+            protocol_id=r.protocol_id,
+            protocol_name=run_protocol_name(r),
+            status=r.status,
+            started_at=r.started_at,
+            finished_at=r.finished_at,
+            run_dir=r.run_dir,
+            notes=r.notes,
+            end_reason=r.end_reason,
+        )
+        for r in items
+    ]
+
+
+@app.get("/search", response_model=Dict[str, Any])
+def api_search(
+    q: Optional[str] = None,
+    kind: str = Query("runs", pattern="^(runs|protocols)$"),
+    status: Optional[str] = None,
+    speed_min: Optional[float] = None,
+    speed_max: Optional[float] = None,
+    stroke_length_mm_min: Optional[float] = None,
+    stroke_length_mm_max: Optional[float] = None,
+    clamp_force_g_min: Optional[float] = None,
+    clamp_force_g_max: Optional[float] = None,
+    water_temp_c_min: Optional[float] = None,
+    water_temp_c_max: Optional[float] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Ranked search. q matches run notes/protocol names (kind=runs) or protocol
+    names (kind=protocols) by word prefix; *_min/*_max filter on protocol
+    parameters (for runs: the snapshot taken when the run was created).
+    Pass next_offset back as offset for the next page.
+    """
+    ranges = {
+        "speed": (speed_min, speed_max),
+        "stroke_length_mm": (stroke_length_mm_min, stroke_length_mm_max),
+        "clamp_force_g": (clamp_force_g_min, clamp_force_g_max),
+        "water_temp_c": (water_temp_c_min, water_temp_c_max),
+    }
+    ranges = {k: v for k, v in ranges.items() if v != (None, None)}
+
+    items: List[Dict[str, Any]] = []
+    if kind == "protocols":
+        for p, score in search_protocols(conn, q, ranges, limit=limit, offset=offset):
+            d = ProtocolOut(**p.__dict__).model_dump()
+            d["score"] = score
+            items.append(d)
+    else:
+        statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+        for r, score in search_runs(conn, q, ranges, statuses, limit=limit, offset=offset):
+            d = RunOut(
                 id=r.id,
                 protocol_id=r.protocol_id,
-                protocol_name=snap.get("name", f"Protocol {r.protocol_id}"),
+                protocol_name=run_protocol_name(r),
                 status=r.status,
                 started_at=r.started_at,
                 finished_at=r.finished_at,
                 run_dir=r.run_dir,
                 notes=r.notes,
-            ))
-        return out
-    finally:
-        conn.close()
+                end_reason=r.end_reason,
+            ).model_dump()
+            d["score"] = score
+            items.append(d)
+
+    return {
+        "kind": kind,
+        "items": items,
+        "next_offset": offset + limit if len(items) == limit else None,
+    }
 
 
 @app.get("/runs/{run_id}", response_model=Dict[str, Any])
-def api_get_run(run_id: int):
-    conn = connect()
-    try:
-        r = get_run(conn, run_id)
-        if not r:
-            raise HTTPException(status_code=404, detail="Run not found")
-
-        snap = get_run_snapshot(r)
-        return {
-            "run": {
-                "id": r.id,
-                "protocol_id": r.protocol_id,
-                "protocol_name": snap.get("name", f"Protocol {r.protocol_id}"),
-                "status": r.status,
-                "started_at": r.started_at,
-                "finished_at": r.finished_at,
-                "run_dir": r.run_dir,
-                "notes": r.notes,
-            },
-            "protocol_snapshot": snap,
-            # Later: include result summary, stats, etc.
-        }
-    finally:
-        conn.close()
+def api_get_run(run_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    r = get_run(conn, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    snap = get_run_snapshot(r)
+    return {
+        "run": {
+            "id": r.id,
+            "protocol_id": r.protocol_id,
+            "protocol_name": snap.get("name", f"Protocol {r.protocol_id}"),
+            "status": r.status,
+            "started_at": r.started_at,
+            "finished_at": r.finished_at,
+            "run_dir": r.run_dir,
+            "notes": r.notes,
+            "heartbeat_at": r.heartbeat_at,
+            "end_reason": r.end_reason,
+        },
+        "protocol_snapshot": snap,
+        "samples": sample_summary(r.run_dir),
+        # a recording run's data changes with every chunk; it is analysed once
+        # finished (live figures: /runs/{id}/live/stats)
+        "analysis": get_run_analysis(conn, r) if r.status in FINISHED_STATUSES else None,
+    }
 
 
 @app.put("/runs/{run_id}/status")
-def api_set_run_status(run_id: int, req: RunStatusIn):
-    conn = connect()
+def api_set_run_status(run_id: int, req: RunStatusIn, conn: sqlite3.Connection = Depends(get_db)):
+    r = get_run(conn, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+
     try:
-        r = get_run(conn, run_id)
-        if not r:
-            raise HTTPException(status_code=404, detail="Run not found")
+        mark_run_status(conn, run_id, req.status, reason=req.reason)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _after_status_change(run_id, req.status, r.run_dir)
+    return {"ok": True}
 
-        mark_run_status(conn, run_id, req.status)
-        return {"ok": True}
-    finally:
-        conn.close()
 
+def _after_status_change(run_id: int, status: str, run_dir: str) -> None:
+    """Finish recording and close the live feed of a finished run, or tell viewers."""
+    if status in FINISHED_STATUSES:
+        forget_run(run_id)
+        _finish_recording(run_id, run_dir)
+        drop_live_stats(run_id)
+        close_feed(run_id, status)
+    else:
+        feed = get_feed(run_id, create=False)
+        if feed is not None:
+            feed.publish_status(status)
 
-@app.delete("/runs/{run_id}")
-def api_delete_run(run_id: int, delete_files: bool = False):
-    conn = connect()
-    try:
-        r = get_run(conn, run_id)
-        if not r:
-            raise HTTPException(status_code=404, detail="Run not found")
 
-        delete_run(conn, run_id, delete_files=delete_files)
-        return {"ok": True}
+def _finish_recording(run_id: int, run_dir: str) -> None:
+    """Commit and close the run's recorder, then extend its plotting pyramid to the last sample."""
+    close_recorder(run_id)
+    ensure_pyramid(run_dir)
+
+
+LIVE_KEEPALIVE_S = 15.0
+
+
+@app.websocket("/runs/{run_id}/live")
+async def ws_run_live(ws: WebSocket, run_id: int):
+    """
+    Push decimated telemetry and status transitions for a run.
+
+    Messages are JSON objects: one {"type": "hello"} on connect, then
+    {"type": "frames", "gap": bool, "frames": [...]} batches of telemetry/status
+    frames, or {"type": "ping"} when idle. All viewers of a run share one
+    fan-out buffer (see livefeed.py); the socket closes after a terminal status.
+    """
+    def _lookup():
+        with get_pool().connection() as conn:
+            return get_run(conn, run_id)
+
+    r = await run_in_threadpool(_lookup)
+    if not r:
+        await ws.close(code=4404)
+        return
+
+    await ws.accept()
+    if r.status in FINISHED_STATUSES:
+        # nothing more will be published for it
+        await ws.send_text(json.dumps({"type": "hello", "run_id": run_id, "status": r.status}))
+        await ws.close()
+        return
+
+    feed = attach_viewer(run_id)
+    try:
+        seq = feed.seq
+        if not feed.closed:
+            # the run may have finished (and its feed been closed) between the
+            # lookup and attaching; then this new feed would never be closed
+            r = await run_in_threadpool(_lookup)
+            if r is None or r.status in FINISHED_STATUSES:
+                status = r.status if r is not None else "deleted"
+                await ws.send_text(json.dumps({"type": "hello", "run_id": run_id, "status": status}))
+                await ws.close()
+                return
+        hello: Dict[str, Any] = {"type": "hello", "run_id": run_id, "status": feed.last_status or r.status}
+        stats = get_live_stats(run_id)
+        if stats is not None:
+            hello["stats"] = stats.snapshot()
+        await ws.send_text(json.dumps(hello))
+
+        while True:
+            frames, seq, gap = await feed.wait_after(seq, LIVE_KEEPALIVE_S)
+            if frames:
+                # frames are already encoded; splice them instead of re-encoding per viewer
+                await ws.send_text(
+                    '{"type":"frames","gap":%s,"frames":[%s]}' % ("true" if gap else "false", ",".join(frames))
+                )
+            else:
+                await ws.send_text('{"type":"ping"}')
+            if feed.closed and seq >= feed.seq:
+                await ws.close()
+                break
+    except WebSocketDisconnect:
+        pass
     finally:
-        conn.close()
+        detach_viewer(feed)
 
 
-@app.get("/runs/{run_id}/export")
-def api_export_run(run_id: int, fmt: str = "csv", mode: str = "content"):
+@app.get("/runs/{run_id}/live/stats", response_model=Dict[str, Any])
+def api_live_stats(run_id: int, conn: sqlite3.Connection = Depends(get_db)):
     """
-    mode=content -> return the export content (CSV text)
-    mode=file    -> write export into run_dir and return its path
+    Incrementally maintained stats for a recording run (cheap to poll).
+    Runs that aren't recording report zeroed stats.
+    """
+    stats = get_live_stats(run_id)
+    if stats is not None:
+        return stats.snapshot()
+
+    r = get_run(conn, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+    snap = get_run_snapshot(r)
+    return LiveRunStats(
+        snap.get("clamp_force_g") or 0, snap.get("stroke_length_mm") or 0, snap.get("cycles") or 0
+    ).snapshot()
+
+
+@app.get("/runs/{run_id}/series", response_model=Dict[str, Any])
+def api_run_series(
+    run_id: int,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    max_points: int = Query(2000, ge=10, le=20000),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Plot-ready min/max envelope of the run between start and end (seconds),
+    at most max_points buckets, served from the run's LOD pyramid.
+    level is "raw" when the window holds few enough samples to return as-is.
+    """
+    r = get_run(conn, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return query_series(r.run_dir, start, end, max_points)
+
+
+@app.post("/runs/{run_id}/samples")
+def api_append_samples(run_id: int, req: SamplesIn, final: bool = False,
+                        conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Append a batch of stream samples to the run's recorder.
+    final=true commits and closes the recorder after this batch.
     """
-    conn = connect()
+    r = get_run(conn, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    if r.status == "running":
+        note_heartbeat(conn, run_id)
+    rows = np.asarray(req.samples, dtype=np.float64).reshape(-1, 4)
+    if not len(rows) and not final:
+        return {"ok": True, "count": 0}     # heartbeat only
+
+    rec = get_recorder(run_id, r.run_dir)
     try:
-        if not get_run(conn, run_id):
-            raise HTTPException(status_code=404, detail="Run not found")
+        n = rec.append(rows)
+    except ValueError:
+        # closed by a concurrent status change; reopen and append after it
+        n = get_recorder(run_id, r.run_dir).append(rows)
 
-        if fmt.lower() != "csv":
-            raise HTTPException(status_code=400, detail="Only csv supported for now")
+    stats = get_live_stats(run_id, get_run_snapshot(r) if r.status == "running" else None)
+    if stats is not None:
+        stats.add(rows)
 
-        if mode == "file":
-            path = write_export_file(conn, run_id, fmt="csv")
-            return {"format": "csv", "path": path}
+    # only runs someone is watching pay for decimation/encoding
+    feed = get_feed(run_id, create=False)
+    if feed is not None:
+        feed.publish_samples(rows, {"samples": stats.samples, "cycles": stats.cycles} if stats else None)
 
-        content = export_run_csv(conn, run_id)
-        return {"format": "csv", "content": content}
-    finally:
-        conn.close()
+    # late batches for a finished run are committed right away
+    if final or r.status in FINISHED_STATUSES:
+        _finish_recording(run_id, r.run_dir)
+    return {"ok": True, "count": n}
 
+
+@app.delete("/runs/{run_id}")
+def api_delete_run(run_id: int, delete_files: bool = False, conn: sqlite3.Connection = Depends(get_db)):
+    r = get_run(conn, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    delete_run(conn, run_id, delete_files=delete_files)
+    close_recorder(run_id)
+    drop_live_stats(run_id)
+    return {"ok": True}
+
+
+@app.post("/runs:batch", response_model=Dict[str, Any])
+def api_runs_batch(req: RunBatchIn, conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Change the status of and delete runs in one transaction. With
+    delete_files, the folders of deleted runs are removed afterwards by a
+    background job (job_id in the response; poll /jobs/{job_id}).
+    """
+    _check_batch_size(req.operations)
+    results = []
+    finished, deleted, dirs = [], [], []
+    with transaction(conn):
+        for i, o in enumerate(req.operations):
+            r = get_run(conn, o.id)
+            if not r:
+                raise _batch_error(i, o.op, 404, "Run not found")
+            if o.op == "status":
+                try:
+                    mark_run_status(conn, o.id, o.status or "", reason=o.reason, commit=False)
+                except ValueError as e:
+                    raise _batch_error(i, o.op, 400, str(e))
+                finished.append((o.id, o.status, r.run_dir))
+            elif o.op == "delete":
+                dirs.append(delete_run(conn, o.id, commit=False))
+                deleted.append(o.id)
+            else:
+                raise _batch_error(i, o.op, 400, f"Unknown operation: {o.op}")
+            results.append({"op": o.op, "id": o.id})
+
+    # the same follow-up as the single-run endpoints, once committed
+    for run_id, status, run_dir in finished:
+        _after_status_change(run_id, status, run_dir)
+    for run_id in deleted:
+        close_recorder(run_id)
+        drop_live_stats(run_id)
+
+    job_id = None
+    if req.delete_files and dirs:
+        job_id = get_runner().submit(conn, "delete_run_dirs", None, {"dirs": dirs})
+    return {"results": results, "job_id": job_id}
+
+
+@app.get("/runs/{run_id}/export")
+def api_export_run(run_id: int, fmt: str = "csv", mode: str = "content",
+                   conn: sqlite3.Connection = Depends(get_db)):
+    """
+    mode=content -> stream the export as text/csv (constant memory)
+    mode=file    -> write export into run_dir and return its path
+    mode=job     -> write it from a background job; poll /jobs/{job_id}
+    """
+    if not get_run(conn, run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    if fmt.lower() != "csv":
+        raise HTTPException(status_code=400, detail="Only csv supported for now")
+
+    if mode == "job":
+        return {"job_id": get_runner().submit(conn, "export_csv", run_id)}
+
+    if mode == "file":
+        path = write_export_file(conn, run_id, fmt="csv")
+        return {"format": "csv", "path": path}
+
+    return StreamingResponse(
+        iter_run_csv(conn, run_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="run_{run_id}.csv"'},
+    )
+
+
+def _select_runs(conn: sqlite3.Connection, req: BulkExportIn) -> List[Any]:
+    if req.run_ids:
+        ids = list(dict.fromkeys(req.run_ids))
+        runs = [get_run(conn, run_id) for run_id in ids]
+        missing = [run_id for run_id, r in zip(ids, runs) if r is None]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Runs not found: {missing}")
+    else:
+        statuses = [s.strip() for s in req.status.split(",") if s.strip()] if req.status else None
+        runs = list_runs(conn, statuses=statuses, protocol_id=req.protocol_id,
+                         started_from=req.started_from, started_to=req.started_to)
+        runs.sort(key=lambda r: r.id)
+    if not runs:
+        raise HTTPException(status_code=404, detail="No runs selected")
+    return runs
+
+
+@app.post("/runs/export")
+def api_export_runs(req: BulkExportIn, mode: str = "content", conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Several runs as one zip (see archive.py for the layout).
+    mode=content -> stream the zip (constant memory, whatever the selection)
+    mode=job     -> write it under <data>/exports from a background job
+    """
+    runs = _select_runs(conn, req)
+    if not (req.per_run or req.combined):
+        raise HTTPException(status_code=400, detail="Nothing to export")
+
+    if mode == "job":
+        params = {"run_ids": [r.id for r in runs], "per_run": req.per_run, "combined": req.combined}
+        return {"job_id": get_runner().submit(conn, "export_bulk", None, params)}
+
+    return StreamingResponse(
+        iter_runs_zip(runs, per_run=req.per_run, combined=req.combined),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="runs_{runs[0].id}-{runs[-1].id}.zip"'},
+    )
+
+
+# ---------- Cross-run analysis ----------
+@app.get("/analysis/compare", response_model=Dict[str, Any])
+def api_compare_runs(
+    run_ids: str,
+    metric: str = "kinetic_n",
+    max_points: int = Query(500, ge=10, le=10000),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Per-cycle `metric` of the given runs (comma-separated ids) lined up by
+    cycle number: envelope, drift and outlier runs (see compare.py).
+    202 while some runs are still being analysed (see _comparison_response).
+    """
+    try:
+        ids = list(dict.fromkeys(int(x) for x in run_ids.split(",") if x.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="run_ids must be comma-separated integers")
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    runs = [get_run(conn, run_id) for run_id in ids]
+    missing = [run_id for run_id, r in zip(ids, runs) if r is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Runs not found: {missing}")
+    if not runs:
+        raise HTTPException(status_code=400, detail="No runs selected")
+    return _comparison_response(conn, compare_runs(conn, runs, metric=metric, max_points=max_points))
+
+
+@app.get("/protocols/{protocol_id}/aggregate", response_model=Dict[str, Any])
+def api_protocol_aggregate(
+    protocol_id: int,
+    metric: str = "kinetic_n",
+    status: str = "completed",
+    limit: int = Query(50, ge=1, le=500),
+    max_points: int = Query(500, ge=10, le=10000),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    The same comparison over the protocol's most recent `limit` runs
+    (status may be a comma-separated list). Runs keep the parameters of
+    their snapshot; params_differ shows where those diverge.
+    """
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    if not get_protocol(conn, protocol_id):
+        raise HTTPException(status_code=404, detail="Protocol not found")
+    statuses = [s.strip() for s in status.split(",") if s.strip()] or None
+    runs = list_runs(conn, limit=limit, statuses=statuses, protocol_id=protocol_id)
+    runs.sort(key=lambda r: r.id)
+    result = dict(compare_runs(conn, runs, metric=metric, max_points=max_points), protocol_id=protocol_id)
+    return _comparison_response(conn, result)
+
+
+def _comparison_response(conn: sqlite3.Connection, result: Dict[str, Any]):
+    """
+    A comparison with runs whose analysis is not cached yet queues an
+    analysis job for each (unless one is already queued or running) and is
+    answered with 202 and analysis_jobs {run_id: job_id}; repeat the request
+    once those jobs have completed.
+    """
+    if not result["pending"]:
+        return result
+    active = {j.run_id: j.id for j in list_jobs(conn, limit=500, active_only=True) if j.kind == "analysis"}
+    result["analysis_jobs"] = {
+        run_id: active.get(run_id) or get_runner().submit(conn, "analysis", run_id)
+        for run_id in result["pending"]
+    }
+    return Response(content=json.dumps(result), status_code=202, media_type="application/json")
+
+
+# ---------- Background jobs ----------
+@app.post("/jobs", response_model=Dict[str, int])
+def api_create_job(req: JobIn, conn: sqlite3.Connection = Depends(get_db)):
+    if req.kind not in PUBLIC_JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {req.kind}")
+    if req.run_id is None:
+        raise HTTPException(status_code=400, detail=f"{req.kind} needs a run_id")
+    if not get_run(conn, req.run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"job_id": get_runner().submit(conn, req.kind, req.run_id, req.params)}
+
+
+@app.get("/jobs", response_model=List[Dict[str, Any]])
+def api_list_jobs(active: bool = False, limit: int = Query(50, ge=1, le=500),
+                  conn: sqlite3.Connection = Depends(get_db)):
+    return [job_dict(j) for j in list_jobs(conn, limit=limit, active_only=active)]
+
+
+@app.get("/jobs/{job_id}", response_model=Dict[str, Any])
+def api_get_job(job_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    """Status, progress (0..1) and, once completed, the job's result."""
+    job = get_job(conn, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_dict(job)
+
+
+@app.post("/jobs/{job_id}/cancel")
+def api_cancel_job(job_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Queued jobs are cancelled at once; running ones move to 'cancelling'
+    and stop at their next progress update.
+    """
+    status = get_runner().cancel(conn, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": status}
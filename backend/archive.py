@@ -0,0 +1,203 @@
+# archive.py
+from __future__ import annotations
+
+import io
+import json
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .recorder import DEFAULT_CHANNELS, committed_count, iter_column_blocks
+from .storage import CSV_COLUMNS, RunRow, iter_csv_blocks, get_run_snapshot, run_protocol_name
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # Parquet is optional; the archive then carries a combined CSV
+    pa = None
+    pq = None
+
+# -------------------------
+# Bulk (multi-run) export
+# -------------------------
+#
+# One zip holding, for every selected run:
+#
+#   manifest.json              run metadata and protocol snapshots, keyed by run id
+#   runs/run_<id>/samples.csv  the same CSV as /runs/{id}/export
+#
+# plus every run's samples in one table with a leading run_id column:
+#   samples.parquet            when pyarrow is installed (snapshots in the schema metadata)
+#   samples.csv                otherwise
+#
+# The zip is produced incrementally: entries are written through a
+# non-seekable sink (zipfile then uses data descriptors), and whatever the
+# sink has collected is handed out after each block of samples. Memory use is
+# bounded by one block plus the compressor's window, however many runs are
+# included. manifest.json is written last, once the sample counts are known.
+
+BLOCK_SAMPLES = 65536
+# Fast deflate: a Pi's CPU, not the link, is the bottleneck when streaming.
+COMPRESS_LEVEL = 1
+# The combined table has a fixed schema; extra channels stay in the per-run CSVs.
+COMBINED_CHANNELS = DEFAULT_CHANNELS
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer that the generator drains between writes."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile asks for the offset of each entry; seek() stays unsupported
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+class _Counting(io.RawIOBase):
+    """Adds tell() to a zip entry stream, for writers that track their own offset."""
+
+    def __init__(self, f):
+        self._f = f
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        n = self._f.write(b)
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def run_manifest_entry(run: RunRow) -> Dict[str, Any]:
+    return {
+        "id": run.id,
+        "protocol_id": run.protocol_id,
+        "protocol_name": run_protocol_name(run),
+        "status": run.status,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "notes": run.notes,
+        "protocol": get_run_snapshot(run),
+    }
+
+
+def _combined_block(run_id: int, cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    n = len(next(iter(cols.values())))
+    out = {"run_id": np.full(n, run_id, dtype="<i8")}
+    for name, dtype in COMBINED_CHANNELS:
+        v = cols.get(name)
+        out[name] = np.asarray(v, dtype=dtype) if v is not None else np.full(n, np.nan, dtype=dtype)
+    return out
+
+
+def _iter_combined(runs: List[RunRow], counts: Dict[str, int],
+                   progress: Optional[Callable[[int, int], None]]) -> Iterator[Dict[str, np.ndarray]]:
+    for i, r in enumerate(runs):
+        n = 0
+        for cols in iter_column_blocks(Path(r.run_dir), block=BLOCK_SAMPLES):
+            table = _combined_block(r.id, cols)
+            n += len(table["run_id"])
+            yield table
+        counts[str(r.id)] = n
+        if progress is not None:
+            progress(i + 1, len(runs))
+
+
+def _arrow_schema(manifest: Dict[str, Any]):
+    fields = [pa.field("run_id", pa.int64())]
+    fields += [pa.field(name, pa.from_numpy_dtype(np.dtype(dtype))) for name, dtype in COMBINED_CHANNELS]
+    return pa.schema(fields, metadata={"frictiontester.runs": json.dumps(manifest)})
+
+
+def iter_runs_zip(runs: List[RunRow], per_run: bool = True, combined: bool = True,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Iterator[bytes]:
+    """
+    Yield the bytes of a zip archive of `runs` (see the layout above).
+
+    Only run_dir is touched once the generator starts, so it can outlive the
+    connection the runs were loaded with. progress(runs_done, total_runs) is
+    called after each run.
+    """
+    sink = _Sink()
+    manifest = {str(r.id): run_manifest_entry(r) for r in runs}
+    counts: Dict[str, int] = {}
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=COMPRESS_LEVEL, allowZip64=True) as zf:
+        if per_run:
+            for i, r in enumerate(runs):
+                counts[str(r.id)] = committed_count(Path(r.run_dir))
+                with zf.open(f"runs/run_{r.id}/samples.csv", "w", force_zip64=True) as f:
+                    for block in iter_csv_blocks(Path(r.run_dir)):
+                        f.write(block.encode())
+                        yield sink.drain()
+                if progress is not None and not combined:
+                    progress(i + 1, len(runs))
+
+        if combined:
+            name = "samples.parquet" if pa is not None else "samples.csv"
+            with zf.open(name, "w", force_zip64=True) as f:
+                if pa is not None:
+                    writer = pq.ParquetWriter(_Counting(f), _arrow_schema(manifest), compression="snappy")
+                    for table in _iter_combined(runs, counts, progress):
+                        writer.write_batch(pa.record_batch(list(table.values()), names=list(table)))
+                        yield sink.drain()
+                    writer.close()
+                else:
+                    f.write(("run_id," + ",".join(CSV_COLUMNS.get(n, n) for n, _ in COMBINED_CHANNELS) + "\n").encode())
+                    for table in _iter_combined(runs, counts, progress):
+                        buf = io.StringIO()
+                        fmt = ["%d", "%.6f"] + ["%.7g"] * (len(table) - 2)
+                        np.savetxt(buf, np.column_stack(list(table.values())), fmt=fmt, delimiter=",")
+                        f.write(buf.getvalue().encode())
+                        yield sink.drain()
+
+        for run_id, n in counts.items():
+            manifest[run_id]["samples"] = n
+        zf.writestr("manifest.json", json.dumps({"runs": manifest}, indent=2))
+
+    yield sink.drain()
+
+
+def write_runs_zip(runs: List[RunRow], out_path: Path, per_run: bool = True, combined: bool = True,
+                   progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Write the archive to out_path (via a temp file) and return its size in
+    bytes. An exception from progress abandons it and removes the temp file.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter_runs_zip(runs, per_run=per_run, combined=combined, progress=progress):
+                f.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(out_path)
+    return size
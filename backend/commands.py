@@ -0,0 +1,277 @@
+# commands.py
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# -------------------------
+# Outgoing command scheduling
+# -------------------------
+#
+# Commands go out as "CMD NAME k=v ..." lines and the ESP32 answers each with
+# "ACK NAME ..." (or "ERR NAME ..."); PING answers "PONG" and GET_STATUS a
+# "STATUS ..." line. The wire format carries no ids, so replies are matched to
+# the oldest in-flight command of the same name. Sequence numbers are local:
+# they identify commands in metrics and failure reports.
+
+# Always sent ahead of everything else and never held back by the window.
+# When one of these stops motion (all but "ESTOP state=0", the release),
+# queued motion commands are dropped and in-flight ones are never resent.
+PRIORITY_COMMANDS = {"ESTOP", "ABORT_JOB", "TEST_STOP"}
+
+# Commands that set motion for an axis; a queued one is replaced by a newer
+# one for the same axis (the latest intent wins, e.g. press-and-hold jogging).
+AXIS_MOTION_COMMANDS = {"MOVE_VEL", "MOVE_ABS", "JOG_UP", "JOG_DOWN", "JOG_STOP"}
+MOTION_COMMANDS = AXIS_MOTION_COMMANDS | {"HOME", "TEST_START", "START_JOB"}
+
+# Setpoint-style commands where only the latest queued value matters.
+LATEST_WINS_COMMANDS = {"HEATER_SET", "SET_FAN", "GET_STATUS", "PING"}
+
+# Safe to resend when the reply never came.
+RETRYABLE_COMMANDS = {
+    "PING", "GET_STATUS", "ESTOP", "ABORT_JOB", "TEST_STOP", "MOVE_VEL", "MOVE_ABS",
+    "JOG_STOP", "HEATER_SET", "SET_FAN", "SET_CLAMP", "SET_CARRIAGE", "START_STREAM", "STOP_STREAM",
+}
+
+# Reply lines that aren't "ACK NAME" / "ERR NAME"
+REPLY_ALIASES = {"PONG": "PING", "STATUS": "GET_STATUS"}
+
+LATENCY_SAMPLES = 200
+
+
+def command_name(line: str) -> str:
+    """'CMD MOVE_VEL axis=Z vel=1' -> 'MOVE_VEL'; 'PING' -> 'PING'."""
+    parts = line.split(None, 2)
+    if not parts:
+        return ""
+    if parts[0] == "CMD" and len(parts) > 1:
+        return parts[1]
+    return parts[0]
+
+
+def _stops_motion(name: str, line: str) -> bool:
+    if name not in PRIORITY_COMMANDS:
+        return False
+    return not (name == "ESTOP" and "state=0" in line.split())
+
+
+def _coalesce_key(name: str, line: str) -> Optional[str]:
+    if name in AXIS_MOTION_COMMANDS:
+        for tok in line.split():
+            if tok.startswith("axis="):
+                return "motion:" + tok[5:]
+        return "motion:"
+    if name in LATEST_WINS_COMMANDS:
+        return name
+    return None
+
+
+@dataclass
+class Command:
+    seq: int
+    line: str
+    name: str
+    key: Optional[str]
+    submitted: float
+    sent: Optional[float] = None
+    attempts: int = 0
+    # sent before a stop: its reply is still matched, but it is never resent
+    superseded: bool = False
+
+
+@dataclass
+class _CommandMetrics:
+    sent: int = 0
+    acked: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    retries: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+    latency_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+    queue_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def snapshot(self) -> Dict[str, object]:
+        out: Dict[str, object] = {
+            "sent": self.sent, "acked": self.acked, "errors": self.errors, "timeouts": self.timeouts,
+            "retries": self.retries, "coalesced": self.coalesced, "dropped": self.dropped,
+        }
+        for label, values in (("latency_ms", self.latency_ms), ("queue_ms", self.queue_ms)):
+            if values:
+                v = sorted(values)
+                out[label] = {
+                    "last": round(values[-1], 3),
+                    "mean": round(sum(v) / len(v), 3),
+                    "p95": round(v[min(len(v) - 1, int(0.95 * (len(v) - 1) + 0.5))], 3),
+                    "max": round(v[-1], 3),
+                }
+        return out
+
+
+class CommandScheduler:
+    """
+    Queue between callers and the serial port.
+
+    At most `window` commands are awaiting a reply at once; more wait in the
+    queue, where redundant ones are coalesced. Priority commands bypass the
+    window. Unanswered commands are resent (retryable ones) or failed after
+    `timeout_s`. Lines that aren't commands (no CMD prefix, except PING) are
+    passed straight through untracked.
+
+    Not thread-safe apart from metrics(): drive it from the thread that owns
+    the port. `write` sends one line; `on_failed(cmd, reason)` reports a
+    command that was given up on.
+    """
+
+    def __init__(self, write: Callable[[str], None],
+                 on_failed: Optional[Callable[[Command, str], None]] = None,
+                 window: int = 4, timeout_s: float = 1.0, retries: int = 2):
+        self._write = write
+        self._on_failed = on_failed
+        self.window = window
+        self.timeout_s = timeout_s
+        self.retries = retries
+
+        self._queue: Deque[Command] = deque()
+        self._priority: Deque[Command] = deque()
+        self._in_flight: List[Command] = []
+        self._metrics: Dict[str, _CommandMetrics] = {}
+        self._metrics_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue) + len(self._priority)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def _m(self, name: str) -> _CommandMetrics:
+        m = self._metrics.get(name)
+        if m is None:
+            m = self._metrics[name] = _CommandMetrics()
+        return m
+
+    def submit(self, seq: int, line: str, now: float) -> None:
+        name = command_name(line)
+        if not line.startswith("CMD ") and name != "PING":
+            self._write(line)
+            return
+
+        cmd = Command(seq=seq, line=line, name=name, key=_coalesce_key(name, line), submitted=now)
+        with self._metrics_lock:
+            if name in PRIORITY_COMMANDS:
+                if _stops_motion(name, line):
+                    dropped = [c for c in self._queue if c.name in MOTION_COMMANDS]
+                    if dropped:
+                        self._queue = deque(c for c in self._queue if c not in dropped)
+                        for c in dropped:
+                            self._m(c.name).dropped += 1
+                    for c in self._in_flight:
+                        if c.name in MOTION_COMMANDS:
+                            c.superseded = True
+                self._priority.append(cmd)
+            elif cmd.key is not None:
+                for i, queued in enumerate(self._queue):
+                    if queued.key == cmd.key:
+                        # keep the queue position, take the newest content
+                        self._m(queued.name).coalesced += 1
+                        cmd.submitted = queued.submitted
+                        self._queue[i] = cmd
+                        break
+                else:
+                    self._queue.append(cmd)
+            else:
+                self._queue.append(cmd)
+        self.pump(now)
+
+    def pump(self, now: float) -> None:
+        """Send whatever the window allows, and expire overdue commands."""
+        self._expire(now)
+        while self._priority:
+            self._send(self._priority.popleft(), now)
+        while self._queue and len(self._in_flight) < self.window:
+            self._send(self._queue.popleft(), now)
+
+    def _send(self, cmd: Command, now: float) -> None:
+        cmd.sent = now
+        cmd.attempts += 1
+        self._in_flight.append(cmd)
+        with self._metrics_lock:
+            m = self._m(cmd.name)
+            if cmd.attempts == 1:
+                m.sent += 1
+                m.queue_ms.append((now - cmd.submitted) * 1000.0)
+            else:
+                m.retries += 1
+        self._write(cmd.line)
+
+    def _expire(self, now: float) -> None:
+        overdue = [c for c in self._in_flight if now - c.sent >= self.timeout_s]
+        for cmd in overdue:
+            self._in_flight.remove(cmd)
+            if cmd.superseded:
+                # a stop went out after it; resending would restart the motion
+                with self._metrics_lock:
+                    self._m(cmd.name).dropped += 1
+                continue
+            if cmd.name in RETRYABLE_COMMANDS and cmd.attempts <= self.retries:
+                self._send(cmd, now)
+                continue
+            with self._metrics_lock:
+                self._m(cmd.name).timeouts += 1
+            if self._on_failed is not None:
+                self._on_failed(cmd, "timeout")
+
+    def on_line(self, line: str, now: float) -> Optional[Tuple[Command, bool]]:
+        """
+        Match a received line against in-flight commands. Returns (command,
+        ok) for a reply that completed one, None for any other line.
+        """
+        parts = line.split(None, 2)
+        if not parts:
+            return None
+        head = parts[0]
+        if head in ("ACK", "ERR", "NACK") and len(parts) > 1:
+            name, ok = parts[1], head == "ACK"
+        elif head in REPLY_ALIASES:
+            name, ok = REPLY_ALIASES[head], True
+        else:
+            return None
+
+        for cmd in self._in_flight:
+            if cmd.name == name:
+                break
+        else:
+            return None
+
+        self._in_flight.remove(cmd)
+        with self._metrics_lock:
+            m = self._m(name)
+            if ok:
+                m.acked += 1
+                m.latency_ms.append((now - cmd.sent) * 1000.0)
+            else:
+                m.errors += 1
+        if not ok and self._on_failed is not None:
+            self._on_failed(cmd, line)
+        self.pump(now)
+        return cmd, ok
+
+    def clear(self) -> None:
+        """Forget queued and in-flight commands (port closed)."""
+        with self._metrics_lock:
+            self._queue.clear()
+            self._priority.clear()
+        self._in_flight.clear()
+
+    def metrics(self) -> Dict[str, object]:
+        """Per-command counters and latency (send -> reply) / queueing stats; any thread."""
+        with self._metrics_lock:
+            return {
+                "pending": len(self._queue) + len(self._priority),
+                "in_flight": len(self._in_flight),
+                "commands": {name: m.snapshot() for name, m in sorted(self._metrics.items())},
+            }
@@ -0,0 +1,242 @@
+# inproc.py
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import logging
+import threading
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.params import Body, Depends
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from starlette.responses import Response, StreamingResponse
+
+from .api import app
+from .storage import get_pool
+
+try:
+    import uvicorn
+except ImportError:     # in-process calls work without it; only the HTTP listener needs it
+    uvicorn = None
+
+log = logging.getLogger(__name__)
+
+# -------------------------
+# In-process backend
+# -------------------------
+#
+# Lets the kiosk UI run the backend inside its own interpreter
+# (main.py, FRICTIONTESTER_BACKEND=inprocess). InProcessClient.call() takes
+# the same method/path/body as the HTTP API and calls the matching endpoint
+# function of api.app directly: path and query parameters and the body are
+# validated into the endpoint's argument types, the connection comes from
+# the shared pool, and the result is returned as plain Python objects. No
+# socket, HTTP parsing or JSON text is involved.
+#
+# The endpoints stay the single implementation. Query() bounds (ge/le) are
+# not enforced on this path; its only caller is the kiosk itself. Streaming
+# responses (export mode=content) are only served over HTTP; other Response
+# objects are passed on as their status and decoded body (JSON or text).
+#
+# start_backend() runs the app's startup hooks and can also serve the HTTP
+# API from a thread for remote clients.
+
+
+class _InvalidParams(Exception):
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _validate(ta: TypeAdapter, value: Any, loc: Tuple[str, ...]) -> Any:
+    # same error shape as FastAPI's 422 responses (loc starts with path/query/body)
+    try:
+        return ta.validate_python(value)
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        for err in errors:
+            err["loc"] = list(loc) + list(err["loc"])
+        raise _InvalidParams(jsonable_encoder(errors))
+
+
+class _Endpoint:
+    """How to call one route's endpoint: which argument comes from where."""
+
+    def __init__(self, route: APIRoute):
+        self.route = route
+        self.func = route.endpoint
+        self.needs_conn = None
+        self.path_params: Dict[str, TypeAdapter] = {}
+        self.query_params: Dict[str, Tuple[TypeAdapter, Any]] = {}
+        self.body_param: Optional[Tuple[str, TypeAdapter]] = None
+
+        hints = typing.get_type_hints(self.func)
+        path_names = set(route.param_convertors)
+        for name, p in inspect.signature(self.func).parameters.items():
+            default = p.default
+            if isinstance(default, Depends):
+                self.needs_conn = name      # get_db is the only dependency in api.py
+                continue
+            hint = hints.get(name, Any)
+            if name in path_names:
+                self.path_params[name] = TypeAdapter(hint)
+            elif _is_body(hint) or isinstance(default, Body):
+                self.body_param = (name, TypeAdapter(hint))
+            else:
+                if default is inspect.Parameter.empty:
+                    default = ...
+                elif hasattr(default, "default"):   # Query(...)
+                    default = default.default
+                self.query_params[name] = (TypeAdapter(hint), default)
+
+    def kwargs(self, path_values: Dict[str, str], query: Dict[str, str], body: Any) -> Dict[str, Any]:
+        out = {name: _validate(ta, path_values[name], ("path", name)) for name, ta in self.path_params.items()}
+        for name, (ta, default) in self.query_params.items():
+            if name in query:
+                out[name] = _validate(ta, query[name], ("query", name))
+            elif default is ...:
+                raise _InvalidParams([{"type": "missing", "loc": ["query", name], "msg": "Field required"}])
+            else:
+                out[name] = default
+        if self.body_param is not None:
+            name, ta = self.body_param
+            if ta.core_schema.get("type") == "bytes":
+                # raw-body endpoints (protocol import): a document as text, or as JSON data
+                if isinstance(body, str):
+                    body = body.encode()
+                elif not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+            out[name] = _validate(ta, body if body is not None else {}, ("body",))
+        return out
+
+
+def _is_body(hint: Any) -> bool:
+    origin = typing.get_origin(hint)
+    if origin in (dict, list, Dict, List):
+        return True
+    return inspect.isclass(hint) and issubclass(hint, BaseModel)
+
+
+class InProcessClient:
+    """Call api.app's endpoints by method and path, without HTTP."""
+
+    def __init__(self):
+        self._routes = [
+            r for r in app.routes
+            if isinstance(r, APIRoute) and not inspect.iscoroutinefunction(r.endpoint)
+        ]
+        self._endpoints: Dict[int, _Endpoint] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, route: APIRoute) -> _Endpoint:
+        with self._lock:
+            ep = self._endpoints.get(id(route))
+            if ep is None:
+                ep = self._endpoints[id(route)] = _Endpoint(route)
+            return ep
+
+    def _match(self, method: str, path: str) -> Tuple[Optional[APIRoute], Dict[str, str], int]:
+        allowed = False
+        for route in self._routes:
+            m = route.path_regex.match(path)
+            if not m:
+                continue
+            if method in route.methods:
+                return route, m.groupdict(), 200
+            allowed = True
+        return None, {}, 405 if allowed else 404
+
+    def call(self, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+        """
+        Perform one API call; returns (status code, response data) with the
+        same data the HTTP API would send as JSON ({"detail": ...} on errors).
+        """
+        method = method.upper()
+        url = urlsplit(path)
+        route, path_values, status = self._match(method, url.path)
+        if route is None:
+            return status, {"detail": "Not Found" if status == 404 else "Method Not Allowed"}
+
+        ep = self._endpoint(route)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        try:
+            kwargs = ep.kwargs(path_values, query, body)
+            if ep.needs_conn:
+                with get_pool().connection() as conn:
+                    kwargs[ep.needs_conn] = conn
+                    result = ep.func(**kwargs)
+            else:
+                result = ep.func(**kwargs)
+        except HTTPException as e:
+            return e.status_code, {"detail": e.detail}
+        except _InvalidParams as e:
+            return 422, {"detail": e.errors}
+        except Exception:
+            log.exception("In-process %s %s failed", method, url.path)
+            return 500, {"detail": "Internal Server Error"}
+
+        if isinstance(result, StreamingResponse):
+            return 406, {"detail": "Streaming responses are only served over HTTP"}
+        if isinstance(result, Response):
+            # pre-encoded JSON (GET /protocols), an empty 304, a CSV document
+            if not result.body:
+                return result.status_code, None
+            if result.media_type == "application/json":
+                return result.status_code, json.loads(result.body)
+            return result.status_code, result.body.decode()
+        return route.status_code or 200, jsonable_encoder(result)
+
+
+# -------------------------
+# Lifecycle
+# -------------------------
+
+_server = None
+_server_thread: Optional[threading.Thread] = None
+
+
+def _run_hooks(hooks) -> None:
+    for hook in hooks:
+        if inspect.iscoroutinefunction(hook):
+            asyncio.run(hook())
+        else:
+            hook()
+
+
+def start_backend(http_host: Optional[str] = None, http_port: int = 0) -> None:
+    """
+    Run the app's startup hooks (schema migrations, run recovery, journal
+    sweeper). With http_port set, also serve the HTTP API on
+    http_host:http_port from a background thread (needs uvicorn).
+    """
+    global _server, _server_thread
+    _run_hooks(app.router.on_startup)
+    if not http_port:
+        return
+    if uvicorn is None:
+        log.warning("In-process backend: uvicorn not installed, HTTP API not served")
+        return
+
+    config = uvicorn.Config(app, host=http_host or "127.0.0.1", port=http_port,
+                            lifespan="off", log_level="warning")
+    _server = uvicorn.Server(config)
+    # only the main thread may install signal handlers; the UI owns them
+    _server.install_signal_handlers = lambda: None
+    _server_thread = threading.Thread(target=_server.run, name="backend-http", daemon=True)
+    _server_thread.start()
+
+
+def stop_backend() -> None:
+    """Stop the HTTP listener, if any, and run the app's shutdown hooks."""
+    global _server, _server_thread
+    if _server is not None:
+        _server.should_exit = True
+        _server_thread.join(timeout=5.0)
+        _server, _server_thread = None, None
+    _run_hooks(app.router.on_shutdown)
@@ -0,0 +1,270 @@
+# jobs.py
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .storage import (
+    DATA_DIR,
+    connect,
+    create_job,
+    finish_job,
+    get_run,
+    remove_run_dirs,
+    request_job_cancel,
+    set_job_progress,
+    start_job,
+    write_export_file,
+)
+
+# -------------------------
+# Background jobs
+# -------------------------
+#
+# Exports, analysis and bulk operations run in a small process pool so their
+# NumPy/IO work neither holds the API's GIL nor competes with a live run at
+# the same priority. Each job has a row in the jobs table; workers update
+# progress there through their own SQLite connection (WAL lets them write
+# alongside the API), and notice cancellation when a progress update finds
+# the row marked 'cancelling'.
+
+log = logging.getLogger(__name__)
+
+# Bulk exports (not tied to one run_dir) are written here
+EXPORTS_DIR = DATA_DIR / "exports"
+
+JOB_WORKERS = max(1, min(2, (os.cpu_count() or 2) - 2))
+# Workers run below the API and serial threads so a live test keeps its latency.
+JOB_NICENESS = 10
+# Progress is written at most this often (each write is a small transaction).
+PROGRESS_INTERVAL_S = 0.25
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to job functions: report progress, which also checks for cancellation."""
+
+    def __init__(self, conn, job_id: int):
+        self.conn = conn
+        self.job_id = job_id
+        self._last = 0.0
+
+    def progress(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last < PROGRESS_INTERVAL_S:
+            return
+        self._last = now
+        status = set_job_progress(self.conn, self.job_id, max(0.0, min(1.0, fraction)), message)
+        if status in ("cancelling", "cancelled"):
+            raise JobCancelled()
+
+
+# -------------------------
+# Job kinds (run in the worker processes)
+# -------------------------
+
+def _job_export_csv(ctx: JobContext, run_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _progress(done: int, total: int) -> None:
+        ctx.progress(done / total if total else 1.0, f"{done}/{total} samples")
+
+    path = write_export_file(ctx.conn, run_id, fmt="csv", progress=_progress)
+    return {"format": "csv", "path": path, "bytes": Path(path).stat().st_size}
+
+
+def _job_export_bulk(ctx: JobContext, run_id: Optional[int], params: Dict[str, Any]) -> Dict[str, Any]:
+    from .archive import write_runs_zip
+
+    runs = [get_run(ctx.conn, i) for i in params.get("run_ids", [])]
+    runs = [r for r in runs if r is not None]
+    if not runs:
+        raise ValueError("No runs selected")
+
+    def _progress(done: int, total: int) -> None:
+        ctx.progress(done / total, f"{done}/{total} runs", force=True)
+
+    path = EXPORTS_DIR / f"runs_{ctx.job_id}.zip"
+    size = write_runs_zip(runs, path, per_run=params.get("per_run", True),
+                          combined=params.get("combined", True), progress=_progress)
+    return {"format": "zip", "path": str(path), "bytes": size, "runs": len(runs)}
+
+
+def _job_analysis(ctx: JobContext, run_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    from .analysis import get_run_analysis
+    from .lod import ensure_pyramid
+
+    run = get_run(ctx.conn, run_id)
+    if not run:
+        raise ValueError("Run not found")
+    ctx.progress(0.1, "analysing", force=True)
+    result = get_run_analysis(ctx.conn, run)
+    ctx.progress(0.8, "building plot pyramid", force=True)
+    ensure_pyramid(Path(run.run_dir))
+    return {"cycles": (result or {}).get("cycles", 0), "overall": (result or {}).get("overall")}
+
+
+def _job_delete_run_dirs(ctx: JobContext, run_id: Optional[int], params: Dict[str, Any]) -> Dict[str, Any]:
+    dirs = params.get("dirs", [])
+
+    def _progress(done: int, total: int) -> None:
+        ctx.progress(done / total, f"{done}/{total} run folders")
+
+    return {"removed": remove_run_dirs(dirs, progress=_progress), "requested": len(dirs)}
+
+
+JOB_KINDS: Dict[str, Callable[[JobContext, int, Dict[str, Any]], Dict[str, Any]]] = {
+    "export_csv": _job_export_csv,
+    "export_bulk": _job_export_bulk,
+    "analysis": _job_analysis,
+    "delete_run_dirs": _job_delete_run_dirs,
+}
+
+# Kinds a client may start through POST /jobs. export_bulk and
+# delete_run_dirs are only submitted by the API itself, with parameters it
+# built (/runs/export, /runs:batch).
+PUBLIC_JOB_KINDS = ("export_csv", "analysis")
+
+
+def _worker_init() -> None:
+    # forkserver workers don't inherit the API's handlers; log to stderr,
+    # which goes to the same place as the API's own output
+    logger = logging.getLogger("backend")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    try:
+        os.nice(JOB_NICENESS)
+    except OSError:
+        pass
+
+
+def _run_job(job_id: int, kind: str, run_id: Optional[int], params: Dict[str, Any]) -> None:
+    conn = connect()
+    try:
+        if not start_job(conn, job_id):
+            return      # cancelled while queued
+        ctx = JobContext(conn, job_id)
+        try:
+            result = JOB_KINDS[kind](ctx, run_id, params)
+        except JobCancelled:
+            finish_job(conn, job_id, "cancelled")
+            return
+        except Exception as e:
+            log.exception("Job %s (%s) failed", job_id, kind)
+            finish_job(conn, job_id, "failed", error=f"{type(e).__name__}: {e}")
+            return
+        finish_job(conn, job_id, "completed", result=result)
+    finally:
+        conn.close()
+
+
+# -------------------------
+# Runner (API process)
+# -------------------------
+
+class JobRunner:
+    """Owns the process pool; jobs are submitted and cancelled by id."""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self._workers = workers
+        self._pool = self._new_pool()
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # forkserver: don't fork the threaded API process itself
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["backend.jobs"])
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=ctx, initializer=_worker_init)
+
+    def submit(self, conn, kind: str, run_id: Optional[int], params: Optional[Dict[str, Any]] = None) -> int:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        params = params or {}
+        job_id = create_job(conn, kind, run_id, params)
+        with self._lock:
+            try:
+                fut = self._pool.submit(_run_job, job_id, kind, run_id, params)
+            except BrokenProcessPool:
+                # a worker died (OOM, segfault); its jobs were failed in _done
+                self._pool.shutdown(wait=False)
+                self._pool = self._new_pool()
+                fut = self._pool.submit(_run_job, job_id, kind, run_id, params)
+            self._futures[job_id] = fut
+        fut.add_done_callback(lambda f, job_id=job_id: self._done(job_id, f))
+        return job_id
+
+    def _done(self, job_id: int, fut: Future) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if fut.cancelled():
+            return
+        exc = fut.exception()
+        if exc is not None:
+            # the worker died (or the pool broke) before it could record an outcome
+            conn = connect()
+            try:
+                finish_job(conn, job_id, "failed", error=f"{type(exc).__name__}: {exc}")
+            finally:
+                conn.close()
+
+    def cancel(self, conn, job_id: int) -> Optional[str]:
+        status = request_job_cancel(conn, job_id)
+        if status == "cancelled":
+            with self._lock:
+                fut = self._futures.get(job_id)
+            if fut is not None:
+                fut.cancel()
+        return status
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+
+def stop_runner() -> None:
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.shutdown()
+            _runner = None
+
+
+def job_dict(job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "run_id": job.run_id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "params": json.loads(job.params_json or "{}"),
+        "result": json.loads(job.result_json) if job.result_json else None,
+    }
@@ -0,0 +1,157 @@
+# journal.py
+from __future__ import annotations
+
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .livefeed import close_feed
+from .livestats import drop_live_stats
+from .recorder import close_recorder, seal_run_dir
+from .storage import get_pool, list_orphaned_runs, mark_run_status, touch_run_heartbeat
+
+# -------------------------
+# Run journal
+# -------------------------
+#
+# A running run's heartbeat_at is refreshed whenever the kiosk posts samples
+# (at most every HEARTBEAT_INTERVAL_S; the uplink posts an empty batch when
+# there is nothing to send). A run still marked running whose heartbeat is
+# older than HEARTBEAT_STALE_S has lost its kiosk or backend: its data is
+# sealed (recorder.seal_run_dir), leftovers of interrupted writes are removed,
+# and it is marked interrupted with the reason in end_reason (failed if its
+# data could not be read at all).
+#
+# The check runs once at startup, limited to STARTUP_BUDGET_S, and then every
+# SWEEP_INTERVAL_S from a background thread, which also picks up whatever
+# the startup pass had no time for. Plot pyramids are rebuilt lazily by
+# /runs/{id}/series once the sample index has changed.
+
+HEARTBEAT_INTERVAL_S = 5.0
+HEARTBEAT_STALE_S = 30.0
+SWEEP_INTERVAL_S = 10.0
+STARTUP_BUDGET_S = 5.0
+
+# written through a temp name and renamed; a crash can leave these behind
+_TEMP_LEFTOVERS = ("export.csv.tmp", "lod.tmp")
+
+log = logging.getLogger(__name__)
+
+_last_beat: Dict[int, float] = {}
+_beat_lock = threading.Lock()
+
+
+def note_heartbeat(conn: sqlite3.Connection, run_id: int) -> None:
+    """Record that run_id is alive; writes to the DB at most every HEARTBEAT_INTERVAL_S."""
+    now = time.monotonic()
+    with _beat_lock:
+        if now - _last_beat.get(run_id, float("-inf")) < HEARTBEAT_INTERVAL_S:
+            return
+        _last_beat[run_id] = now
+    touch_run_heartbeat(conn, run_id)
+
+
+def forget_run(run_id: int) -> None:
+    with _beat_lock:
+        _last_beat.pop(run_id, None)
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def recover_run(conn: sqlite3.Connection, run, last_seen: Optional[str]) -> Dict[str, object]:
+    """Seal one orphaned run's data and mark it interrupted (or failed)."""
+    close_recorder(run.id)
+    drop_live_stats(run.id)
+    forget_run(run.id)
+    run_dir = Path(run.run_dir)
+    since = f"last heartbeat {last_seen}" if last_seen else "no heartbeat recorded"
+    try:
+        sealed = seal_run_dir(run_dir)
+    except (OSError, ValueError) as e:
+        reason = f"Run stopped unexpectedly ({since}); sample data unreadable: {e}"
+        mark_run_status(conn, run.id, "failed", reason=reason)
+        close_feed(run.id, "failed")
+        return {"id": run.id, "status": "failed", "reason": reason}
+
+    for name in _TEMP_LEFTOVERS:
+        path = run_dir / name
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists():
+            path.unlink(missing_ok=True)
+
+    reason = f"Run stopped unexpectedly ({since}); {sealed['samples']} samples kept"
+    if sealed["dropped_chunks"]:
+        reason += f", {sealed['dropped_chunks']} damaged chunk(s) dropped"
+    mark_run_status(conn, run.id, "interrupted", reason=reason)
+    close_feed(run.id, "interrupted")
+    return dict(sealed, id=run.id, status="interrupted", reason=reason)
+
+
+def recover_orphaned_runs(conn: sqlite3.Connection, stale_s: float = HEARTBEAT_STALE_S,
+                          budget_s: Optional[float] = None) -> List[Dict[str, object]]:
+    """
+    Recover every running run whose heartbeat (or start, for runs without
+    one) is older than stale_s. With budget_s set, stops after that many
+    seconds; the remaining runs are left for the next pass.
+    """
+    deadline = None if budget_s is None else time.monotonic() + budget_s
+    now = datetime.now(timezone.utc)
+    out = []
+    for run in list_orphaned_runs(conn):
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        last_seen = run.heartbeat_at or run.started_at
+        seen = _parse_iso(last_seen)
+        if seen is not None and (now - seen).total_seconds() < stale_s:
+            continue
+        out.append(recover_run(conn, run, last_seen))
+    return out
+
+
+class _Sweeper:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="run-journal", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(SWEEP_INTERVAL_S):
+            try:
+                with get_pool().connection() as conn:
+                    for r in recover_orphaned_runs(conn):
+                        log.warning("Run journal: run %s %s: %s", r["id"], r["status"], r["reason"])
+            except Exception:
+                log.exception("Run journal: sweep failed")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+
+
+_sweeper: Optional[_Sweeper] = None
+
+
+def start_sweeper() -> None:
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = _Sweeper()
+
+
+def stop_sweeper() -> None:
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.stop()
+        _sweeper = None
@@ -0,0 +1,229 @@
+# library.py
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from .storage import Protocol, create_protocol, list_protocols, transaction, update_protocol
+
+# -------------------------
+# Protocol library import / export
+# -------------------------
+#
+# The whole protocol table moves as one document, JSON or CSV, holding the
+# ProtocolIn fields of each protocol (ids and timestamps are local to a
+# tester and not exported):
+#
+#   JSON  {"format": "frictiontester.protocols", "version": 1,
+#          "exported_at": ..., "protocols": [{...}, ...]}
+#         (a bare list of protocols is accepted on import)
+#   CSV   one header row with the field names, then one row per protocol
+#
+# On import all rows are validated in one pass (a TypeAdapter over the whole
+# list); a row is a duplicate when its name or its parameter hash matches an
+# existing protocol or an earlier row. What happens to duplicates depends on
+# the mode:
+#
+#   skip    duplicates are skipped (default)
+#   update  a row named like an existing protocol replaces its parameters;
+#           other duplicates are skipped
+#   error   any duplicate rejects the whole import
+#
+# Everything the import writes is one transaction.
+
+LIBRARY_FORMAT = "frictiontester.protocols"
+LIBRARY_VERSION = 1
+
+# ProtocolIn fields, in document/CSV column order
+FIELDS = (
+    "name", "speed", "stroke_length_mm", "clamp_force_g", "water_temp_c", "cycles",
+    "fixed_start_enabled", "fixed_start_mm",
+)
+PARAM_FIELDS = FIELDS[1:]
+
+IMPORT_MODES = ("skip", "update", "error")
+# invalid rows reported in detail; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+def param_hash(p: Dict[str, Any]) -> str:
+    """Hash of a protocol's test parameters (not its name), normalised so 1 == 1.0."""
+    values = [
+        round(float(p["speed"]), 4),
+        int(p["stroke_length_mm"]),
+        int(p["clamp_force_g"]),
+        int(p["water_temp_c"]),
+        int(p["cycles"]),
+        int(bool(p.get("fixed_start_enabled"))),
+        round(float(p.get("fixed_start_mm") or 0.0), 3),
+    ]
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()[:16]
+
+
+def _name_key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _export_row(p: Protocol) -> Dict[str, Any]:
+    row = {k: getattr(p, k) for k in FIELDS}
+    row["fixed_start_enabled"] = bool(row["fixed_start_enabled"])
+    return row
+
+
+def export_document(protocols: List[Protocol]) -> Dict[str, Any]:
+    return {
+        "format": LIBRARY_FORMAT,
+        "version": LIBRARY_VERSION,
+        "exported_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "protocols": [_export_row(p) for p in sorted(protocols, key=lambda p: _name_key(p.name))],
+    }
+
+
+def export_csv(protocols: List[Protocol]) -> str:
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=FIELDS, lineterminator="\n")
+    w.writeheader()
+    for p in sorted(protocols, key=lambda p: _name_key(p.name)):
+        w.writerow(_export_row(p))
+    return buf.getvalue()
+
+
+def parse_document(data: bytes, fmt: str) -> List[Dict[str, Any]]:
+    """Rows of an exported document (fmt "json" or "csv"); raises ValueError if unreadable."""
+    text = data.decode("utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        missing = set(FIELDS) - set(FIELDS[-2:]) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV is missing columns: {sorted(missing)}")
+        # empty cells fall back to the model defaults
+        return [{k: v for k, v in row.items() if k in FIELDS and v not in ("", None)} for row in reader]
+    if fmt != "json":
+        raise ValueError(f"Unknown format: {fmt}")
+
+    try:
+        doc = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(doc, dict):
+        if doc.get("format", LIBRARY_FORMAT) != LIBRARY_FORMAT:
+            raise ValueError(f"Not a protocol library: {doc.get('format')}")
+        if int(doc.get("version", LIBRARY_VERSION)) > LIBRARY_VERSION:
+            raise ValueError(f"Library version {doc['version']} is newer than this backend")
+        doc = doc.get("protocols")
+    if not isinstance(doc, list):
+        raise ValueError("Expected a list of protocols")
+    return doc
+
+
+def validate_rows(rows: List[Any], model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[Dict[str, Any]]]:
+    """
+    Validate all rows against `model` at once. Returns the valid rows as
+    (row index, model) and the invalid ones as {"row", "errors"}.
+    """
+    adapter = TypeAdapter(List[model])
+    try:
+        return list(enumerate(adapter.validate_python(rows))), []
+    except ValidationError as e:
+        bad: Dict[int, List[Dict[str, Any]]] = {}
+        for err in e.errors(include_url=False, include_context=False):
+            index, *loc = err["loc"]
+            bad.setdefault(index, []).append({"field": ".".join(map(str, loc)) or None, "msg": err["msg"]})
+    good_idx = [i for i in range(len(rows)) if i not in bad]
+    good = adapter.validate_python([rows[i] for i in good_idx])
+    invalid = [{"row": i, "errors": errs} for i, errs in sorted(bad.items())]
+    return list(zip(good_idx, good)), invalid
+
+
+class DuplicateProtocolsError(ValueError):
+    """Raised by import_protocols in "error" mode; duplicates lists the offending rows."""
+
+    def __init__(self, duplicates: List[Dict[str, Any]]):
+        super().__init__(f"{len(duplicates)} duplicate protocol(s)")
+        self.duplicates = duplicates
+
+
+def _plan(conn: sqlite3.Connection, rows: List[Tuple[int, BaseModel]], mode: str):
+    by_name: Dict[str, Dict[str, Any]] = {}
+    by_hash: Dict[str, Dict[str, Any]] = {}
+    for p in list_protocols(conn):
+        ref = {"id": p.id, "hash": param_hash({k: getattr(p, k) for k in FIELDS})}
+        by_name.setdefault(_name_key(p.name), ref)
+        by_hash.setdefault(ref["hash"], ref)
+
+    creates: List[Tuple[int, Dict[str, Any]]] = []
+    updates: List[Tuple[int, int, Dict[str, Any]]] = []
+    unchanged: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    seen_names: Dict[str, int] = {}
+    seen_hashes: Dict[str, int] = {}
+
+    for index, model in rows:
+        d = model.model_dump()
+        key, h = _name_key(d["name"]), param_hash(d)
+        if key in seen_names:
+            skipped.append({"row": index, "name": d["name"], "reason": "name", "duplicate_of_row": seen_names[key]})
+            continue
+        if h in seen_hashes:
+            skipped.append({"row": index, "name": d["name"], "reason": "params", "duplicate_of_row": seen_hashes[h]})
+            continue
+        seen_names[key] = seen_hashes[h] = index
+
+        existing = by_name.get(key)
+        if existing is not None:
+            if existing["hash"] == h:
+                unchanged.append({"row": index, "name": d["name"], "reason": "identical", "existing_id": existing["id"]})
+            elif mode == "update":
+                updates.append((index, existing["id"], d))
+            else:
+                skipped.append({"row": index, "name": d["name"], "reason": "name", "existing_id": existing["id"]})
+            continue
+        existing = by_hash.get(h)
+        if existing is not None:
+            skipped.append({"row": index, "name": d["name"], "reason": "params", "existing_id": existing["id"]})
+            continue
+        creates.append((index, d))
+
+    if mode == "error" and (skipped or unchanged):
+        raise DuplicateProtocolsError(sorted(skipped + unchanged, key=lambda r: r["row"]))
+    return creates, updates, unchanged, skipped
+
+
+def import_protocols(conn: sqlite3.Connection, rows: List[Tuple[int, BaseModel]], mode: str = "skip",
+                     dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Import validated rows (from validate_rows) in one transaction; see the
+    modes above. Returns {"created", "updated", "unchanged", "skipped"},
+    skipped rows with the reason and the protocol or row they duplicate.
+    Nothing is written with dry_run (created ids are then None). Raises
+    DuplicateProtocolsError in "error" mode when there are duplicates.
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+
+    if dry_run:
+        creates, updates, unchanged, skipped = _plan(conn, rows, mode)
+        return {
+            "created": [{"row": i, "id": None, "name": d["name"]} for i, d in creates],
+            "updated": [{"row": i, "id": pid, "name": d["name"]} for i, pid, d in updates],
+            "unchanged": unchanged, "skipped": skipped, "dry_run": True,
+        }
+
+    created, updated = [], []
+    # planned inside the transaction, so no other writer can slip a duplicate in
+    with transaction(conn):
+        creates, updates, unchanged, skipped = _plan(conn, rows, mode)
+        for index, d in creates:
+            pid = create_protocol(conn, Protocol(id=None, **d), commit=False)
+            created.append({"row": index, "id": pid, "name": d["name"]})
+        for index, pid, d in updates:
+            update_protocol(conn, pid, {k: d[k] for k in PARAM_FIELDS}, commit=False)
+            updated.append({"row": index, "id": pid, "name": d["name"]})
+    return {"created": created, "updated": updated, "unchanged": unchanged, "skipped": skipped, "dry_run": False}
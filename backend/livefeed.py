@@ -0,0 +1,151 @@
+# livefeed.py
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .storage import FINISHED_STATUSES
+
+# Frames kept per run for viewers that fall behind; older ones are dropped.
+FEED_FRAMES = 256
+# Telemetry points per published frame (each ingested batch is decimated to this).
+MAX_POINTS_PER_FRAME = 200
+
+
+class LiveFeed:
+    """
+    Fan-out buffer for one run. Producers (sample ingest, status changes)
+    publish frames that are decimated and JSON-encoded once; every viewer
+    reads the same encoded frames by sequence number, so adding viewers
+    adds no per-sample work.
+
+    publish() may be called from any thread; viewers wait on the event loop.
+    """
+
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._frames: deque = deque(maxlen=FEED_FRAMES)   # (seq, json text)
+        self._seq = 0
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self.last_status: Optional[str] = None
+        self.closed = False
+        self.viewers = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def publish(self, frame: Dict[str, Any]) -> None:
+        with self._lock:
+            self._seq += 1
+            frame["seq"] = self._seq
+            self._frames.append((self._seq, json.dumps(frame)))
+            waiters, self._waiters = self._waiters, []
+        for loop, ev in waiters:
+            loop.call_soon_threadsafe(ev.set)
+
+    def publish_samples(self, rows: np.ndarray, stats: Optional[Dict[str, Any]] = None) -> None:
+        """rows: (n, >=4) array of t, pos, force, temp."""
+        n = len(rows)
+        if n == 0:
+            return
+        if n > MAX_POINTS_PER_FRAME:
+            rows = rows[np.linspace(0, n - 1, MAX_POINTS_PER_FRAME).astype(np.int64)]
+        frame: Dict[str, Any] = {
+            "type": "telemetry",
+            "n": n,
+            "t": np.round(rows[:, 0], 4).tolist(),
+            "pos": np.round(rows[:, 1], 3).tolist(),
+            "force": np.round(rows[:, 2], 4).tolist(),
+            "temp": np.round(rows[:, 3], 2).tolist(),
+        }
+        if stats is not None:
+            frame["stats"] = stats
+        self.publish(frame)
+
+    def publish_status(self, status: str) -> None:
+        self.last_status = status
+        if status in FINISHED_STATUSES:
+            # set before publishing so woken viewers see it with the final frame
+            self.closed = True
+        self.publish({"type": "status", "status": status})
+
+    def frames_after(self, seq: int) -> Tuple[List[str], int, bool]:
+        """
+        Encoded frames with sequence > seq, the new cursor, and whether
+        frames were skipped because the viewer fell too far behind.
+        """
+        with self._lock:
+            if not self._frames or self._seq <= seq:
+                return [], seq, False
+            oldest = self._frames[0][0]
+            gap = seq + 1 < oldest
+            out = [text for s, text in self._frames if s > seq]
+            return out, self._seq, gap
+
+    async def wait_after(self, seq: int, timeout: float) -> Tuple[List[str], int, bool]:
+        frames, cursor, gap = self.frames_after(seq)
+        if frames:
+            return frames, cursor, gap
+        ev = asyncio.Event()
+        with self._lock:
+            if self._seq > seq:
+                ev.set()
+            else:
+                self._waiters.append((asyncio.get_running_loop(), ev))
+        try:
+            await asyncio.wait_for(ev.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.frames_after(seq)
+
+
+# -------------------------
+# Feeds for live runs
+# -------------------------
+
+_feeds: Dict[int, LiveFeed] = {}
+_feeds_lock = threading.Lock()
+
+
+def get_feed(run_id: int, create: bool = True) -> Optional[LiveFeed]:
+    with _feeds_lock:
+        feed = _feeds.get(run_id)
+        if feed is None and create:
+            feed = _feeds[run_id] = LiveFeed(run_id)
+        return feed
+
+
+def attach_viewer(run_id: int) -> LiveFeed:
+    with _feeds_lock:
+        feed = _feeds.get(run_id)
+        if feed is None:
+            feed = _feeds[run_id] = LiveFeed(run_id)
+        feed.viewers += 1
+        return feed
+
+
+def detach_viewer(feed: LiveFeed) -> None:
+    """Unwatched feeds are dropped so ingest stops encoding frames nobody reads."""
+    with _feeds_lock:
+        feed.viewers -= 1
+        if feed.viewers <= 0 and _feeds.get(feed.run_id) is feed:
+            del _feeds[feed.run_id]
+
+
+def close_feed(run_id: int, status: str) -> None:
+    """Publish the final status; the feed is dropped once its last viewer leaves."""
+    with _feeds_lock:
+        feed = _feeds.get(run_id)
+    if feed is None:
+        return
+    feed.publish_status(status)
+    with _feeds_lock:
+        if feed.viewers <= 0 and _feeds.get(run_id) is feed:
+            del _feeds[run_id]
@@ -0,0 +1,199 @@
+# livestats.py
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .analysis import G_TO_N, REVERSAL_HYSTERESIS
+
+# A reversal is counted once position retreats REVERSAL_HYSTERESIS of the
+# stroke length from the furthest point reached (hysteresis against sensor
+# noise), as analysis.stroke_bounds does over a finished run.
+TREND_CYCLES = 200
+
+
+class _Welford:
+    """Running count/mean/variance/min/max, merged one batch at a time (Chan et al.)."""
+
+    __slots__ = ("n", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: np.ndarray) -> None:
+        nb = len(x)
+        if nb == 0:
+            return
+        mb = float(x.mean())
+        m2b = float(((x - mb) ** 2).sum())
+        n = self.n + nb
+        delta = mb - self.mean
+        self.mean += delta * nb / n
+        self.m2 += m2b + delta * delta * self.n * nb / n
+        self.n = n
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.n == 0:
+            return {"n": 0}
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        return {"n": self.n, "mean": self.mean, "std": std, "min": self.min, "max": self.max}
+
+
+class LiveRunStats:
+    """
+    Statistics for a run that is still recording, updated from each incoming
+    batch only: overall |force| and temperature stats, the number of
+    completed cycles, the current cycle's force stats, and the recent
+    per-cycle kinetic CoF trend. Nothing rescans the sample history.
+    """
+
+    def __init__(self, clamp_force_g: float, stroke_length_mm: float, target_cycles: int):
+        self._lock = threading.Lock()
+        self.normal_n = float(clamp_force_g) * G_TO_N
+        self.hysteresis = max(float(stroke_length_mm) * REVERSAL_HYSTERESIS, 1e-3)
+        self.target_cycles = int(target_cycles)
+
+        self.samples = 0
+        self.t_first: Optional[float] = None
+        self.t_last: Optional[float] = None
+        self.force = _Welford()
+        self.temp = _Welford()
+        self.cycle = _Welford()
+
+        # stroke tracking
+        self._dir = 0                   # +1 / -1 once known
+        self._extreme: Optional[float] = None
+        self._stroke_sum = 0.0
+        self._stroke_n = 0
+        self._cycle_means = []          # stroke means within the current cycle
+        self.cycles = 0
+        self.cof_trend = deque(maxlen=TREND_CYCLES)
+
+        # running least-squares fit of CoF vs cycle number
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+
+    def add(self, rows: np.ndarray) -> None:
+        """rows: (n, >=4) array of t, pos, force, temp."""
+        if len(rows) == 0:
+            return
+        with self._lock:
+            t, pos, force, temp = rows[:, 0], rows[:, 1], np.abs(rows[:, 2]), rows[:, 3]
+            if self.t_first is None:
+                self.t_first = float(t[0])
+            self.t_last = float(t[-1])
+            self.samples += len(rows)
+            self.force.add(force)
+            self.temp.add(temp)
+            self._track_strokes(pos, force)
+
+    def _track_strokes(self, pos: np.ndarray, force: np.ndarray) -> None:
+        start = 0
+        h = self.hysteresis
+        ext = self._extreme if self._extreme is not None else float(pos[0])
+        d = self._dir
+        for i, p in enumerate(pos.tolist()):
+            if d == 0:
+                # direction unknown until we've moved one hysteresis away from the start
+                if abs(p - ext) > h:
+                    d = 1 if p > ext else -1
+                    ext = p
+            elif d > 0:
+                if p > ext:
+                    ext = p
+                elif ext - p > h:
+                    self._end_stroke(force[start:i])
+                    start, d, ext = i, -1, p
+            else:
+                if p < ext:
+                    ext = p
+                elif p - ext > h:
+                    self._end_stroke(force[start:i])
+                    start, d, ext = i, 1, p
+        self._dir, self._extreme = d, ext
+        seg = force[start:]
+        self._stroke_sum += float(seg.sum())
+        self._stroke_n += len(seg)
+        self.cycle.add(seg)
+
+    def _end_stroke(self, seg: np.ndarray) -> None:
+        self._stroke_sum += float(seg.sum())
+        self._stroke_n += len(seg)
+        self.cycle.add(seg)
+        if self._stroke_n:
+            self._cycle_means.append(self._stroke_sum / self._stroke_n)
+        self._stroke_sum, self._stroke_n = 0.0, 0
+
+        if len(self._cycle_means) == 2:
+            kinetic = sum(self._cycle_means) / 2
+            self._cycle_means = []
+            self.cycles += 1
+            self.cycle = _Welford()
+            if self.normal_n > 0:
+                cof = kinetic / self.normal_n
+                self.cof_trend.append(round(cof, 5))
+                x = float(self.cycles)
+                self._sx += x
+                self._sy += cof
+                self._sxx += x * x
+                self._sxy += x * cof
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.cycles
+            slope = None
+            if n >= 2:
+                den = n * self._sxx - self._sx * self._sx
+                if den:
+                    slope = (n * self._sxy - self._sx * self._sy) / den
+            return {
+                "samples": self.samples,
+                "elapsed_s": (self.t_last - self.t_first) if self.t_first is not None else 0.0,
+                "cycles": n,
+                "target_cycles": self.target_cycles,
+                "force_n": self.force.snapshot(),
+                "temp_c": self.temp.snapshot(),
+                "current_cycle_force_n": self.cycle.snapshot(),
+                "cof_kinetic_last": self.cof_trend[-1] if self.cof_trend else None,
+                "cof_kinetic_slope_per_cycle": slope,
+                "cof_kinetic_trend": list(self.cof_trend),
+            }
+
+
+# -------------------------
+# Stats for live runs
+# -------------------------
+
+_live: Dict[int, LiveRunStats] = {}
+_live_lock = threading.Lock()
+
+
+def get_live_stats(run_id: int, snapshot: Optional[Dict[str, Any]] = None) -> Optional[LiveRunStats]:
+    """
+    Return the live stats for run_id, creating them from the protocol
+    snapshot if given. With snapshot=None only existing stats are returned.
+    """
+    with _live_lock:
+        st = _live.get(run_id)
+        if st is None and snapshot is not None:
+            st = LiveRunStats(
+                clamp_force_g=snapshot.get("clamp_force_g") or 0,
+                stroke_length_mm=snapshot.get("stroke_length_mm") or 0,
+                target_cycles=snapshot.get("cycles") or 0,
+            )
+            _live[run_id] = st
+        return st
+
+
+def drop_live_stats(run_id: int) -> None:
+    with _live_lock:
+        _live.pop(run_id, None)
@@ -0,0 +1,244 @@
+# lod.py
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .recorder import committed_count, open_columns
+
+# -------------------------
+# Level-of-detail pyramid (per run_dir)
+# -------------------------
+#
+#   lod/meta.json       {"version": 2, "count": samples covered, "base": 64,
+#                        "factor": 8, "levels": n, "channels": [...]}
+#   lod/level_<k>.bin   one row per bucket of base * factor**k samples:
+#                       t0/t1 (first/last t) and min/max of every other channel
+#
+# Min/max buckets keep peaks visible at any zoom: a plot built from a level
+# draws the same envelope as one built from the raw samples.
+#
+# Levels are raw row files so a live run's pyramid can be extended in place:
+# only the last (partial) bucket of each level and the buckets after it are
+# recomputed, so catching up costs as much as the samples added since the
+# last update, whatever the run length. meta.json is replaced last; until
+# then readers see the previous count.
+
+LOD_DIR = "lod"
+LOD_VERSION = 2
+BASE_BUCKET = 64
+FACTOR = 8
+# stop adding levels once a level has at most this many buckets
+TOP_LEVEL_BUCKETS = 1024
+
+# updates and reads of one run_dir's pyramid are serialised; runs are spread
+# over a fixed set of locks so one run's update doesn't hold up another's
+_LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+
+def _run_lock(run_dir: Path) -> threading.Lock:
+    return _locks[hash(str(Path(run_dir).resolve())) % _LOCK_STRIPES]
+
+
+def _level_dtype(channels: List[str]) -> np.dtype:
+    fields = [("t0", "<f8"), ("t1", "<f8")]
+    for c in channels:
+        fields += [(f"{c}_min", "<f4"), (f"{c}_max", "<f4")]
+    return np.dtype(fields)
+
+
+def _bucket_reduce(x: np.ndarray, size: int, fn) -> np.ndarray:
+    """Reduce consecutive groups of `size` values (last group may be short)."""
+    n = len(x)
+    full = n // size
+    out = fn(x[:full * size].reshape(full, size), axis=1) if full else np.empty(0, dtype=x.dtype)
+    if n % size:
+        out = np.concatenate([out, [fn(x[full * size:])]])
+    return out
+
+
+def _reduce_level(src_t0, src_t1, mins, maxs, step: int, dtype: np.dtype) -> np.ndarray:
+    nb = -(-len(src_t0) // step)
+    lvl = np.empty(nb, dtype=dtype)
+    lvl["t0"] = src_t0[::step]
+    lvl["t1"] = src_t1[np.minimum(np.arange(1, nb + 1) * step, len(src_t1)) - 1]
+    for c in mins:
+        lvl[f"{c}_min"] = _bucket_reduce(np.asarray(mins[c]), step, np.min)
+        lvl[f"{c}_max"] = _bucket_reduce(np.asarray(maxs[c]), step, np.max)
+    return lvl
+
+
+def _level_path(run_dir: Path, k: int) -> Path:
+    return Path(run_dir) / LOD_DIR / f"level_{k}.bin"
+
+
+def _read_level(run_dir: Path, k: int, dtype: np.dtype, rows: int) -> np.ndarray:
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(_level_path(run_dir, k), dtype=dtype, mode="r", shape=(rows,))
+
+
+def _write_rows(path: Path, first: int, rows: np.ndarray) -> None:
+    """Replace the rows of a level file from row `first` on."""
+    with open(path, "r+b" if path.exists() else "w+b") as f:
+        f.truncate(first * rows.dtype.itemsize)
+        f.seek(first * rows.dtype.itemsize)
+        f.write(rows.tobytes())
+
+
+def _load_meta(run_dir: Path) -> Optional[Dict[str, Any]]:
+    path = Path(run_dir) / LOD_DIR / "meta.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def _update_pyramid(run_dir: Path, meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Bring the pyramid up to the committed samples; rebuilds it if meta is None or unusable."""
+    cols = open_columns(run_dir)
+    t = cols["t"]
+    n = len(t)
+    channels = [k for k in cols if k != "t"]
+    out_dir = run_dir / LOD_DIR
+
+    if (meta is None or meta.get("version") != LOD_VERSION or meta.get("channels") != channels
+            or meta["count"] > n):
+        # first build, older format, or fewer samples than before (damaged chunks dropped)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        old, old_levels = 0, 0
+    else:
+        old, old_levels = meta["count"], meta["levels"]
+    out_dir.mkdir(exist_ok=True)
+
+    dtype = _level_dtype(channels)
+    size = BASE_BUCKET
+    levels = 0
+    while True:
+        nb = -(-n // size)
+        # first bucket that gained samples; a level new since the last update is built whole
+        first = old // size if levels < old_levels else 0
+        if levels == 0:
+            s = first * BASE_BUCKET
+            src = {c: cols[c][s:] for c in channels}
+            rows = _reduce_level(t[s:], t[s:], src, src, BASE_BUCKET, dtype)
+        else:
+            prev = _read_level(run_dir, levels - 1, dtype, -(-n // (size // FACTOR)))[first * FACTOR:]
+            rows = _reduce_level(
+                prev["t0"], prev["t1"],
+                {c: prev[f"{c}_min"] for c in channels},
+                {c: prev[f"{c}_max"] for c in channels},
+                FACTOR, dtype,
+            )
+        _write_rows(_level_path(run_dir, levels), first, rows)
+        levels += 1
+        if nb <= TOP_LEVEL_BUCKETS:
+            break
+        size *= FACTOR
+
+    meta = {"version": LOD_VERSION, "count": n, "base": BASE_BUCKET, "factor": FACTOR,
+            "levels": levels, "channels": channels}
+    tmp = out_dir / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    tmp.replace(out_dir / "meta.json")
+    return meta
+
+
+def _ensure(run_dir: Path) -> Optional[Dict[str, Any]]:
+    n = committed_count(run_dir)
+    if n == 0:
+        return None
+    meta = _load_meta(run_dir)
+    if meta is None or meta.get("version") != LOD_VERSION or meta["count"] != n:
+        meta = _update_pyramid(run_dir, meta)
+    return meta
+
+
+def build_pyramid(run_dir: Path) -> Dict[str, Any]:
+    """Rebuild the pyramid for a run from scratch."""
+    run_dir = Path(run_dir)
+    with _run_lock(run_dir):
+        return _update_pyramid(run_dir, None)
+
+
+def ensure_pyramid(run_dir: Path) -> Optional[Dict[str, Any]]:
+    """Extend (or build) the pyramid to cover every committed sample. None if no data."""
+    run_dir = Path(run_dir)
+    with _run_lock(run_dir):
+        return _ensure(run_dir)
+
+
+def _envelope(t0, t1, mins: Dict[str, np.ndarray], maxs: Dict[str, np.ndarray], level) -> Dict[str, Any]:
+    return {
+        "level": level,
+        "t": ((np.asarray(t0) + np.asarray(t1)) / 2).round(6).tolist(),
+        "channels": {
+            c: {"min": np.asarray(mins[c]).tolist(), "max": np.asarray(maxs[c]).tolist()}
+            for c in mins
+        },
+    }
+
+
+def query_series(run_dir: Path, start: Optional[float], end: Optional[float], max_points: int) -> Dict[str, Any]:
+    """
+    Min/max envelope of the run between start and end (seconds) with at
+    most max_points buckets. Uses raw samples when few enough, otherwise the
+    finest pyramid level that fits; each lookup is a binary search plus a
+    slice of bounded size, independent of run length.
+
+    A missing or stale pyramid (run still recording) is first extended by
+    the samples committed since its last update.
+    """
+    run_dir = Path(run_dir)
+    cols = open_columns(run_dir)
+    t = cols["t"]
+    channels = [k for k in cols if k != "t"]
+    empty = {"level": "raw", "t": [], "channels": {c: {"min": [], "max": []} for c in channels}}
+    if len(t) == 0:
+        return empty
+
+    lo = 0 if start is None else int(np.searchsorted(t, start, side="left"))
+    hi = len(t) if end is None else int(np.searchsorted(t, end, side="right"))
+    if hi <= lo:
+        return empty
+
+    if hi - lo <= max_points:
+        raw = {c: cols[c][lo:hi] for c in channels}
+        return _envelope(t[lo:hi], t[lo:hi], raw, raw, "raw")
+
+    with _run_lock(run_dir):
+        meta = _ensure(run_dir)
+        return _from_pyramid(run_dir, meta, channels, lo, hi, max_points)
+
+
+def _from_pyramid(run_dir: Path, meta: Dict[str, Any], channels: List[str], lo: int, hi: int,
+                  max_points: int) -> Dict[str, Any]:
+    dtype = _level_dtype(meta["channels"])
+    bucket = meta["base"]
+    for k in range(meta["levels"]):
+        if -(-(hi - lo) // bucket) <= max_points or k == meta["levels"] - 1:
+            lvl = _read_level(run_dir, k, dtype, -(-meta["count"] // bucket))
+            a, b = lo // bucket, -(-hi // bucket)
+            if b - a > max_points:
+                # top level still too fine for this request: merge neighbours
+                step = -(-(b - a) // max_points)
+                sl = lvl[a:b]
+                t0 = sl["t0"][::step]
+                t1 = sl["t1"][np.minimum(np.arange(1, len(t0) + 1) * step, len(sl)) - 1]
+                mins = {c: _bucket_reduce(np.asarray(sl[f"{c}_min"]), step, np.min) for c in channels}
+                maxs = {c: _bucket_reduce(np.asarray(sl[f"{c}_max"]), step, np.max) for c in channels}
+                return _envelope(t0, t1, mins, maxs, k)
+            sl = lvl[a:b]
+            return _envelope(
+                sl["t0"], sl["t1"],
+                {c: sl[f"{c}_min"] for c in channels},
+                {c: sl[f"{c}_max"] for c in channels},
+                k,
+            )
+        bucket *= meta["factor"]
+    return {"level": "raw", "t": [], "channels": {c: {"min": [], "max": []} for c in channels}}
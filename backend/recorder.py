@@ -0,0 +1,325 @@
+# recorder.py
+from __future__ import annotations
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# -------------------------
+# On-disk layout (per run_dir)
+# -------------------------
+#
+#   columns.json   channel list: [{"name": "t", "dtype": "<f8"}, ...]
+#   <name>.col     one append-only file per channel, raw fixed-width values
+#   samples.idx    header + one entry per committed chunk: <start:u64, count:u32, crc32:u32>
+#
+# Each column file can be opened directly with numpy.memmap. A chunk is
+# written and fsync'd to every column file before its index entry is
+# appended (and fsync'd); data past the last indexed sample was never
+# committed and is cut off when the run is reopened, so a crash loses at
+# most the chunk that was in flight.
+
+MANIFEST_FILE = "columns.json"
+INDEX_FILE = "samples.idx"
+COLUMN_SUFFIX = ".col"
+
+# (name, dtype) — t in seconds, pos in mm, force in N, temp in °C
+DEFAULT_CHANNELS: List[Tuple[str, str]] = [
+    ("t", "<f8"),
+    ("pos", "<f4"),
+    ("force", "<f4"),
+    ("temp", "<f4"),
+]
+
+_INDEX_MAGIC = b"FTCOL1\0\0"
+_INDEX_HEADER = struct.Struct("<8sI")       # magic, reserved
+_INDEX_ENTRY = struct.Struct("<QII")        # start sample, count, crc32
+
+
+def read_channels(run_dir: Path) -> List[Tuple[str, str]]:
+    path = Path(run_dir) / MANIFEST_FILE
+    if not path.exists():
+        return []
+    return [(c["name"], c["dtype"]) for c in json.loads(path.read_text())["channels"]]
+
+
+def read_index(run_dir: Path) -> List[Tuple[int, int, int]]:
+    """
+    Return the committed chunks of a run as (start, count, crc32) tuples.
+    A torn trailing entry (crash mid-write) is ignored.
+    """
+    path = Path(run_dir) / INDEX_FILE
+    if not path.exists():
+        return []
+    raw = path.read_bytes()
+    if len(raw) < _INDEX_HEADER.size:
+        return []
+    magic, _ = _INDEX_HEADER.unpack_from(raw, 0)
+    if magic != _INDEX_MAGIC:
+        raise ValueError(f"Unrecognised sample index: {path}")
+    body = memoryview(raw)[_INDEX_HEADER.size:]
+    usable = len(body) - len(body) % _INDEX_ENTRY.size
+    return list(_INDEX_ENTRY.iter_unpack(body[:usable]))
+
+
+def committed_count(run_dir: Path) -> int:
+    entries = read_index(run_dir)
+    return entries[-1][0] + entries[-1][1] if entries else 0
+
+
+def _chunk_crc(run_dir: Path, channels: Sequence[Tuple[str, str]], start: int, count: int) -> Optional[int]:
+    """CRC of one chunk as the recorder computed it; None if a column is too short."""
+    crc = 0
+    for name, dtype in channels:
+        size = np.dtype(dtype).itemsize
+        try:
+            with open(run_dir / f"{name}{COLUMN_SUFFIX}", "rb") as f:
+                f.seek(start * size)
+                data = f.read(count * size)
+        except FileNotFoundError:
+            return None
+        if len(data) != count * size:
+            return None
+        crc = zlib.crc32(data, crc)
+    return crc
+
+
+def seal_run_dir(run_dir: Path, verify_chunks: int = 4) -> Dict[str, int]:
+    """
+    Bring a run_dir left by a crashed recorder back to a consistent state.
+
+    The last `verify_chunks` index entries are checked against their CRC and
+    dropped, newest first, until one matches (earlier chunks were fsync'd
+    before later ones were written, so only the tail can be damaged); then
+    the index and every column file are truncated to the committed samples.
+    Returns {"samples": kept, "dropped_chunks": n, "trimmed_bytes": n}.
+    """
+    run_dir = Path(run_dir)
+    out = {"samples": 0, "dropped_chunks": 0, "trimmed_bytes": 0}
+    channels = read_channels(run_dir)
+    idx_path = run_dir / INDEX_FILE
+    if not channels or not idx_path.exists():
+        return out
+
+    entries = read_index(run_dir)
+    keep = len(entries)
+    while keep > 0 and len(entries) - keep < verify_chunks:
+        start, count, crc = entries[keep - 1]
+        if _chunk_crc(run_dir, channels, start, count) == crc:
+            break
+        keep -= 1
+    out["dropped_chunks"] = len(entries) - keep
+    committed = entries[keep - 1][0] + entries[keep - 1][1] if keep else 0
+    out["samples"] = committed
+
+    with open(idx_path, "r+b") as f:
+        if f.seek(0, os.SEEK_END) < _INDEX_HEADER.size:
+            f.truncate(0)
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, 0))
+        else:
+            f.truncate(_INDEX_HEADER.size + keep * _INDEX_ENTRY.size)
+        f.flush()
+        os.fsync(f.fileno())
+
+    for name, dtype in channels:
+        path = run_dir / f"{name}{COLUMN_SUFFIX}"
+        if not path.exists():
+            continue
+        end = committed * np.dtype(dtype).itemsize
+        size = path.stat().st_size
+        if size > end:
+            with open(path, "r+b") as f:
+                f.truncate(end)
+                os.fsync(f.fileno())
+            out["trimmed_bytes"] += size - end
+    return out
+
+
+def open_columns(run_dir: Path) -> Dict[str, np.ndarray]:
+    """
+    Memory-map every channel of a run, limited to the committed samples.
+    Nothing is read until the arrays are touched; a run with no data
+    returns empty arrays for the default channels.
+    """
+    run_dir = Path(run_dir)
+    channels = read_channels(run_dir) or DEFAULT_CHANNELS
+    n = committed_count(run_dir)
+    cols: Dict[str, np.ndarray] = {}
+    for name, dtype in channels:
+        if n == 0:
+            cols[name] = np.empty(0, dtype=dtype)
+        else:
+            cols[name] = np.memmap(run_dir / f"{name}{COLUMN_SUFFIX}", dtype=dtype, mode="r", shape=(n,))
+    return cols
+
+
+def iter_column_blocks(run_dir: Path, block: int = 65536) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield consecutive slices of the memory-mapped columns, at most `block` samples each."""
+    cols = open_columns(run_dir)
+    n = len(next(iter(cols.values()))) if cols else 0
+    for i in range(0, n, block):
+        yield {k: v[i:i + block] for k, v in cols.items()}
+
+
+def sample_summary(run_dir: Path) -> Dict[str, object]:
+    """Sample count, time span and per-channel min/max/mean, straight from the memmaps."""
+    cols = open_columns(run_dir)
+    t = cols.get("t")
+    n = 0 if t is None else len(t)
+    out: Dict[str, object] = {"count": n}
+    if n == 0:
+        return out
+    out["t_start"] = float(t[0])
+    out["t_end"] = float(t[-1])
+    out["channels"] = {
+        k: {"min": float(v.min()), "max": float(v.max()), "mean": float(v.mean(dtype=np.float64))}
+        for k, v in cols.items() if k != "t"
+    }
+    return out
+
+
+class RunRecorder:
+    """
+    Appends stream samples for one run to run_dir as typed column files.
+
+    Samples are buffered in memory and committed when CHUNK_SAMPLES is reached
+    or FLUSH_INTERVAL_S has passed since the last commit, whichever is first.
+    Reopening an existing run_dir continues after the last committed chunk
+    with the channels recorded in its manifest.
+    """
+
+    CHUNK_SAMPLES = 4096
+    FLUSH_INTERVAL_S = 1.0
+
+    def __init__(self, run_dir: Path, channels: Sequence[Tuple[str, str]] = DEFAULT_CHANNELS):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        existing = read_channels(self.run_dir)
+        if existing:
+            channels = existing
+        else:
+            (self.run_dir / MANIFEST_FILE).write_text(json.dumps(
+                {"version": 1, "channels": [{"name": n, "dtype": d} for n, d in channels]}
+            ))
+        self.channels = [(n, np.dtype(d)) for n, d in channels]
+
+        idx_path = self.run_dir / INDEX_FILE
+        entries = read_index(self.run_dir)
+        self.committed = entries[-1][0] + entries[-1][1] if entries else 0
+
+        self._idx = open(idx_path, "r+b" if idx_path.exists() else "w+b")
+        if not entries:
+            self._idx.truncate(0)
+            self._idx.write(_INDEX_HEADER.pack(_INDEX_MAGIC, 0))
+        else:
+            # drop a torn trailing entry, if any
+            self._idx.truncate(_INDEX_HEADER.size + len(entries) * _INDEX_ENTRY.size)
+        self._idx.seek(0, os.SEEK_END)
+
+        self._files = []
+        for name, dtype in self.channels:
+            path = self.run_dir / f"{name}{COLUMN_SUFFIX}"
+            f = open(path, "r+b" if path.exists() else "w+b")
+            end = self.committed * dtype.itemsize
+            f.truncate(end)     # discard uncommitted tail
+            f.seek(end)
+            self._files.append(f)
+
+        self._pending: List[np.ndarray] = []
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self.closed = False
+
+    def append(self, samples) -> int:
+        """
+        Append rows with one value per channel, e.g. (t, pos, force, temp).
+        Accepts a list of tuples or an (n, channels) array.
+        """
+        rows = np.asarray(samples, dtype=np.float64)
+        if rows.size == 0:
+            return 0
+        if rows.ndim != 2 or rows.shape[1] != len(self.channels):
+            raise ValueError(f"Expected rows of {len(self.channels)} values, got shape {rows.shape}")
+
+        with self._lock:
+            if self.closed:
+                raise ValueError("Recorder is closed")
+            self._pending.append(rows)
+            self._pending_count += len(rows)
+            if (self._pending_count >= self.CHUNK_SAMPLES
+                    or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL_S):
+                self._commit()
+        return len(rows)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self._commit()
+            for f in self._files:
+                f.close()
+            self._idx.close()
+            self.closed = True
+
+    def _commit(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending_count:
+            return
+        rows = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+
+        crc = 0
+        for i, ((_, dtype), f) in enumerate(zip(self.channels, self._files)):
+            data = np.ascontiguousarray(rows[:, i], dtype=dtype).tobytes()
+            crc = zlib.crc32(data, crc)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._idx.write(_INDEX_ENTRY.pack(self.committed, len(rows), crc))
+        self._idx.flush()
+        os.fsync(self._idx.fileno())
+
+        self.committed += len(rows)
+        self._pending.clear()
+        self._pending_count = 0
+
+
+# -------------------------
+# Active recorders (one per live run)
+# -------------------------
+
+_recorders: Dict[int, RunRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(run_id: int, run_dir: Optional[str] = None) -> Optional[RunRecorder]:
+    """
+    Return the open recorder for run_id, opening one in run_dir if needed.
+    With run_dir=None only an already-open recorder is returned.
+    """
+    with _recorders_lock:
+        rec = _recorders.get(run_id)
+        if rec is None and run_dir is not None:
+            rec = RunRecorder(Path(run_dir))
+            _recorders[run_id] = rec
+        return rec
+
+
+def close_recorder(run_id: int) -> None:
+    with _recorders_lock:
+        rec = _recorders.pop(run_id, None)
+    if rec is not None:
+        rec.close()
@@ -0,0 +1,303 @@
+# schema.py
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, Iterator, List
+
+# -------------------------
+# Schema migrations
+# -------------------------
+#
+# The database records the last migration applied in PRAGMA user_version.
+# migrate() applies the missing steps in order, each in its own
+# BEGIN IMMEDIATE transaction together with the user_version bump, so a
+# crash leaves the schema at a whole step. When the schema is current,
+# startup costs one PRAGMA read, however many steps there are.
+#
+# To change the schema, append a step. Never edit one that has shipped.
+#
+# Steps 1-4 predate user_version. Databases created before it report
+# version 0 but may already hold any part of those steps, so those steps
+# create with IF NOT EXISTS and probe for columns. Later steps can rely on
+# the exact schema the previous step left.
+
+# Snapshot parameters exposed as indexed generated columns on runs (param -> column)
+RUN_PARAM_COLUMNS = {
+    "speed": "p_speed",
+    "stroke_length_mm": "p_stroke_length_mm",
+    "clamp_force_g": "p_clamp_force_g",
+    "water_temp_c": "p_water_temp_c",
+    "cycles": "p_cycles",
+}
+
+# Entries of protocol_changes kept; a change feed client further behind gets the full list
+PROTOCOL_CHANGES_KEPT = 1000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _statements(script: str) -> Iterator[str]:
+    """Split a script into statements (trigger bodies included) for conn.execute."""
+    stmt = ""
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            yield stmt.strip()
+            stmt = ""
+    if stmt.strip():
+        raise ValueError(f"Incomplete SQL statement: {stmt.strip()[:60]}")
+
+
+def _run(conn: sqlite3.Connection, script: str) -> None:
+    # not executescript(): it commits first, which would end the step's transaction
+    for stmt in _statements(script):
+        conn.execute(stmt)
+
+
+def _column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    # table_xinfo also lists generated columns
+    rows = conn.execute(f"PRAGMA table_xinfo({table})").fetchall()
+    return any(r[1] == column for r in rows)
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless present (for the pre-user_version steps)."""
+    if _column_exists(conn, table, column):
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl};")
+    return True
+
+
+# -------------------------
+# Steps
+# -------------------------
+
+def _m1_base(conn: sqlite3.Connection) -> None:
+    """Protocols, runs and the analysis cache."""
+    _run(conn, """
+        CREATE TABLE IF NOT EXISTS protocols (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            speed REAL NOT NULL,
+            stroke_length_mm INTEGER NOT NULL,
+            clamp_force_g INTEGER NOT NULL,
+            water_temp_c INTEGER NOT NULL,
+            cycles INTEGER NOT NULL,
+
+            fixed_start_enabled INTEGER NOT NULL DEFAULT 0,
+            fixed_start_mm REAL NOT NULL DEFAULT 0,
+
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            protocol_id INTEGER NOT NULL,
+            protocol_snapshot_json TEXT NOT NULL,
+            status TEXT NOT NULL, -- queued, running, completed, aborted, failed, interrupted
+            started_at TEXT,
+            finished_at TEXT,
+            run_dir TEXT NOT NULL,
+            notes TEXT,
+            FOREIGN KEY(protocol_id) REFERENCES protocols(id) ON DELETE RESTRICT
+        );
+
+        CREATE TABLE IF NOT EXISTS run_analysis (
+            run_id INTEGER PRIMARY KEY,
+            data_hash TEXT NOT NULL,
+            result_json TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(run_id) REFERENCES runs(id) ON DELETE CASCADE
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_protocols_updated_at ON protocols(updated_at);
+        CREATE INDEX IF NOT EXISTS idx_runs_protocol_id ON runs(protocol_id);
+    """)
+
+    # tables from before the fixed-start option
+    _add_column(conn, "protocols", "fixed_start_enabled", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "protocols", "fixed_start_mm", "REAL NOT NULL DEFAULT 0")
+
+    # denormalised protocol name so run lists don't decode every snapshot
+    if _add_column(conn, "runs", "protocol_name", "TEXT"):
+        conn.execute(
+            "UPDATE runs SET protocol_name = COALESCE(json_extract(protocol_snapshot_json, '$.name'), 'Protocol ' || protocol_id);"
+        )
+
+    _run(conn, """
+        CREATE INDEX IF NOT EXISTS idx_runs_status_id ON runs(status, id);
+        CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at);
+    """)
+
+
+def _m2_search(conn: sqlite3.Connection) -> None:
+    """
+    Search support: snapshot parameters as virtual generated columns (indexed),
+    and external-content FTS5 tables over run notes/protocol names and
+    protocol names, kept in sync by triggers.
+    """
+    for param, col in RUN_PARAM_COLUMNS.items():
+        _add_column(conn, "runs", col,
+                    f"REAL GENERATED ALWAYS AS (json_extract(protocol_snapshot_json, '$.{param}')) VIRTUAL")
+        if param != "cycles":
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_runs_{col} ON runs({col});")
+
+    have_fts = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('runs_fts', 'protocols_fts')"
+    ).fetchall()
+    have = {r[0] for r in have_fts}
+
+    _run(conn, """
+        CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(
+            notes, protocol_name, content='runs', content_rowid='id'
+        );
+        CREATE TRIGGER IF NOT EXISTS runs_fts_ai AFTER INSERT ON runs BEGIN
+            INSERT INTO runs_fts(rowid, notes, protocol_name) VALUES (new.id, new.notes, new.protocol_name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS runs_fts_ad AFTER DELETE ON runs BEGIN
+            INSERT INTO runs_fts(runs_fts, rowid, notes, protocol_name) VALUES ('delete', old.id, old.notes, old.protocol_name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS runs_fts_au AFTER UPDATE OF notes, protocol_name ON runs BEGIN
+            INSERT INTO runs_fts(runs_fts, rowid, notes, protocol_name) VALUES ('delete', old.id, old.notes, old.protocol_name);
+            INSERT INTO runs_fts(rowid, notes, protocol_name) VALUES (new.id, new.notes, new.protocol_name);
+        END;
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS protocols_fts USING fts5(
+            name, content='protocols', content_rowid='id'
+        );
+        CREATE TRIGGER IF NOT EXISTS protocols_fts_ai AFTER INSERT ON protocols BEGIN
+            INSERT INTO protocols_fts(rowid, name) VALUES (new.id, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS protocols_fts_ad AFTER DELETE ON protocols BEGIN
+            INSERT INTO protocols_fts(protocols_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS protocols_fts_au AFTER UPDATE OF name ON protocols BEGIN
+            INSERT INTO protocols_fts(protocols_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO protocols_fts(rowid, name) VALUES (new.id, new.name);
+        END;
+
+        CREATE INDEX IF NOT EXISTS idx_protocols_clamp_force_g ON protocols(clamp_force_g);
+        CREATE INDEX IF NOT EXISTS idx_protocols_water_temp_c ON protocols(water_temp_c);
+    """)
+
+    # index rows that existed before the FTS tables did
+    if "runs_fts" not in have:
+        conn.execute("INSERT INTO runs_fts(runs_fts) VALUES ('rebuild');")
+    if "protocols_fts" not in have:
+        conn.execute("INSERT INTO protocols_fts(protocols_fts) VALUES ('rebuild');")
+
+
+def _m3_jobs(conn: sqlite3.Connection) -> None:
+    """Background jobs (jobs.py)."""
+    _run(conn, """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            run_id INTEGER,
+            params_json TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL, -- queued, running, cancelling, completed, failed, cancelled
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result_json TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+    """)
+
+
+def _m4_run_journal(conn: sqlite3.Connection) -> None:
+    """Liveness while running, and why a run ended abnormally (journal.py)."""
+    _add_column(conn, "runs", "heartbeat_at", "TEXT")
+    _add_column(conn, "runs", "end_reason", "TEXT")
+
+
+def _m5_protocol_changes(conn: sqlite3.Connection) -> None:
+    """
+    Change log of the protocols table, written by triggers so every writer is
+    covered. Its last seq is the protocol list's revision (ETag, change feed);
+    only the last PROTOCOL_CHANGES_KEPT entries are kept.
+    """
+    _run(conn, f"""
+        CREATE TABLE protocol_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            protocol_id INTEGER NOT NULL,
+            op TEXT NOT NULL -- upsert, delete
+        );
+
+        CREATE TRIGGER protocol_changes_ai AFTER INSERT ON protocols BEGIN
+            INSERT INTO protocol_changes(protocol_id, op) VALUES (new.id, 'upsert');
+        END;
+        CREATE TRIGGER protocol_changes_au AFTER UPDATE ON protocols BEGIN
+            INSERT INTO protocol_changes(protocol_id, op) VALUES (new.id, 'upsert');
+        END;
+        CREATE TRIGGER protocol_changes_ad AFTER DELETE ON protocols BEGIN
+            INSERT INTO protocol_changes(protocol_id, op) VALUES (old.id, 'delete');
+        END;
+        CREATE TRIGGER protocol_changes_trim AFTER INSERT ON protocol_changes BEGIN
+            DELETE FROM protocol_changes WHERE seq <= new.seq - {PROTOCOL_CHANGES_KEPT};
+        END;
+    """)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "base", _m1_base),
+    Migration(2, "search", _m2_search),
+    Migration(3, "jobs", _m3_jobs),
+    Migration(4, "run_journal", _m4_run_journal),
+    Migration(5, "protocol_changes", _m5_protocol_changes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[str]:
+    """
+    Bring the database up to SCHEMA_VERSION; return the names of the steps
+    applied (empty when it was already current). Raises RuntimeError for a
+    database written by a newer version of this code.
+    """
+    version = schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return []
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this code ({SCHEMA_VERSION})")
+
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for step in MIGRATIONS:
+        if step.version <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another process may have migrated while we waited for the lock
+            current = schema_version(conn)
+            if current >= step.version:
+                conn.execute("ROLLBACK")
+                version = current
+                continue
+            step.apply(conn)
+            conn.execute(f"PRAGMA user_version = {step.version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        version = step.version
+        applied.append(step.name)
+    return applied
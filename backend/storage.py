@@ -1,13 +1,23 @@
 # storage.py
 from __future__ import annotations
 
+import io
 import os
 import json
+import queue
+import shutil
 import sqlite3
-from dataclasses import dataclass, asdict
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, fields
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional, List, Dict
+from typing import Any, Callable, Optional, List, Dict, Iterator, Tuple
+
+import numpy as np
+
+from .recorder import committed_count, iter_column_blocks
+from .schema import RUN_PARAM_COLUMNS, migrate
 
 # -------------------------
 # Project-local data paths
@@ -25,65 +35,143 @@ def _utc_now_iso() -> str:
     return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
-def connect() -> sqlite3.Connection:
-    # Ensure folders exist
+_dirs_ready = False
+
+
+def _ensure_dirs() -> None:
+    global _dirs_ready
+    if _dirs_ready:
+        return
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)   # data/db
     TRIALS_DIR.mkdir(parents=True, exist_ok=True)       # data/trials
+    _dirs_ready = True
+
 
-    conn = sqlite3.connect(DB_PATH)
+def connect() -> sqlite3.Connection:
+    """
+    Open a new connection. The API uses the shared pool (get_pool) instead;
+    this is for scripts and one-off callers.
+    """
+    _ensure_dirs()
+
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA busy_timeout = 5000;")
+    # WAL: readers (history browsing) don't block the writer (live run) and vice versa.
+    # NORMAL is durable across app crashes in WAL mode; only power loss can drop the last commits.
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
     return conn
 
 
-def _column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
-    rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
-    return any(r["name"] == column for r in rows)
+class ConnectionPool:
+    """
+    Long-lived connections handed out one caller at a time.
 
-def init_db(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS protocols (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            speed REAL NOT NULL,
-            stroke_length_mm INTEGER NOT NULL,
-            clamp_force_g INTEGER NOT NULL,
-            water_temp_c INTEGER NOT NULL,
-            cycles INTEGER NOT NULL,
-
-            fixed_start_enabled INTEGER NOT NULL DEFAULT 0,
-            fixed_start_mm REAL NOT NULL DEFAULT 0,
-
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS runs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            protocol_id INTEGER NOT NULL,
-            protocol_snapshot_json TEXT NOT NULL,
-            status TEXT NOT NULL, -- queued, running, completed, aborted, failed
-            started_at TEXT,
-            finished_at TEXT,
-            run_dir TEXT NOT NULL,
-            notes TEXT,
-            FOREIGN KEY(protocol_id) REFERENCES protocols(id) ON DELETE RESTRICT
-        );
-
-        CREATE INDEX IF NOT EXISTS idx_protocols_updated_at ON protocols(updated_at);
-        CREATE INDEX IF NOT EXISTS idx_runs_protocol_id ON runs(protocol_id);
-        """
-    )
+    Connections are opened lazily and kept (up to max_idle) for reuse, so the
+    per-request cost is a queue get/put; each keeps its own prepared
+    statement cache. check_same_thread is off because FastAPI may run a
+    dependency and its endpoint on different worker threads; a connection is
+    still only ever used by one caller at a time.
+    """
 
-    # --- ✅ MIGRATION for existing DBs (if table existed before new columns) ---
-    if not _column_exists(conn, "protocols", "fixed_start_enabled"):
-        conn.execute("ALTER TABLE protocols ADD COLUMN fixed_start_enabled INTEGER NOT NULL DEFAULT 0;")
-    if not _column_exists(conn, "protocols", "fixed_start_mm"):
-        conn.execute("ALTER TABLE protocols ADD COLUMN fixed_start_mm REAL NOT NULL DEFAULT 0;")
+    def __init__(self, max_idle: int = 8):
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._max_idle = max_idle
+        self._lock = threading.Lock()
+        self._all: List[sqlite3.Connection] = []
 
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect()
+            with self._lock:
+                self._all.append(conn)
+            return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()     # never hand out a connection mid-transaction
+        if self._idle.qsize() < self._max_idle:
+            self._idle.put(conn)
+        else:
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self) -> None:
+        with self._lock:
+            conns, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for c in conns:
+            try:
+                c.close()
+            except sqlite3.Error:
+                pass
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    One write transaction around several storage calls made with
+    commit=False: committed when the block ends, rolled back if it raises.
+    BEGIN IMMEDIATE takes the write lock up front, so a batch never fails
+    halfway for want of it.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
     conn.commit()
 
+
+def init_db(conn: sqlite3.Connection) -> List[str]:
+    """
+    Create or upgrade the schema (see schema.py); returns the migration
+    steps applied. A no-op apart from one PRAGMA read when already current.
+    """
+    return migrate(conn)
+
+
 @dataclass
 class Protocol:
     id: Optional[int]
@@ -112,20 +200,99 @@ class RunRow:
     finished_at: Optional[str]
     run_dir: str
     notes: Optional[str]
+    protocol_name: Optional[str] = None
+    heartbeat_at: Optional[str] = None
+    end_reason: Optional[str] = None
+
+_RUN_FIELDS = [f.name for f in fields(RunRow)]
+_PROTOCOL_FIELDS = [f.name for f in fields(Protocol)]
+
+
+def _run_row(row: sqlite3.Row) -> RunRow:
+    # runs also carries generated search columns; keep only the dataclass fields
+    return RunRow(**{k: row[k] for k in _RUN_FIELDS})
+
+
+def _protocol_row(row: sqlite3.Row) -> Protocol:
+    return Protocol(**{k: row[k] for k in _PROTOCOL_FIELDS})
+
 
 def list_protocols(conn: sqlite3.Connection) -> List[Protocol]:
+    # id breaks ties so clients can place changed rows (change feed) in the same order
+    rows = conn.execute(
+        "SELECT * FROM protocols ORDER BY updated_at DESC, id DESC"
+    ).fetchall()
+    return [_protocol_row(r) for r in rows]
+
+
+# -------------------------
+# Protocol revision / cache / changes
+# -------------------------
+#
+# Every write to protocols is logged in protocol_changes by triggers
+# (schema.py), so the log's last seq is a revision of the whole list that no
+# writer can bypass. The list is cached per revision: while it is unchanged a
+# request costs one index lookup.
+
+_protocol_cache: Optional[Tuple[int, List[Protocol]]] = None
+_protocol_cache_lock = threading.Lock()
+
+
+def protocols_revision(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT MAX(seq) FROM protocol_changes").fetchone()[0] or 0
+
+
+def cached_protocols(conn: sqlite3.Connection) -> Tuple[int, List[Protocol]]:
+    """(revision, protocols in list_protocols order); the list must not be modified."""
+    global _protocol_cache
+    revision = protocols_revision(conn)
+    with _protocol_cache_lock:
+        cached = _protocol_cache
+    if cached is not None and cached[0] == revision:
+        return cached
+    # read after the revision, so the list is at least that recent
+    cached = (revision, list_protocols(conn))
+    with _protocol_cache_lock:
+        _protocol_cache = cached
+    return cached
+
+
+def protocol_changes_since(conn: sqlite3.Connection, since: int) -> Dict[str, Any]:
+    """
+    What changed in the protocol list after revision `since`:
+    {"revision", "reset", "protocols": [Protocol], "deleted": [id]}.
+    reset=True (with the full list in protocols) when `since` is 0, from a
+    different database, or older than the change log goes back.
+    """
+    revision, items = cached_protocols(conn)
+    oldest = conn.execute("SELECT MIN(seq) FROM protocol_changes").fetchone()[0] or 0
+    if since <= 0 or since > revision or since < oldest - 1:
+        return {"revision": revision, "reset": True, "protocols": list(items), "deleted": []}
+
+    # last operation per protocol within (since, revision]
     rows = conn.execute(
-        "SELECT * FROM protocols ORDER BY updated_at DESC"
+        """
+        SELECT protocol_id, op FROM protocol_changes
+        WHERE seq IN (
+            SELECT MAX(seq) FROM protocol_changes WHERE seq > ? AND seq <= ? GROUP BY protocol_id
+        )
+        """,
+        (since, revision),
     ).fetchall()
-    return [Protocol(**dict(r)) for r in rows]
+    upserted = {r["protocol_id"] for r in rows if r["op"] == "upsert"}
+    deleted = sorted(r["protocol_id"] for r in rows if r["op"] == "delete")
+    protocols = [p for p in items if p.id in upserted]
+    # upserted but missing from the list: deleted after it was read
+    deleted += sorted(upserted - {p.id for p in protocols})
+    return {"revision": revision, "reset": False, "protocols": protocols, "deleted": deleted}
 
 
 def get_protocol(conn: sqlite3.Connection, protocol_id: int) -> Optional[Protocol]:
     row = conn.execute("SELECT * FROM protocols WHERE id = ?", (protocol_id,)).fetchone()
-    return Protocol(**dict(row)) if row else None
+    return _protocol_row(row) if row else None
 
 
-def create_protocol(conn: sqlite3.Connection, p: Protocol) -> int:
+def create_protocol(conn: sqlite3.Connection, p: Protocol, commit: bool = True) -> int:
     now = _utc_now_iso()
     cur = conn.execute(
         """
@@ -149,11 +316,12 @@ def create_protocol(conn: sqlite3.Connection, p: Protocol) -> int:
             now,
         ),
     )
-    conn.commit()
+    if commit:
+        conn.commit()
     return int(cur.lastrowid)
 
 
-def update_protocol(conn: sqlite3.Connection, protocol_id: int, fields: Dict[str, Any]) -> None:
+def update_protocol(conn: sqlite3.Connection, protocol_id: int, fields: Dict[str, Any], commit: bool = True) -> None:
     allowed = {
         "name", "speed", "stroke_length_mm", "clamp_force_g", "water_temp_c", "cycles",
         "fixed_start_enabled", "fixed_start_mm",
@@ -174,11 +342,13 @@ def update_protocol(conn: sqlite3.Connection, protocol_id: int, fields: Dict[str
     sets = ", ".join([f"{k} = ?" for k in fields.keys()])
     vals = list(fields.values()) + [protocol_id]
     conn.execute(f"UPDATE protocols SET {sets} WHERE id = ?", vals)
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def delete_protocol(conn: sqlite3.Connection, protocol_id: int) -> None:
+def delete_protocol(conn: sqlite3.Connection, protocol_id: int, commit: bool = True) -> None:
     conn.execute("DELETE FROM protocols WHERE id = ?", (protocol_id,))
-    conn.commit()
+    if commit:
+        conn.commit()
 
 
 def create_run(conn: sqlite3.Connection, protocol: Protocol, notes: str | None = None) -> int:
@@ -189,44 +359,74 @@ def create_run(conn: sqlite3.Connection, protocol: Protocol, notes: str | None =
     """
     safe_name = "".join([c if c.isalnum() or c in "-_ " else "_" for c in protocol.name]).strip().replace(" ", "-")
     run_stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-    run_dir = TRIALS_DIR / f"{run_stamp}_{safe_name}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    # the stamp only has seconds: a second run of the same protocol in the
+    # same second gets a suffix instead of sharing the folder
+    base = f"{run_stamp}_{safe_name}"
+    run_dir = TRIALS_DIR / base
+    suffix = 1
+    while True:
+        try:
+            run_dir.mkdir(parents=True, exist_ok=False)
+            break
+        except FileExistsError:
+            suffix += 1
+            run_dir = TRIALS_DIR / f"{base}_{suffix}"
 
     snapshot = asdict(protocol)
     snapshot.pop("id", None)
 
     cur = conn.execute(
         """
-        INSERT INTO runs (protocol_id, protocol_snapshot_json, status, started_at, finished_at, run_dir, notes)
-        VALUES (?, ?, 'queued', NULL, NULL, ?, ?)
+        INSERT INTO runs (protocol_id, protocol_snapshot_json, protocol_name, status, started_at, finished_at, run_dir, notes)
+        VALUES (?, ?, ?, 'queued', NULL, NULL, ?, ?)
         """,
-        (protocol.id, json.dumps(snapshot), str(run_dir), notes),
+        (protocol.id, json.dumps(snapshot), protocol.name, str(run_dir), notes),
     )
     conn.commit()
     return int(cur.lastrowid)
 
 
-def mark_run_status(conn: sqlite3.Connection, run_id: int, status: str) -> None:
-    allowed = {"queued", "running", "completed", "aborted", "failed"}
-    if status not in allowed:
+RUN_STATUSES = {"queued", "running", "completed", "aborted", "failed", "interrupted"}
+# interrupted: the kiosk or backend went away mid-run (set by journal.py)
+FINISHED_STATUSES = {"completed", "aborted", "failed", "interrupted"}
+
+
+def mark_run_status(conn: sqlite3.Connection, run_id: int, status: str, reason: Optional[str] = None,
+                    commit: bool = True) -> None:
+    if status not in RUN_STATUSES:
         raise ValueError(f"Invalid status: {status}")
 
     if status == "running":
+        now = _utc_now_iso()
         conn.execute(
-            "UPDATE runs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
-            (status, _utc_now_iso(), run_id),
+            "UPDATE runs SET status = ?, started_at = COALESCE(started_at, ?), heartbeat_at = ? WHERE id = ?",
+            (status, now, now, run_id),
         )
-    elif status in {"completed", "aborted", "failed"}:
+    elif status in FINISHED_STATUSES:
         conn.execute(
-            "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
-            (status, _utc_now_iso(), run_id),
+            "UPDATE runs SET status = ?, finished_at = ?, end_reason = ? WHERE id = ?",
+            (status, _utc_now_iso(), reason, run_id),
         )
     else:
         conn.execute("UPDATE runs SET status = ? WHERE id = ?", (status, run_id))
 
+    if commit:
+        conn.commit()
+
+def touch_run_heartbeat(conn: sqlite3.Connection, run_id: int) -> None:
+    conn.execute("UPDATE runs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (_utc_now_iso(), run_id))
     conn.commit()
 
-def _run_protocol_name(run: RunRow) -> str:
+
+def list_orphaned_runs(conn: sqlite3.Connection) -> List[RunRow]:
+    """Runs still marked running (uses idx_runs_status_id, however many runs there are)."""
+    rows = conn.execute("SELECT * FROM runs WHERE status = 'running' ORDER BY id").fetchall()
+    return [_run_row(r) for r in rows]
+
+
+def run_protocol_name(run: RunRow) -> str:
+    if run.protocol_name:
+        return run.protocol_name
     try:
         snap = json.loads(run.protocol_snapshot_json or "{}")
         return snap.get("name") or f"Protocol {run.protocol_id}"
@@ -234,33 +434,289 @@ def _run_protocol_name(run: RunRow) -> str:
         return f"Protocol {run.protocol_id}"
 
 
-def list_runs(conn: sqlite3.Connection) -> List[RunRow]:
-    rows = conn.execute(
-        "SELECT * FROM runs ORDER BY id DESC"
-    ).fetchall()
-    return [RunRow(**dict(r)) for r in rows]
+def list_runs(
+    conn: sqlite3.Connection,
+    before_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    statuses: Optional[List[str]] = None,
+    protocol_id: Optional[int] = None,
+    started_from: Optional[str] = None,
+    started_to: Optional[str] = None,
+) -> List[RunRow]:
+    """
+    Runs newest first. Keyset pagination: pass the last id of the previous
+    page as before_id. started_from is inclusive, started_to exclusive
+    (ISO-8601 strings, compared as text like started_at itself).
+    """
+    where: List[str] = []
+    args: List[Any] = []
+    if before_id is not None:
+        where.append("id < ?")
+        args.append(before_id)
+    if statuses:
+        where.append(f"status IN ({', '.join('?' * len(statuses))})")
+        args.extend(statuses)
+    if protocol_id is not None:
+        where.append("protocol_id = ?")
+        args.append(protocol_id)
+    if started_from:
+        where.append("started_at >= ?")
+        args.append(started_from)
+    if started_to:
+        where.append("started_at < ?")
+        args.append(started_to)
+
+    sql = "SELECT * FROM runs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        args.append(limit)
+
+    rows = conn.execute(sql, args).fetchall()
+    return [_run_row(r) for r in rows]
 
 
 def get_run(conn: sqlite3.Connection, run_id: int) -> Optional[RunRow]:
     row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
-    return RunRow(**dict(row)) if row else None
+    return _run_row(row) if row else None
 
 
-def delete_run(conn: sqlite3.Connection, run_id: int, delete_files: bool = False) -> None:
+def delete_run(conn: sqlite3.Connection, run_id: int, delete_files: bool = False,
+               commit: bool = True) -> Optional[str]:
+    """
+    Delete the run's row; returns its run_dir (None if there was no such run).
+    Files are only removed here with commit=True: inside a caller's
+    transaction, pass the returned dirs to remove_run_dirs once it commits.
+    """
     r = get_run(conn, run_id)
     if not r:
-        return
+        return None
 
     conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+    if not commit:
+        return r.run_dir
     conn.commit()
 
     if delete_files:
-        # optional: remove run directory contents
-        try:
-            import shutil
-            shutil.rmtree(r.run_dir, ignore_errors=True)
-        except Exception:
-            pass
+        remove_run_dirs([r.run_dir])
+    return r.run_dir
+
+
+def remove_run_dirs(paths: List[str], progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Remove run directories; returns how many were removed. Only folders
+    directly under TRIALS_DIR are removed, anything else (exports, the
+    database folder, paths outside DATA_DIR) is skipped. progress(done,
+    total) is called after each one.
+    """
+    trials = TRIALS_DIR.resolve()
+    removed = 0
+    for i, path in enumerate(paths):
+        p = Path(path).resolve()
+        if p.parent == trials and p.is_dir():
+            shutil.rmtree(p, ignore_errors=True)
+            removed += 1
+        if progress is not None:
+            progress(i + 1, len(paths))
+    return removed
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word must match, as a
+    prefix, so "water 37" finds "water bath 37C". FTS syntax is not exposed.
+    """
+    words = ["".join(ch for ch in w if ch.isalnum() or ch in "-_") for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words if w)
+
+
+def _range_clauses(ranges: Dict[str, Any], columns: Dict[str, str], where: List[str], args: List[Any]) -> None:
+    for param, (lo, hi) in ranges.items():
+        col = columns[param]
+        if lo is not None:
+            where.append(f"{col} >= ?")
+            args.append(lo)
+        if hi is not None:
+            where.append(f"{col} <= ?")
+            args.append(hi)
+
+
+def search_runs(
+    conn: sqlite3.Connection,
+    text: Optional[str] = None,
+    ranges: Optional[Dict[str, Any]] = None,
+    statuses: Optional[List[str]] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[tuple]:
+    """
+    Runs matching free text (notes, protocol name) and snapshot parameter
+    ranges {param: (min, max)}. Returns (RunRow, score) best first; score
+    is bm25 (lower is better) when text is given, else None and newest first.
+    """
+    where: List[str] = []
+    args: List[Any] = []
+    q = fts_query(text) if text else ""
+
+    if q:
+        sql = "SELECT runs.*, bm25(runs_fts) AS score FROM runs_fts JOIN runs ON runs.id = runs_fts.rowid"
+        where.append("runs_fts MATCH ?")
+        args.append(q)
+        order = "score, runs.id DESC"
+    else:
+        sql = "SELECT runs.*, NULL AS score FROM runs"
+        order = "runs.id DESC"
+
+    _range_clauses(ranges or {}, {p: f"runs.{c}" for p, c in RUN_PARAM_COLUMNS.items()}, where, args)
+    if statuses:
+        where.append(f"runs.status IN ({', '.join('?' * len(statuses))})")
+        args.extend(statuses)
+
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+    args += [limit, offset]
+    return [(_run_row(r), r["score"]) for r in conn.execute(sql, args).fetchall()]
+
+
+def search_protocols(
+    conn: sqlite3.Connection,
+    text: Optional[str] = None,
+    ranges: Optional[Dict[str, Any]] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[tuple]:
+    """Protocols by name text and parameter ranges; same conventions as search_runs."""
+    where: List[str] = []
+    args: List[Any] = []
+    q = fts_query(text) if text else ""
+
+    if q:
+        sql = ("SELECT protocols.*, bm25(protocols_fts) AS score FROM protocols_fts "
+               "JOIN protocols ON protocols.id = protocols_fts.rowid")
+        where.append("protocols_fts MATCH ?")
+        args.append(q)
+        order = "score, protocols.id DESC"
+    else:
+        sql = "SELECT protocols.*, NULL AS score FROM protocols"
+        order = "protocols.updated_at DESC"
+
+    _range_clauses(ranges or {}, {p: f"protocols.{p}" for p in RUN_PARAM_COLUMNS}, where, args)
+
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+    args += [limit, offset]
+    return [(_protocol_row(r), r["score"]) for r in conn.execute(sql, args).fetchall()]
+
+
+# -------------------------
+# Background jobs (see jobs.py)
+# -------------------------
+
+JOB_ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+
+@dataclass
+class JobRow:
+    id: int
+    kind: str
+    run_id: Optional[int]
+    params_json: str
+    status: str
+    progress: float
+    message: Optional[str]
+    result_json: Optional[str]
+    error: Optional[str]
+    created_at: str
+    started_at: Optional[str]
+    finished_at: Optional[str]
+
+
+def create_job(conn: sqlite3.Connection, kind: str, run_id: Optional[int], params: Dict[str, Any]) -> int:
+    cur = conn.execute(
+        "INSERT INTO jobs (kind, run_id, params_json, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+        (kind, run_id, json.dumps(params), _utc_now_iso()),
+    )
+    conn.commit()
+    return int(cur.lastrowid)
+
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> Optional[JobRow]:
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return JobRow(**dict(row)) if row else None
+
+
+def list_jobs(conn: sqlite3.Connection, limit: int = 50, active_only: bool = False) -> List[JobRow]:
+    sql = "SELECT * FROM jobs"
+    if active_only:
+        sql += " WHERE status IN ('queued', 'running', 'cancelling')"
+    rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [JobRow(**dict(r)) for r in rows]
+
+
+def start_job(conn: sqlite3.Connection, job_id: int) -> bool:
+    """queued -> running; False if the job was cancelled (or claimed) meanwhile."""
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+        (_utc_now_iso(), job_id),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def set_job_progress(conn: sqlite3.Connection, job_id: int, progress: float, message: Optional[str] = None) -> str:
+    """Record progress and return the job's current status (to notice cancellation)."""
+    conn.execute(
+        "UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+        (progress, message, job_id),
+    )
+    conn.commit()
+    row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row["status"] if row else "cancelled"
+
+
+def finish_job(conn: sqlite3.Connection, job_id: int, status: str,
+               result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+    if status not in {"completed", "failed", "cancelled"}:
+        raise ValueError(f"Invalid job status: {status}")
+    conn.execute(
+        """
+        UPDATE jobs SET status = ?, result_json = ?, error = ?, finished_at = ?,
+            progress = CASE WHEN ? = 'completed' THEN 1 ELSE progress END
+        WHERE id = ?
+        """,
+        (status, json.dumps(result) if result is not None else None, error, _utc_now_iso(), status, job_id),
+    )
+    conn.commit()
+
+
+def request_job_cancel(conn: sqlite3.Connection, job_id: int) -> Optional[str]:
+    """
+    Cancel a queued job outright, or ask a running one to stop (it notices
+    on its next progress update). Returns the new status, None if unknown.
+    """
+    conn.execute(
+        "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+        (_utc_now_iso(), job_id),
+    )
+    conn.execute("UPDATE jobs SET status = 'cancelling' WHERE id = ? AND status = 'running'", (job_id,))
+    conn.commit()
+    row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row["status"] if row else None
+
+
+def fail_stale_jobs(conn: sqlite3.Connection) -> int:
+    """Jobs left active by a previous process can never finish; mark them failed."""
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'failed', error = 'interrupted by restart', finished_at = ? "
+        "WHERE status IN ('queued', 'running', 'cancelling')",
+        (_utc_now_iso(),),
+    )
+    conn.commit()
+    return cur.rowcount
 
 
 def get_run_snapshot(run: RunRow) -> Dict[str, Any]:
@@ -270,42 +726,79 @@ def get_run_snapshot(run: RunRow) -> Dict[str, Any]:
         return {}
 
 
-def export_run_csv(conn: sqlite3.Connection, run_id: int) -> str:
+def get_cached_analysis(conn: sqlite3.Connection, run_id: int, data_hash: str) -> Optional[str]:
+    row = conn.execute(
+        "SELECT result_json FROM run_analysis WHERE run_id = ? AND data_hash = ?",
+        (run_id, data_hash),
+    ).fetchone()
+    return row["result_json"] if row else None
+
+
+def put_cached_analysis(conn: sqlite3.Connection, run_id: int, data_hash: str, result_json: str) -> None:
+    conn.execute(
+        """
+        INSERT INTO run_analysis (run_id, data_hash, result_json, created_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(run_id) DO UPDATE SET
+            data_hash = excluded.data_hash,
+            result_json = excluded.result_json,
+            created_at = excluded.created_at
+        """,
+        (run_id, data_hash, result_json, _utc_now_iso()),
+    )
+    conn.commit()
+
+
+# CSV column names for known channels; extra channels export under their own name
+CSV_COLUMNS = {"t": "t_s", "pos": "position_mm", "force": "force_n", "temp": "temp_c"}
+
+
+def iter_run_csv(conn: sqlite3.Connection, run_id: int) -> Iterator[str]:
     """
-    Export CSV from a standard JSON file if it exists in run_dir.
-    You can change this to whatever format you actually save.
+    Return a generator of CSV text blocks for a run: the header, then one
+    block per slice of the memory-mapped sample columns. Memory use is
+    bounded by the block size, not the run length.
 
-    Expected file (example): <run_dir>/points.json
-      [{"t":0.0,"pos":0.0,"force":0.1}, ...]
+    The run is looked up eagerly (ValueError if missing); the returned
+    generator only touches run_dir, so it can outlive the connection.
     """
     r = get_run(conn, run_id)
     if not r:
         raise ValueError("Run not found")
+    return iter_csv_blocks(Path(r.run_dir))
 
-    run_dir = Path(r.run_dir)
-    points_path = run_dir / "points.json"
 
-    points: List[Dict[str, Any]] = []
-    if points_path.exists():
-        try:
-            points = json.loads(points_path.read_text())
-        except Exception:
-            points = []
+def iter_csv_blocks(run_dir: Path) -> Iterator[str]:
+    """CSV text blocks for the samples in run_dir (header first)."""
+    first = True
+    for cols in iter_column_blocks(run_dir):
+        if first:
+            yield ",".join(CSV_COLUMNS.get(k, k) for k in cols) + "\n"
+            first = False
+        buf = io.StringIO()
+        fmt = ["%.6f" if k == "t" else "%.7g" for k in cols]
+        np.savetxt(buf, np.column_stack(list(cols.values())), fmt=fmt, delimiter=",")
+        yield buf.getvalue()
+    if first:
+        yield ",".join(CSV_COLUMNS.values()) + "\n"
 
-    # Header + rows
-    lines = ["t_s,position_mm,force_n"]
-    for p in points:
-        t = p.get("t", 0)
-        pos = p.get("pos", 0)
-        force = p.get("force", 0)
-        lines.append(f"{t},{pos},{force}")
 
-    return "\n".join(lines)
+def export_run_csv(conn: sqlite3.Connection, run_id: int) -> str:
+    """
+    Export the whole run as one CSV string. Prefer iter_run_csv for large runs.
+    """
+    return "".join(iter_run_csv(conn, run_id))
 
 
-def write_export_file(conn: sqlite3.Connection, run_id: int, fmt: str = "csv") -> str:
+def write_export_file(conn: sqlite3.Connection, run_id: int, fmt: str = "csv",
+                      progress: Optional[Callable[[int, int], None]] = None) -> str:
     """
     Writes an export file into the run_dir and returns the full path.
+    Rows are streamed to a temp file which then replaces export.csv,
+    so a reader never sees a half-written export.
+
+    progress(samples_written, total_samples) is called after each block; an
+    exception raised from it abandons the export (the temp file is removed).
     """
     r = get_run(conn, run_id)
     if not r:
@@ -315,9 +808,21 @@ def write_export_file(conn: sqlite3.Connection, run_id: int, fmt: str = "csv") -
     run_dir.mkdir(parents=True, exist_ok=True)
 
     if fmt.lower() == "csv":
-        content = export_run_csv(conn, run_id)
         out_path = run_dir / "export.csv"
-        out_path.write_text(content)
+        tmp_path = run_dir / "export.csv.tmp"
+        total = committed_count(run_dir)
+        done = 0
+        try:
+            with open(tmp_path, "w", newline="") as f:
+                for block in iter_run_csv(conn, run_id):
+                    f.write(block)
+                    if progress is not None:
+                        done = min(total, done + block.count("\n"))
+                        progress(done, total)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, out_path)
         return str(out_path)
 
     raise ValueError("Unsupported export format")
@@ -0,0 +1,182 @@
+# telemetry.py
+from __future__ import annotations
+
+import struct
+from binascii import crc_hqx
+from typing import Dict, List, Optional, Tuple
+
+# -------------------------
+# Binary telemetry framing
+# -------------------------
+#
+# When the ESP32 is asked for binary streaming (CMD START_STREAM ... format=bin)
+# it interleaves framed records with the normal text lines:
+#
+#   A5 5A | type:u8 | length:u16 LE | payload[length] | crc:u16 LE
+#
+# crc is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over type+length+payload.
+# A SAMPLES frame carries N packed records of <t:f64 s, pos:f32 mm, force:f32 N, temp:f32 C>.
+#
+# 0xA5 can never start a UTF-8 text line (it is a continuation byte), so text
+# and frames can share one byte stream without escaping.
+
+SYNC = b"\xA5\x5A"
+FRAME_SAMPLES = 0x01
+
+_HEADER = struct.Struct("<2sBH")
+_CRC = struct.Struct("<H")
+SAMPLE = struct.Struct("<dfff")
+
+HEADER_SIZE = _HEADER.size
+CRC_SIZE = _CRC.size
+MAX_PAYLOAD = 4096
+
+Sample = Tuple[float, float, float, float]   # (t, pos, force, temp)
+
+
+def crc16(data) -> int:
+    return crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(ftype: int, payload: bytes) -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Frame payload too large: {len(payload)}")
+    head = _HEADER.pack(SYNC, ftype, len(payload))
+    return head + payload + _CRC.pack(crc16(head[2:] + payload))
+
+
+def encode_samples(samples: List[Sample]) -> bytes:
+    """
+    Pack samples into one or more SAMPLES frames (split at MAX_PAYLOAD).
+    Used by the device simulator and tooling; the firmware does the same thing.
+    """
+    per_frame = MAX_PAYLOAD // SAMPLE.size
+    out = bytearray()
+    for i in range(0, len(samples), per_frame):
+        payload = b"".join(SAMPLE.pack(*s) for s in samples[i:i + per_frame])
+        out += encode_frame(FRAME_SAMPLES, payload)
+    return bytes(out)
+
+
+class TelemetryDecoder:
+    """
+    Splits the serial byte stream into text lines and binary sample frames.
+
+    Incoming bytes are copied once into a fixed-size buffer; parsing walks a
+    read index forward over a memoryview, so consuming a line or frame never
+    shifts the remaining data. The unread tail is moved to the front only when
+    a write would run past the end of the buffer.
+    """
+
+    def __init__(self, capacity: int = 64 * 1024):
+        # must hold at least a couple of max-size frames
+        capacity = max(capacity, 2 * (HEADER_SIZE + MAX_PAYLOAD + CRC_SIZE))
+        self._buf = bytearray(capacity)
+        self._mv = memoryview(self._buf)
+        self._cap = capacity
+        self._r = 0
+        self._w = 0
+
+        # counters (useful when tuning stream rates)
+        self.crc_errors = 0
+        self.dropped_bytes = 0
+
+    def reset(self) -> None:
+        self._r = self._w = 0
+
+    def feed(self, data) -> Tuple[List[str], List[Sample]]:
+        """
+        Append raw bytes and return (complete text lines, decoded samples).
+        Partial lines/frames stay buffered until the next call.
+        """
+        n = len(data)
+        if n:
+            if self._w + n > self._cap:
+                self._compact()
+            if self._w + n > self._cap:
+                # Nothing parseable fits: drop what we have and keep the newest bytes.
+                self.dropped_bytes += self._w - self._r
+                self._r = self._w = 0
+                if n > self._cap:
+                    self.dropped_bytes += n - self._cap
+                    data = memoryview(data)[n - self._cap:]
+                    n = self._cap
+            self._mv[self._w:self._w + n] = data
+            self._w += n
+
+        return self._parse()
+
+    def _compact(self) -> None:
+        pending = self._w - self._r
+        if self._r:
+            self._mv[:pending] = self._mv[self._r:self._w]
+        self._r = 0
+        self._w = pending
+
+    def _parse(self) -> Tuple[List[str], List[Sample]]:
+        buf, mv = self._buf, self._mv
+        r, w = self._r, self._w
+        lines: List[str] = []
+        samples: List[Sample] = []
+
+        while r < w:
+            if buf[r] == 0xA5:
+                if w - r < HEADER_SIZE:
+                    break
+                sync, ftype, length = _HEADER.unpack_from(buf, r)
+                if sync != SYNC or length > MAX_PAYLOAD:
+                    r += 1
+                    continue
+
+                end = r + HEADER_SIZE + length + CRC_SIZE
+                if end > w:
+                    break
+
+                (crc,) = _CRC.unpack_from(buf, end - CRC_SIZE)
+                if crc16(mv[r + 2:end - CRC_SIZE]) != crc:
+                    self.crc_errors += 1
+                    r += 1
+                    continue
+
+                if ftype == FRAME_SAMPLES and length % SAMPLE.size == 0:
+                    samples.extend(SAMPLE.iter_unpack(mv[r + HEADER_SIZE:end - CRC_SIZE]))
+                r = end
+                continue
+
+            nl = buf.find(b"\n", r, w)
+            if nl < 0:
+                break
+            lines.append(str(mv[r:nl], "utf-8", errors="replace").rstrip("\r"))
+            r = nl + 1
+
+        if r == w:
+            r = w = 0
+        self._r, self._w = r, w
+        return lines, samples
+
+
+# -------------------------
+# Text stream lines
+# -------------------------
+#
+# In text mode the stream arrives as one line per sample:
+#   STREAM t=12.345 pos=10.20 force=1.234 temp=37.0
+
+STREAM_PREFIX = "STREAM "
+
+
+def parse_stream_line(line: str) -> Optional[Sample]:
+    """
+    Parse a text-mode STREAM line into a sample, or return None for any other
+    line (command responses, status messages, malformed stream lines).
+    """
+    if not line.startswith(STREAM_PREFIX):
+        return None
+    kv: Dict[str, float] = {}
+    try:
+        for tok in line[len(STREAM_PREFIX):].split():
+            k, _, v = tok.partition("=")
+            kv[k] = float(v)
+        return (kv["t"], kv.get("pos", 0.0), kv.get("force", 0.0), kv.get("temp", 0.0))
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,72 @@
+# bench_analysis.py
+"""
+Run analysis (stroke detection and per-cycle friction) on runs generated by
+the tools/esp32_sim.py friction model, at sample rates from 100 Hz to 2 kHz.
+
+Also a regression check: every run must analyse to the number of cycles the
+model actually drove, whatever the sample rate; the process exits 1 if not.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from backend.analysis import analyze_samples
+from tools.esp32_sim import FrictionModel
+
+from .common import emit, prefixed, time_calls
+
+SPEED_MM_S = 10.0
+STROKE_MM = 50.0
+CLAMP_FORCE_G = 200.0
+POS_NOISE_MM = 0.02
+
+
+def simulate(rate_hz: float, seconds: float, seed: int = 0):
+    """(pos, force, cycles driven) of a run of the simulator's model."""
+    rng = np.random.default_rng(seed)
+    model = FrictionModel(rng)
+    model.reset(SPEED_MM_S, STROKE_MM, CLAMP_FORCE_G)
+    n = int(rate_hz * seconds)
+    rows = model.step(np.arange(1, n + 1) / rate_hz, True, seconds)
+    # the model's position is exact; a real encoder is not
+    pos = rows["pos"] + rng.normal(0.0, POS_NOISE_MM, n).astype(np.float32)
+    return pos, rows["force"], model.cycles_done
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quick", action="store_true")
+    args = ap.parse_args()
+
+    results = {}
+    failures = []
+    for rate in (100, 500, 1000, 2000):
+        pos, force, expected = simulate(rate, 40.0)
+        found = analyze_samples(pos, force, CLAMP_FORCE_G)["cycles"]
+        if found != expected:
+            failures.append(f"{rate} Hz: {found} cycles analysed, {expected} driven")
+        results.update(prefixed(f"analysis.rate_{rate}", time_calls(
+            lambda: analyze_samples(pos, force, CLAMP_FORCE_G), repeat=5 if args.quick else 20)))
+
+    # a long run at 1 kHz
+    seconds = 200.0 if args.quick else 1000.0
+    pos, force, expected = simulate(1000, seconds)
+    t0 = time.perf_counter()
+    found = analyze_samples(pos, force, CLAMP_FORCE_G)["cycles"]
+    dt = time.perf_counter() - t0
+    if found != expected:
+        failures.append(f"1000 Hz, {seconds:.0f} s: {found} cycles analysed, {expected} driven")
+    results["analysis.long_run.samples_per_s"] = round(len(pos) / dt)
+
+    if failures:
+        print("cycle detection regressed:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
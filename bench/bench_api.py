@@ -0,0 +1,73 @@
+# bench_api.py
+"""
+FastAPI endpoint latency for /protocols and /runs with N rows in each table.
+Requests go through the ASGI app in-process (TestClient), so the numbers
+cover routing, validation, SQLite and serialisation but not the network.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from fastapi.testclient import TestClient
+
+from backend.api import app
+from backend.storage import connect, init_db
+
+from .common import emit, prefixed, time_calls
+
+
+def seed(rows: int) -> None:
+    conn = connect()
+    init_db(conn)
+    now = "2026-01-01T00:00:00Z"
+    conn.executemany(
+        "INSERT INTO protocols (name, speed, stroke_length_mm, clamp_force_g, water_temp_c, cycles,"
+        " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"Protocol {i}", 1 + i % 10, 20 + i % 50, 100 + i % 400, 20 + i % 20, 10 + i % 100, now, now)
+         for i in range(rows)),
+    )
+    snap = json.dumps({"name": "Protocol 0", "speed": 5, "stroke_length_mm": 20,
+                       "clamp_force_g": 200, "water_temp_c": 25, "cycles": 10})
+    statuses = ("completed", "aborted", "failed", "completed")
+    conn.executemany(
+        "INSERT INTO runs (protocol_id, protocol_snapshot_json, protocol_name, status, started_at,"
+        " finished_at, run_dir, notes) VALUES (1, ?, 'Protocol 0', ?, ?, ?, ?, ?)",
+        ((snap, statuses[i % 4], now, now, f"/tmp/bench-run-{i}", f"bench run {i}") for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, required=True)
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args()
+
+    seed(args.rows)
+    # full listings of 100k rows take seconds each; keep the total bounded
+    heavy_repeat = max(3, args.repeat // 10) if args.rows >= 100_000 else args.repeat
+
+    results = {}
+    with TestClient(app) as client:
+        def get(path):
+            r = client.get(path)
+            r.raise_for_status()
+
+        results.update(prefixed(f"api.rows_{args.rows}.get_protocols",
+                                time_calls(lambda: get("/protocols"), heavy_repeat)))
+        results.update(prefixed(f"api.rows_{args.rows}.get_runs_page",
+                                time_calls(lambda: get("/runs?limit=100"), args.repeat)))
+        mid = max(1, args.rows // 2)
+        results.update(prefixed(f"api.rows_{args.rows}.get_runs_before_id",
+                                time_calls(lambda: get(f"/runs?limit=100&before_id={mid}&status=completed"), args.repeat)))
+        results.update(prefixed(f"api.rows_{args.rows}.get_run",
+                                time_calls(lambda: get(f"/runs/{mid}"), args.repeat)))
+        results.update(prefixed(f"api.rows_{args.rows}.health",
+                                time_calls(lambda: get("/health"), args.repeat)))
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# bench_serial.py
+"""
+Serial path benchmarks, headless (QT_QPA_PLATFORM=offscreen):
+
+- parse: bytes pushed through a pty as fast as the kernel allows into a real
+  SerialWorker/QSerialPort; measures what _on_ready_read sustains (text STREAM
+  lines and binary frames).
+- rtt: SerialController.send_cmd -> matching reply on lineReceived, against the
+  simulator in tools/esp32_sim.py, idle and while it streams.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pty
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PySide6.QtCore import QCoreApplication, QEventLoop
+
+from main import SerialController, SerialWorker
+from tools.esp32_sim import SAMPLE_DTYPE, SimDevice
+
+from .common import emit, prefixed, summarize_ms
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+_app = None
+
+
+def _wait(cond, timeout_s: float) -> bool:
+    """Spin the Qt event loop until cond() is true or the timeout passes."""
+    deadline = time.monotonic() + timeout_s
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        QCoreApplication.processEvents(QEventLoop.AllEvents, 5)
+    return True
+
+
+def _payload(n: int, binary: bool) -> bytes:
+    dev = SimDevice(seed=1)
+    dev.stream_bin = binary
+    rows = dev.model.step(np.arange(n) / 1000.0, False, 0.0)
+    assert rows.dtype == SAMPLE_DTYPE
+    return dev.encode(rows)
+
+
+def bench_parse(n: int, binary: bool) -> dict:
+    data = _payload(n, binary)
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+
+    worker = SerialWorker()
+    worker.configure(path, 115200)
+    worker.open_port()
+    if not worker.last_open_ok:
+        raise RuntimeError(f"could not open {path}")
+
+    got = [0]
+    worker.samplesDecoded.connect(lambda s: got.__setitem__(0, got[0] + len(s)))
+
+    def writer():
+        view = memoryview(data)
+        while view:
+            k = os.write(master, view[:65536])
+            view = view[k:]
+
+    t0 = time.perf_counter()
+    th = threading.Thread(target=writer, daemon=True)
+    th.start()
+    ok = _wait(lambda: got[0] >= n, 120.0)
+    dt = time.perf_counter() - t0
+    worker.close_port()
+    os.close(master)
+    os.close(slave)
+    if not ok:
+        raise RuntimeError(f"parse bench stalled at {got[0]}/{n} samples")
+    return {
+        "samples_per_s": round(n / dt),
+        "bytes_per_s": round(len(data) / dt),
+        "crc_errors": worker._rx.crc_errors,
+    }
+
+
+def bench_rtt(repeat: int, stream_hz: int) -> dict:
+    link = os.path.join(tempfile.mkdtemp(prefix="ftbench-"), "ttyESP32")
+    sim = subprocess.Popen(
+        [sys.executable, "-m", "tools.esp32_sim", "--link", link, "--prep-s", "0"],
+        cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(link):
+            if time.monotonic() > deadline or sim.poll() is not None:
+                raise RuntimeError("simulator did not start")
+            time.sleep(0.02)
+
+        ctl = SerialController()
+        ctl.set_portName(link)
+        if not ctl.connectPort():
+            raise RuntimeError(f"could not open {link}")
+
+        seen = []
+        ctl.lineReceived.connect(seen.append)
+        if stream_hz:
+            ctl.start_stream(stream_hz)
+            _wait(lambda: any(s.startswith("ACK START_STREAM") for s in seen), 5.0)
+
+        times = []
+        for _ in range(repeat):
+            seen.clear()
+            t0 = time.perf_counter()
+            ctl.send_cmd("CMD GET_STATUS")
+            if not _wait(lambda: any(s.startswith("STATUS") for s in seen), 5.0):
+                raise RuntimeError("no STATUS reply")
+            times.append((time.perf_counter() - t0) * 1000.0)
+
+        if stream_hz:
+            ctl.stop_stream()
+        ctl.disconnectPort()
+        ctl.shutdown()
+        return summarize_ms(times)
+    finally:
+        sim.terminate()
+        sim.wait(5)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quick", action="store_true")
+    args = ap.parse_args()
+
+    # kept at module scope: destroying the app before the Qt objects the
+    # benchmarks leave behind crashes PySide6 at interpreter shutdown
+    global _app
+    _app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    n = 50_000 if args.quick else 200_000
+    repeat = 20 if args.quick else 50
+
+    results = {}
+    results.update(prefixed("serial.parse_text", bench_parse(n, binary=False)))
+    results.update(prefixed("serial.parse_bin", bench_parse(n, binary=True)))
+    results.update(prefixed("serial.cmd_rtt_idle", bench_rtt(repeat, 0)))
+    results.update(prefixed("serial.cmd_rtt_stream_2khz", bench_rtt(repeat, 2000)))
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench_storage.py
+"""
+Recorder write throughput and CSV export throughput versus run size.
+Uses FRICTIONTESTER_DATA_DIR (bench/run.py points it at a scratch dir).
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.recorder import RunRecorder
+from backend.storage import Protocol, connect, create_run, export_run_csv, get_run, init_db
+
+from .common import emit, prefixed, time_calls
+
+
+def _rows(n: int) -> np.ndarray:
+    t = np.arange(n) / 1000.0
+    return np.column_stack([t, 20 * np.sin(t), np.sin(3 * t), 25 + 0 * t])
+
+
+def bench_recorder(run_dir, total: int, batch: int) -> dict:
+    """Append `total` samples in batches of `batch` (the uplink posts ~200 ms batches)."""
+    rows = _rows(total)
+    rec = RunRecorder(run_dir)
+    t0 = time.perf_counter()
+    for i in range(0, total, batch):
+        rec.append(rows[i:i + batch])
+    rec.close()
+    dt = time.perf_counter() - t0
+    return {"samples_per_s": round(total / dt), "total_s": round(dt, 4)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quick", action="store_true")
+    args = ap.parse_args()
+
+    conn = connect()
+    init_db(conn)
+    pid = conn.execute(
+        "INSERT INTO protocols (name, speed, stroke_length_mm, clamp_force_g, water_temp_c, cycles,"
+        " created_at, updated_at) VALUES ('bench', 5, 20, 200, 25, 10, '', '')"
+    ).lastrowid
+    conn.commit()
+
+    def new_run(label: str) -> int:
+        # run dirs are named <timestamp>_<protocol name>; keep them distinct within one second
+        return create_run(conn, Protocol(id=pid, name=f"bench-{label}", speed=5, stroke_length_mm=20,
+                                         clamp_force_g=200, water_temp_c=25, cycles=10))
+
+    results = {}
+
+    for batch in (200, 4096):
+        run_id = new_run(f"rec-{batch}")
+        total = 200_000 if args.quick else 1_000_000
+        results.update(prefixed(f"recorder.batch_{batch}", bench_recorder(get_run(conn, run_id).run_dir, total, batch)))
+
+    sizes = (10_000, 100_000) if args.quick else (10_000, 100_000, 1_000_000)
+    for n in sizes:
+        run_id = new_run(f"export-{n}")
+        rec = RunRecorder(get_run(conn, run_id).run_dir)
+        rec.append(_rows(n))
+        rec.close()
+
+        out = {}
+        repeat = 3 if n >= 1_000_000 else 5
+        timing = time_calls(lambda: export_run_csv(conn, run_id), repeat=repeat, warmup=1)
+        size = len(export_run_csv(conn, run_id))
+        out.update(timing)
+        out["samples_per_s"] = round(n / (timing["median_ms"] / 1000.0))
+        out["bytes_per_s"] = round(size / (timing["median_ms"] / 1000.0))
+        results.update(prefixed(f"export_csv.n_{n}", out))
+
+    conn.close()
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# common.py
+from __future__ import annotations
+
+import json
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+# -------------------------
+# Shared helpers for bench/*.py
+# -------------------------
+#
+# Every bench module runs as its own process (python -m bench.bench_xxx) and
+# prints one JSON object of flat metrics on stdout. Metric names end in a unit
+# that also says which direction is better; only these are checked against
+# the baseline (min/p95 latencies are too noisy and are informational):
+#   *_per_s                   higher is better
+#   *median_ms, *total_s      lower is better
+
+
+def time_calls(fn: Callable[[], Any], repeat: int, warmup: int = 2) -> Dict[str, float]:
+    """Call fn repeatedly; return median/p95/min wall time in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    times: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return summarize_ms(times)
+
+
+def summarize_ms(times: List[float]) -> Dict[str, float]:
+    times = sorted(times)
+    p95 = times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))]
+    return {
+        "median_ms": round(statistics.median(times), 4),
+        "p95_ms": round(p95, 4),
+        "min_ms": round(times[0], 4),
+    }
+
+
+def prefixed(prefix: str, metrics: Dict[str, float]) -> Dict[str, float]:
+    return {f"{prefix}.{k}": v for k, v in metrics.items()}
+
+
+def emit(results: Dict[str, float]) -> None:
+    json.dump(results, sys.stdout, sort_keys=True)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+
+
+def better_direction(metric: str) -> int:
+    """+1 if larger values are better, -1 if smaller are, 0 if informational."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("median_ms") or metric.endswith("total_s"):
+        return -1
+    return 0
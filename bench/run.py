@@ -0,0 +1,149 @@
+# run.py
+"""
+Run the benchmark suite and compare against the recorded baseline.
+
+    python -m bench.run                      # full suite, compare to bench/baseline.json
+    python -m bench.run --quick --only api   # subset, smaller sizes
+    python -m bench.run --out results.json   # also write this run's results
+    python -m bench.run --update-baseline    # record this run as the new baseline
+
+Each group runs in a fresh subprocess with its own scratch
+FRICTIONTESTER_DATA_DIR and QT_QPA_PLATFORM=offscreen, so nothing touches
+the real data directory or needs a display. Exit status is 1 when any
+metric is worse than the baseline by more than --tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .common import better_direction
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# group name -> module args (each prints one JSON object of metrics)
+GROUPS: Dict[str, List[List[str]]] = {
+    "serial": [["bench.bench_serial"]],
+    "api": [["bench.bench_api", "--rows", str(n)] for n in (10, 1_000, 100_000)],
+    "storage": [["bench.bench_storage"]],
+    "analysis": [["bench.bench_analysis"]],
+}
+QUICK_FLAG = {"bench.bench_serial", "bench.bench_storage", "bench.bench_analysis"}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_group(cmds: List[List[str]], quick: bool) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    for cmd in cmds:
+        argv = [sys.executable, "-m"] + cmd
+        if quick and cmd[0] in QUICK_FLAG:
+            argv.append("--quick")
+        data_dir = tempfile.mkdtemp(prefix="ftbench-data-")
+        env = dict(os.environ, FRICTIONTESTER_DATA_DIR=data_dir, QT_QPA_PLATFORM="offscreen")
+        try:
+            t0 = time.perf_counter()
+            proc = subprocess.run(argv, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"{' '.join(cmd)} failed:\n{proc.stderr}")
+            print(f"  {' '.join(cmd)}  ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+            results.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+# latency changes smaller than this are scheduler noise, whatever the ratio
+MIN_DELTA_MS = 1.0
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[Tuple[str, float, float, float]]:
+    """Metrics worse than baseline by more than tolerance: (name, base, now, relative change)."""
+    worse = []
+    for name, now in sorted(results.items()):
+        base = baseline.get(name)
+        direction = better_direction(name)
+        if base is None or direction == 0 or not base:
+            continue
+        change = (now - base) / base
+        if name.endswith("_ms") and abs(now - base) < MIN_DELTA_MS:
+            continue
+        if change * direction < -tolerance:
+            worse.append((name, base, now, change))
+    return worse
+
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", action="append", choices=sorted(GROUPS), help="run only these groups")
+    ap.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    ap.add_argument("--out", type=Path, help="write results JSON here")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    args = ap.parse_args(argv)
+
+    results: Dict[str, float] = {}
+    for name in args.only or list(GROUPS):
+        print(f"[bench] {name}", file=sys.stderr)
+        results.update(run_group(GROUPS[name], args.quick))
+
+    report = {
+        "meta": {
+            "git_rev": _git_rev(),
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "quick": args.quick,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+    if args.update_baseline:
+        merged = {}
+        if args.baseline.exists():
+            merged = json.loads(args.baseline.read_text()).get("results", {})
+        merged.update(results)
+        report["results"] = merged
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"[bench] baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+
+    for name, value in sorted(results.items()):
+        print(f"{name:60s} {value}")
+
+    if not args.baseline.exists():
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    worse = compare(results, baseline.get("results", {}), args.tolerance)
+    if worse:
+        print(f"\n[bench] {len(worse)} regression(s) vs baseline {baseline['meta'].get('git_rev', '')} "
+              f"({baseline['meta'].get('machine', '')}):", file=sys.stderr)
+        for name, base, now, change in worse:
+            print(f"  {name}: {base} -> {now} ({change:+.0%})", file=sys.stderr)
+        return 1
+    print("\n[bench] no regressions vs baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
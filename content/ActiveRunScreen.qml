@@ -18,6 +18,7 @@ ActiveRunScreenForm {
     // ✅ inputs from NavShell
     property var protocolObj: null
     property bool paused: false
+    property int runId: -1
 
     // ✅ outputs to NavShell
     signal abortRequested()
@@ -45,6 +46,31 @@ ActiveRunScreenForm {
         cycleText.text       = p ? ("0 / " + String(p.cycles)) : "- / -"
     }
 
+    // live stats from GET /runs/{id}/live/stats (maintained incrementally by the backend)
+    function applyLiveStats(s) {
+        const target = s.target_cycles || (protocolObj ? protocolObj.cycles : 0)
+        cycleText.text = String(s.cycles) + " / " + String(target)
+
+        const f = s.current_cycle_force_n && s.current_cycle_force_n.n > 0
+                  ? s.current_cycle_force_n : s.force_n
+        if (!f || !f.n) {
+            forceStatsText.text = "-"
+            return
+        }
+        let txt = "avg " + f.mean.toFixed(3) + " N  σ " + f.std.toFixed(3)
+                  + "  max " + f.max.toFixed(3)
+        if (s.cof_kinetic_last !== null && s.cof_kinetic_last !== undefined)
+            txt += "   μk " + s.cof_kinetic_last.toFixed(3)
+        forceStatsText.text = txt
+    }
+
+    function pollLiveStats() {
+        if (!backend || runId <= 0) return
+        backend.request("GET", "/runs/" + runId + "/live/stats", null, function(ok, status, data) {
+            if (ok && data) applyLiveStats(data)
+        })
+    }
+
     function applyPauseUI() {
         statusBadgeText.text = paused ? "PAUSED" : "RUNNING"
 
@@ -78,6 +104,15 @@ ActiveRunScreenForm {
         }
     }
 
+    Timer {
+        id: liveStatsTimer
+        interval: 1000
+        repeat: true
+        running: view.runId > 0
+        triggeredOnStart: true
+        onTriggered: view.pollLiveStats()
+    }
+
     pauseResumeButton.onClicked: pauseResumeRequested()
     abortButton.onClicked: abortRequested()
 }
@@ -26,6 +26,7 @@ Rectangle {
 
     // show current/total cycles in the 5th card
     property alias cycleText: cycleText
+    property alias forceStatsText: forceStatsText
 
     property alias elapsedText: elapsedText
     property alias pauseResumeButton: pauseResumeButton
@@ -349,11 +350,26 @@ Rectangle {
                     anchors.margins: 16
                     spacing: 10
 
-                    Text {
-                        text: qsTr("Force vs Position")
-                        color: Constants.textPrimary
-                        font.pixelSize: 18
-                        font.bold: true
+                    RowLayout {
+                        Layout.fillWidth: true
+                        spacing: 12
+
+                        Text {
+                            text: qsTr("Force vs Position")
+                            color: Constants.textPrimary
+                            font.pixelSize: 18
+                            font.bold: true
+                        }
+
+                        Item { Layout.fillWidth: true }
+
+                        // live force stats (filled in by ActiveRunScreen.qml)
+                        Text {
+                            id: forceStatsText
+                            text: qsTr("-")
+                            color: Constants.textSecondary
+                            font.pixelSize: 13
+                        }
                     }
 
                     Rectangle {
@@ -1,10 +1,10 @@
 // App.qml
 import QtQuick
 import QtQuick.Controls
-import QtQuick.VirtualKeyboard
 import PilotLine_FrictionTester
 
 Window {
+    id: appWindow
     width: Constants.width
     height: Constants.height
     visible: true
@@ -56,13 +56,21 @@ Window {
         }
     }
 
-    // ⌨️ Virtual keyboard
-    InputPanel {
+    // ⌨️ Virtual keyboard (loaded once the first frame is up)
+    Loader {
         id: inputPanel
         anchors.left: parent.left
         anchors.right: parent.right
         anchors.bottom: parent.bottom
-        visible: Qt.inputMethod.visible
         z: 9999
+        asynchronous: true
+        active: false
+        source: "KeyboardPanel.qml"
+    }
+
+    Connections {
+        target: appWindow
+        enabled: !inputPanel.active
+        function onFrameSwapped() { inputPanel.active = true }
     }
 }
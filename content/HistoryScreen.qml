@@ -32,6 +32,32 @@ Rectangle {
         toastTimer.restart()
     }
 
+    // keyset paging: next page = runs with id < last loaded id
+    property int pageSize: 30
+    property int nextBeforeId: -1
+    property bool hasMore: false
+    property bool loadingMore: false
+
+    function appendRuns(data) {
+        for (var i = 0; i < data.length; i++) {
+            // expecting api_list_runs -> RunOut shape:
+            // { id, protocol_id, protocol_name, status, started_at, finished_at, run_dir, notes, end_reason }
+            runsModel.append({
+                id: data[i].id,
+                protocol_id: data[i].protocol_id,
+                protocol_name: data[i].protocol_name || ("Protocol " + data[i].protocol_id),
+                status: (data[i].status || "").toUpperCase(),
+                started_at: data[i].started_at || "",
+                finished_at: data[i].finished_at || "",
+                run_dir: data[i].run_dir || "",
+                notes: data[i].notes || "",
+                end_reason: data[i].end_reason || ""
+            })
+        }
+        hasMore = data.length === pageSize
+        if (data.length > 0) nextBeforeId = data[data.length - 1].id
+    }
+
     function loadRuns() {
         if (!backend) {
             console.warn("HistoryScreen: backend is null")
@@ -42,8 +68,10 @@ Rectangle {
         loadError = ""
         runsModel.clear()
         selectedIndex = -1
+        nextBeforeId = -1
+        hasMore = false
 
-        backend.request("GET", "/runs", null, function(ok, status, data) {
+        backend.request("GET", "/runs?limit=" + pageSize, null, function(ok, status, data) {
             busy = false
 
             if (!ok || !data) {
@@ -52,47 +80,83 @@ Rectangle {
                 return
             }
 
-            for (var i = 0; i < data.length; i++) {
-                // expecting api_list_runs -> RunOut shape:
-                // { id, protocol_id, protocol_name, status, started_at, finished_at, run_dir, notes }
-                runsModel.append({
-                    id: data[i].id,
-                    protocol_id: data[i].protocol_id,
-                    protocol_name: data[i].protocol_name || ("Protocol " + data[i].protocol_id),
-                    status: (data[i].status || "").toUpperCase(),
-                    started_at: data[i].started_at || "",
-                    finished_at: data[i].finished_at || "",
-                    run_dir: data[i].run_dir || "",
-                    notes: data[i].notes || ""
-                })
-            }
-
+            appendRuns(data)
             selectedIndex = (runsModel.count > 0) ? 0 : -1
         })
     }
 
+    function loadMore() {
+        if (!backend || busy || loadingMore || !hasMore) return
+
+        loadingMore = true
+        backend.request("GET", "/runs?limit=" + pageSize + "&before_id=" + nextBeforeId, null, function(ok, status, data) {
+            loadingMore = false
+            if (!ok || !data) {
+                console.error("GET /runs (next page) failed:", status, data)
+                return
+            }
+            appendRuns(data)
+        })
+    }
+
     function statusColor(s) {
         // keep it simple; tweak later to match your palette
         if (s === "COMPLETED") return "#22C55E"   // green
         if (s === "ABORTED")   return "#F59E0B"   // amber
         if (s === "FAILED")    return "#DC2626"   // red
+        if (s === "INTERRUPTED") return "#EA580C" // orange
         if (s === "RUNNING")   return "#3B82F6"   // blue
         if (s === "PAUSED")    return "#A78BFA"   // purple
         return Constants.textSecondary
     }
 
+    // export runs as a background job; poll /jobs/{id} for progress
+    property int exportJobId: -1
+
     function exportRunCsv(runId) {
         if (!backend) return
+        if (exportJobId > 0) {
+            showToast("An export is already running")
+            return
+        }
         showToast("Exporting CSV…")
 
-        // returns { format:"csv", path:"/path/to/export.csv" } when mode=file
-        backend.request("GET", "/runs/" + runId + "/export?fmt=csv&mode=file", null, function(ok, status, data) {
-            if (!ok || !data) {
+        // returns { job_id } when mode=job
+        backend.request("GET", "/runs/" + runId + "/export?fmt=csv&mode=job", null, function(ok, status, data) {
+            if (!ok || !data || !data.job_id) {
                 console.error("Export failed:", status, data)
                 showToast("Export failed")
                 return
             }
-            showToast("Exported: " + (data.path || "export.csv"))
+            exportJobId = data.job_id
+            exportPollTimer.start()
+        })
+    }
+
+    function pollExportJob() {
+        if (!backend || exportJobId <= 0) {
+            exportPollTimer.stop()
+            return
+        }
+        backend.request("GET", "/jobs/" + exportJobId, null, function(ok, status, job) {
+            if (!ok || !job) {
+                console.error("GET /jobs failed:", status, job)
+                exportPollTimer.stop()
+                exportJobId = -1
+                showToast("Export failed")
+                return
+            }
+            if (job.status === "completed") {
+                exportPollTimer.stop()
+                exportJobId = -1
+                showToast("Exported: " + ((job.result && job.result.path) || "export.csv"))
+            } else if (job.status === "failed" || job.status === "cancelled") {
+                exportPollTimer.stop()
+                exportJobId = -1
+                showToast(job.status === "failed" ? "Export failed" : "Export cancelled")
+            } else {
+                showToast("Exporting CSV… " + Math.round((job.progress || 0) * 100) + "%")
+            }
         })
     }
 
@@ -233,9 +297,25 @@ Rectangle {
             model: runsModel
             visible: !busy && loadError === "" && runsModel.count > 0
 
+            // fetch the next page when the user scrolls near the end
+            onContentYChanged: {
+                if (root.hasMore && contentHeight > 0 && contentY + height > contentHeight - 3 * 146)
+                    root.loadMore()
+            }
+
+            footer: Item {
+                width: list.width
+                height: root.loadingMore ? 56 : 0
+                BusyIndicator {
+                    anchors.centerIn: parent
+                    running: root.loadingMore
+                    visible: root.loadingMore
+                }
+            }
+
             delegate: Rectangle {
                 width: list.width
-                height: 132
+                height: end_reason !== "" ? 156 : 132
                 radius: 14
                 color: Constants.bgCard
                 border.width: (index === root.selectedIndex) ? 2 : 1
@@ -337,6 +417,16 @@ Rectangle {
                             }
                         }
                     }
+
+                    // why an interrupted/failed run ended (set by the backend's recovery)
+                    Text {
+                        visible: end_reason !== ""
+                        text: end_reason
+                        color: Constants.textSecondary
+                        font.pixelSize: 12
+                        Layout.fillWidth: true
+                        elide: Text.ElideRight
+                    }
                 }
             }
         }
@@ -431,5 +521,12 @@ Rectangle {
             interval: 1400
             onTriggered: root.toastVisible = false
         }
+
+        Timer {
+            id: exportPollTimer
+            interval: 500
+            repeat: true
+            onTriggered: root.pollExportJob()
+        }
     }
 }
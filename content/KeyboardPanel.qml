@@ -0,0 +1,9 @@
+// KeyboardPanel.qml
+import QtQuick
+import QtQuick.VirtualKeyboard
+
+// The on-screen keyboard, in its own file so App.qml can load it (and the
+// VirtualKeyboard module) after the first frame instead of before it.
+InputPanel {
+    visible: Qt.inputMethod.visible
+}
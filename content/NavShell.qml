@@ -28,6 +28,9 @@ NavShellForm {
     property bool isPaused: false
     property int activeRunId: -1
 
+    // Set true to echo every ESP32 line to the console (debug only; costly while streaming)
+    property bool logSerialLines: false
+
     // Sidebar enabled only when safe (idle/config/browse) and dialog not visible
     // (running/paused should lock nav)
     navEnabled: (uiState === "idle" || uiState === "config" || uiState === "browse") && !exitConfigDialog.visible
@@ -103,6 +106,7 @@ NavShellForm {
             const temp   = Number(proto.water_temp_c)
             const cycles = Number(proto.cycles)
 
+            serialController.recordRun(activeRunId)
             serialController.start_test(speed, stroke, clamp, temp, cycles)
 
             uiState = "running"
@@ -124,6 +128,7 @@ NavShellForm {
 
         // ensureConnectedAndSend("ABORT_TEST")
 
+        if (serialController) serialController.stopRecording()
         if (activeRunId > 0) {
             backend.request("PUT", "/runs/" + activeRunId + "/status", { status: "aborted" }, function(){ })
         }
@@ -154,7 +159,81 @@ NavShellForm {
         id: pythonBackend
         property string apiBase: "http://127.0.0.1:8080"
 
+        // The UI starts without waiting for the backend (run_pi.sh boots
+        // both in parallel). Until /health answers, requests are queued and
+        // sent in order once it does.
+        //
+        // With the backend running in this process (main.py,
+        // FRICTIONTESTER_BACKEND=inprocess) requests go to inProcessBackend
+        // instead of HTTP; it answers through onReplied below. If it fails to
+        // start, queued and later requests are answered with 503.
+        readonly property var inProcess: (typeof inProcessBackend !== "undefined") ? inProcessBackend : null
+        property bool ready: false
+        property bool failed: false
+        property string failReason: ""
+        property var _queue: []
+        property var _callbacks: ({})
+
         function request(method, path, body, cb) {
+            if (failed) {
+                if (cb) cb(false, 503, { detail: "Backend failed to start: " + failReason })
+                return
+            }
+            if (!ready) {
+                _queue.push([method, path, body, cb])
+                return
+            }
+            if (inProcess) {
+                const id = inProcess.request(method, path, body || null)
+                if (cb) _callbacks[id] = cb
+                return
+            }
+            _send(method, path, body, cb)
+        }
+
+        function _reply(id, ok, status, data) {
+            const cb = _callbacks[id]
+            if (!cb) return
+            delete _callbacks[id]
+            cb(ok, status, data)
+        }
+
+        function _markReady() {
+            if (ready) return
+            ready = true
+            console.log("Backend ready" + (inProcess ? " (in-process)" : ""))
+            if (typeof startupReport !== "undefined") startupReport.mark("backend_ready")
+            const q = _queue
+            _queue = []
+            for (let i = 0; i < q.length; i++)
+                request(q[i][0], q[i][1], q[i][2], q[i][3])
+        }
+
+        function _markFailed(reason) {
+            if (ready || failed) return
+            failed = true
+            failReason = reason
+            console.log("Backend failed to start: " + reason)
+            const q = _queue
+            _queue = []
+            for (let i = 0; i < q.length; i++)
+                request(q[i][0], q[i][1], q[i][2], q[i][3])
+        }
+
+        function _probe() {
+            var xhr = new XMLHttpRequest()
+            xhr.open("GET", apiBase + "/health")
+            xhr.onreadystatechange = function() {
+                if (xhr.readyState !== XMLHttpRequest.DONE || ready) return
+                if (xhr.status === 200)
+                    _markReady()
+                else
+                    healthTimer.start()
+            }
+            xhr.send()
+        }
+
+        function _send(method, path, body, cb) {
             var xhr = new XMLHttpRequest()
             xhr.open(method, apiBase + path)
             xhr.setRequestHeader("Content-Type", "application/json")
@@ -173,6 +252,25 @@ NavShellForm {
 
             xhr.send(body ? JSON.stringify(body) : null)
         }
+
+        Component.onCompleted: {
+            if (!inProcess) _probe()
+            else if (inProcess.ready) _markReady()
+            else if (inProcess.failed) _markFailed(inProcess.error)
+        }
+    }
+
+    Connections {
+        target: pythonBackend.inProcess
+        function onReadyChanged() { if (pythonBackend.inProcess.ready) pythonBackend._markReady() }
+        function onFailedChanged() { if (pythonBackend.inProcess.failed) pythonBackend._markFailed(pythonBackend.inProcess.error) }
+        function onReplied(id, ok, status, data) { pythonBackend._reply(id, ok, status, data) }
+    }
+
+    Timer {
+        id: healthTimer
+        interval: 200
+        onTriggered: pythonBackend._probe()
     }
 
     // ===== Screens =====
@@ -188,108 +286,174 @@ NavShellForm {
         LoadingScreen { statusMessage: shell.initStatusText }
     }
 
+    // Screens past the first are created through Loaders with a URL source:
+    // a screen type named inline here would be compiled together with
+    // NavShell before the first frame, whether or not it is ever shown.
+    // warmTimer compiles them in the background once the UI is up.
     Component {
         id: configComp
-        ConfigScreen {
-            appMachine: machineState
-            serialController: shell.serialController
-            backend: pythonBackend
-
-            onChooseProtocolRequested: {
-                shell.protocolsMode = "selectOnly"
-                shell.uiState = "browse"
-                stack.replace(protocolsComp)
-                setChecked("protocols")
-                prevCheckedTarget = "protocols"
-            }
+        Loader {
+            id: configLoader
+            asynchronous: true
+            Component.onCompleted: setSource("ConfigScreen.qml", {
+                appMachine: machineState,
+                serialController: shell.serialController,
+                backend: pythonBackend
+            })
+
+            Connections {
+                target: configLoader.item
+                ignoreUnknownSignals: true
+
+                function onChooseProtocolRequested() {
+                    shell.protocolsMode = "selectOnly"
+                    shell.uiState = "browse"
+                    stack.replace(protocolsComp)
+                    setChecked("protocols")
+                    prevCheckedTarget = "protocols"
+                }
 
-            onRunTestRequested: function(protocol) {
-                if (!protocol) return
+                function onRunTestRequested(protocol) {
+                    if (!protocol) return
 
-                // Usually config implies prep already complete.
-                // But if you ever allow running without prep, do it here:
-                if (shell.uiState !== "config") {
-                    console.log("Not in config; prepping first...")
-                    shell._pendingRunProtocol = protocol
-                    shell.beginInit()
-                    return
-                }
+                    // Usually config implies prep already complete.
+                    // But if you ever allow running without prep, do it here:
+                    if (shell.uiState !== "config") {
+                        console.log("Not in config; prepping first...")
+                        shell._pendingRunProtocol = protocol
+                        shell.beginInit()
+                        return
+                    }
 
-                shell.startRunWithProtocol(protocol)
+                    shell.startRunWithProtocol(protocol)
+                }
             }
         }
     }
 
     Component {
         id: activeRunComp
-        ActiveRunScreen {
-            appMachine: machineState
-            serialController: shell.serialController
-            backend: pythonBackend
+        Loader {
+            id: activeRunLoader
+            asynchronous: true
+            Component.onCompleted: setSource("ActiveRunScreen.qml", {
+                appMachine: machineState,
+                serialController: shell.serialController,
+                backend: pythonBackend
+            })
 
             // ✅ feed UI
-            protocolObj: shell.activeProtocol
-            paused: shell.isPaused
+            Binding { target: activeRunLoader.item; property: "protocolObj"; value: shell.activeProtocol; when: activeRunLoader.status === Loader.Ready }
+            Binding { target: activeRunLoader.item; property: "paused"; value: shell.isPaused; when: activeRunLoader.status === Loader.Ready }
+            Binding { target: activeRunLoader.item; property: "runId"; value: shell.activeRunId; when: activeRunLoader.status === Loader.Ready }
 
             // ✅ signals that exist on the wrapper
-            onPauseResumeRequested: shell.togglePause()
-            onAbortRequested: shell.abortRun()
+            Connections {
+                target: activeRunLoader.item
+                ignoreUnknownSignals: true
+                function onPauseResumeRequested() { shell.togglePause() }
+                function onAbortRequested() { shell.abortRun() }
+            }
         }
     }
 
 
     Component {
         id: protocolsComp
-        ProtocolsScreen {
-            appMachine: machineState
-            serialController: shell.serialController
-            backend: pythonBackend
-            mode: shell.protocolsMode
-
-            onProtocolChosen: function(proto) {
-                machineState.selectedProtocol = proto
-
-                if (mode === "selectOnly") {
-                    shell.uiState = "config"
-                    setChecked("home")
-                    prevCheckedTarget = "home"
-                    return
-                }
+        Loader {
+            id: protocolsLoader
+            asynchronous: true
+            Component.onCompleted: setSource("ProtocolsScreen.qml", {
+                appMachine: machineState,
+                serialController: shell.serialController,
+                backend: pythonBackend
+            })
+
+            Binding { target: protocolsLoader.item; property: "mode"; value: shell.protocolsMode; when: protocolsLoader.status === Loader.Ready }
+
+            Connections {
+                target: protocolsLoader.item
+                ignoreUnknownSignals: true
+
+                function onProtocolChosen(proto) {
+                    machineState.selectedProtocol = proto
+
+                    if (shell.protocolsMode === "selectOnly") {
+                        shell.uiState = "config"
+                        setChecked("home")
+                        prevCheckedTarget = "home"
+                        return
+                    }
 
-                // prepAndRun mode: select + prep, then PREP_COMPLETE routes to config
-                shell._pendingRunProtocol = null
-                shell.uiState = "initializing"
-                shell.initStatusText = "Prepping for test"
-                if (!shell.ensureConnected()) {
-                    shell.uiState = "idle"
-                    return
+                    // prepAndRun mode: select + prep, then PREP_COMPLETE routes to config
+                    shell._pendingRunProtocol = null
+                    shell.uiState = "initializing"
+                    shell.initStatusText = "Prepping for test"
+                    if (!shell.ensureConnected()) {
+                        shell.uiState = "idle"
+                        return
+                    }
+                    shell.serialController.prep_test_run()
                 }
-                shell.serialController.prep_test_run()
             }
         }
     }
 
     Component {
         id: historyComp
-        HistoryScreen {
-            backend: pythonBackend
+        Loader {
+            id: historyLoader
+            asynchronous: true
+            Component.onCompleted: setSource("HistoryScreen.qml", { backend: pythonBackend })
 
-            onBackRequested: {
-                // for sidebar navigation, just go back to idle
-                shell.uiState = "idle"
-            }
+            Connections {
+                target: historyLoader.item
+                ignoreUnknownSignals: true
+
+                function onBackRequested() {
+                    // for sidebar navigation, just go back to idle
+                    shell.uiState = "idle"
+                }
 
-            onRunChosen: function(runObj) {
-                console.log("Run chosen:", runObj.id, runObj.protocol_name)
-                // TODO next: route to RunDetailScreen with this run id
-                // shell.openRunDetails(runObj) or stack.replace(runDetailComp)
+                function onRunChosen(runObj) {
+                    console.log("Run chosen:", runObj.id, runObj.protocol_name)
+                    // TODO next: route to RunDetailScreen with this run id
+                    // shell.openRunDetails(runObj) or stack.replace(runDetailComp)
+                }
             }
         }
     }
 
 
-    Component { id: settingsComp; SettingsScreen { appMachine: machineState } }
-    Component { id: aboutComp; TempScreen { appMachine: machineState } }
+    Component {
+        id: settingsComp
+        Loader {
+            asynchronous: true
+            Component.onCompleted: setSource("SettingsScreen.qml", { appMachine: machineState })
+        }
+    }
+    Component {
+        id: aboutComp
+        Loader {
+            asynchronous: true
+            Component.onCompleted: setSource("TempScreen.qml", { appMachine: machineState })
+        }
+    }
+
+    // Compile the lazily loaded screens once the first frame is up, so the
+    // first visit to each doesn't wait for the QML compiler (and the disk
+    // cache is populated for the next boot).
+    property var _warmComponents: []
+    Timer {
+        id: warmTimer
+        interval: 500
+        onTriggered: {
+            const screens = ["ProtocolsScreen.qml", "HistoryScreen.qml", "ConfigScreen.qml",
+                             "ActiveRunScreen.qml", "SettingsScreen.qml", "TempScreen.qml"]
+            for (let i = 0; i < screens.length; i++)
+                shell._warmComponents.push(Qt.createComponent(screens[i], Component.Asynchronous))
+        }
+    }
 
     // ===== Routing =====
     function routeToState() {
@@ -313,6 +477,7 @@ NavShellForm {
     Component.onCompleted: {
         uiState = "idle"
         routeToState()
+        warmTimer.start()
     }
 
     onUiStateChanged: {
@@ -511,7 +676,7 @@ NavShellForm {
 
         function onLineReceived(line) {
             const msg = ("" + line).trim()
-            console.log("PI ⬅️ ESP32:", msg)
+            if (shell.logSerialLines) console.log("PI ⬅️ ESP32:", msg)
 
             if (shell.uiState === "initializing") {
                 if (msg === "PREP_COMPLETE") {
@@ -535,6 +700,7 @@ NavShellForm {
                 }
             }
             if (msg === "RUN_COMPLETE") {
+                shell.serialController.stopRecording()
                 if (shell.activeRunId > 0) {
                     shell.backend.request("PUT", "/runs/" + shell.activeRunId + "/status", { status: "completed" }, function(){ })
                 }
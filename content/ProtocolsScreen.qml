@@ -95,30 +95,75 @@ Rectangle {
     }
 
 
+    // Revision of the list in protocolsModel (from /protocols/changes).
+    // Reloading asks only for what changed since, and applies it to the model
+    // in place, so delegates and the selection survive a save or delete.
+    property int protocolsRevision: 0
+
+    function indexOfProtocol(id) {
+        for (var i = 0; i < protocolsModel.count; i++) {
+            if (protocolsModel.get(i).id === id) return i
+        }
+        return -1
+    }
+
+    // Same order as the backend list: updated_at desc, then id desc
+    function insertIndexFor(p) {
+        for (var i = 0; i < protocolsModel.count; i++) {
+            var q = protocolsModel.get(i)
+            if (q.updatedAt < p.updatedAt || (q.updatedAt === p.updatedAt && q.id < p.id)) return i
+        }
+        return protocolsModel.count
+    }
+
+    function applyProtocolChanges(data) {
+        var selectedId = (selectedIndex >= 0 && selectedIndex < protocolsModel.count) ? protocolsModel.get(selectedIndex).id : -1
+        var i, idx
+
+        if (data.reset) {
+            protocolsModel.clear()
+            for (i = 0; i < data.protocols.length; i++) {
+                protocolsModel.append(toUiShape(data.protocols[i]))
+            }
+        } else {
+            for (i = 0; i < data.deleted.length; i++) {
+                idx = indexOfProtocol(data.deleted[i])
+                if (idx >= 0) protocolsModel.remove(idx)
+            }
+            for (i = 0; i < data.protocols.length; i++) {
+                var p = toUiShape(data.protocols[i])
+                idx = indexOfProtocol(p.id)
+                if (idx >= 0) protocolsModel.remove(idx)
+                idx = insertIndexFor(p)
+                protocolsModel.insert(idx, p)
+            }
+        }
+        protocolsRevision = data.revision
+
+        idx = (selectedId >= 0) ? indexOfProtocol(selectedId) : -1
+        selectedIndex = (idx >= 0) ? idx : ((protocolsModel.count > 0) ? 0 : -1)
+    }
+
     function loadProtocols() {
         if (!backend) {
             console.warn("ProtocolsScreen: backend is null")
             return
         }
 
-        busy = true
+        // only the first load hides the list; later ones are small diffs
+        if (protocolsModel.count === 0) busy = true
         loadError = ""
 
-        backend.request("GET", "/protocols", null, function(ok, status, data) {
+        backend.request("GET", "/protocols/changes?since=" + protocolsRevision, null, function(ok, status, data) {
             busy = false
-            protocolsModel.clear()
 
             if (!ok || !data) {
                 loadError = "Failed to load protocols"
-                console.error("GET /protocols failed:", status, data)
+                console.error("GET /protocols/changes failed:", status, data)
                 return
             }
 
-            for (var i = 0; i < data.length; i++) {
-                protocolsModel.append(toUiShape(data[i]))
-            }
-
-            selectedIndex = (protocolsModel.count > 0) ? 0 : -1
+            applyProtocolChanges(data)
         })
     }
 
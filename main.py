@@ -1,85 +1,397 @@
 import os
 import sys
-from PySide6.QtCore import QObject, Signal, Slot, Property, QUrl
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Taken before the Qt imports, which are a good part of a cold start
+_BOOT_T0 = time.monotonic()
+
+from PySide6.QtCore import QObject, Signal, Slot, Property, QUrl, QThread, QTimer, Qt
+from PySide6.QtQuick import QQuickWindow
 from PySide6.QtGui import QGuiApplication
-from PySide6.QtQml import QQmlApplicationEngine
+from PySide6.QtQml import QJSValue, QQmlApplicationEngine
 from PySide6.QtSerialPort import QSerialPort
 
+from backend.commands import Command, CommandScheduler
+from backend.telemetry import TelemetryDecoder, parse_stream_line
 
-class SerialController(QObject):
-    connectedChanged = Signal()
-    lineReceived = Signal(str)
+log = logging.getLogger(__name__)
+
+
+class SerialWorker(QObject):
+    """
+    Owns the QSerialPort and lives on the serial I/O thread.
+
+    Reading, line splitting and stream parsing all happen here, so a busy GUI
+    thread never holds up the port. Decoded samples are emitted on this thread
+    as soon as they arrive (samplesDecoded) for consumers that must see every
+    sample; the UI gets lines and samples batched at UI_FLUSH_HZ.
+
+    Outgoing commands go through a CommandScheduler (backend/commands.py),
+    which matches replies to commands, bounds how many are in flight and
+    resends or fails commands the ESP32 never answered.
+    """
+
+    UI_FLUSH_HZ = 30
+    COMMAND_POLL_MS = 50
+
+    opened = Signal(bool)
+    samplesDecoded = Signal(list)   # every batch, emitted on the worker thread
+    linesReady = Signal(list)       # UI batch of text lines
+    samplesReady = Signal(list)     # UI batch of (t, pos, force, temp) tuples
     error = Signal(str)
+    commandFailed = Signal(int, str, str)   # seq, command line, reason
 
     def __init__(self):
-        """
-        Initialize the SerialController with default serial port settings.
-        
-        Sets up the serial port connection with default values:
-        - Port: /dev/ttyAMA3 (Raspberry Pi GPIO UART)
-        - Baud rate: 115200
-        - Data bits: 8
-        - Parity: None
-        - Stop bits: 1
-        - Flow control: None
-        
-        Connects the readyRead signal to handle incoming data automatically.
-        """
         super().__init__()
-        self._serial = QSerialPort()
-        self._port_name = "/dev/ttyAMA3"
-        self._baud = 115200
-        self._rx = bytearray()
+        # children move to the worker thread together with this object
+        self._serial = QSerialPort(self)
+        self._rx = TelemetryDecoder()
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(1000 // self.UI_FLUSH_HZ)
+        self._flush_timer.timeout.connect(self._flush_ui)
+
+        self.commands = CommandScheduler(self._write_raw, self._on_command_failed)
+        self._command_timer = QTimer(self)
+        self._command_timer.setInterval(self.COMMAND_POLL_MS)
+        self._command_timer.timeout.connect(self._pump_commands)
+
+        self._pending_lines = []
+        self._pending_samples = []
+        self.last_open_ok = False
 
-        self._apply_settings()
         self._serial.readyRead.connect(self._on_ready_read)
 
-    def _apply_settings(self):
+    @Slot(str, int)
+    def configure(self, port_name: str, baud: int):
         """
-        Apply current serial port configuration settings to the QSerialPort instance.
+        Apply serial port configuration settings to the QSerialPort instance.
         
-        This private method updates all serial port parameters (port name, baud rate,
-        data bits, parity, stop bits, and flow control) based on the current
-        instance variables. Called whenever port settings change.
+        Updates all serial port parameters (port name, baud rate, data bits,
+        parity, stop bits, and flow control). Called whenever port settings change.
         """
-        self._serial.setPortName(self._port_name)
-        self._serial.setBaudRate(self._baud)
+        self._serial.setPortName(port_name)
+        self._serial.setBaudRate(baud)
         self._serial.setDataBits(QSerialPort.Data8)
         self._serial.setParity(QSerialPort.NoParity)
         self._serial.setStopBits(QSerialPort.OneStop)
         self._serial.setFlowControl(QSerialPort.NoFlowControl)
 
+    @Slot()
+    def open_port(self):
+        """
+        Open the port in ReadWrite mode. The result is left in last_open_ok
+        (the controller calls this through a blocking queued connection).
+        """
+        if self._serial.isOpen():
+            self.last_open_ok = True
+            return
+        self._rx.reset()
+        ok = self._serial.open(QSerialPort.ReadWrite)
+        self.last_open_ok = ok
+
+        #print("OPEN OK?", ok, "ERR:", self._serial.errorString())
+
+        if not ok:
+            self.error.emit(self._serial.errorString())
+        else:
+            self._flush_timer.start()
+            self._command_timer.start()
+        self.opened.emit(ok)
+
+    @Slot()
+    def close_port(self):
+        if self._serial.isOpen():
+            self._serial.close()
+            self._flush_timer.stop()
+            self._command_timer.stop()
+            self.commands.clear()
+            self._flush_ui()
+            self.opened.emit(False)
+
+    @Slot(int, str)
+    def write_line(self, seq: int, line: str):
+        if not self._serial.isOpen():
+            self.error.emit("Serial not open. Call connectPort() first.")
+            return
+        self.commands.submit(seq, line, time.monotonic())
+
+    def _write_raw(self, line: str):
+        self._serial.write((line + "\r\n").encode("utf-8"))  # matches echo -ne "PING\r\n"
+
+    def _pump_commands(self):
+        if self.commands.in_flight or self.commands.pending:
+            self.commands.pump(time.monotonic())
+
+    def _on_command_failed(self, cmd: Command, reason: str):
+        self.commandFailed.emit(cmd.seq, cmd.line, reason)
+
     def _on_ready_read(self):
         """
         Handle incoming serial data when readyRead signal is emitted.
         
-        Reads all available data from the serial port, buffers it, and processes
-        complete lines (terminated by newline). Each complete line is decoded from
-        UTF-8, stripped of carriage return characters, and emitted via the
-        lineReceived signal for processing by QML or other handlers.
+        Reads all available data from the serial port into the telemetry decoder,
+        which splits it into complete text lines and binary sample frames. Text
+        STREAM lines are parsed into samples here as well, so only command and
+        status lines are queued for the UI as text.
         
-        Uses a buffer to handle partial lines that may arrive across multiple
-        read operations.
+        Partial lines/frames stay in the decoder's buffer until the rest arrives.
         """
-        data = bytes(self._serial.readAll())
+        data = self._serial.readAll().data()
 
         # View raw data for debugging
         #if data:
         #    print("RAW RX:", data)   # 🔍 DEBUG — keep this for now
-        
-        self._rx.extend(data)
 
+        lines, samples = self._rx.feed(data)
+        now = time.monotonic()
+
+        for text in lines:
+            #print("RX LINE:", text)   # 🔍 DEBUG
+            sample = parse_stream_line(text)
+            if sample is not None:
+                samples.append(sample)
+            else:
+                self.commands.on_line(text, now)
+                self._pending_lines.append(text)
+
+        if samples:
+            self.samplesDecoded.emit(samples)
+            self._pending_samples.extend(samples)
+
+    def _flush_ui(self):
+        if self._pending_lines:
+            lines, self._pending_lines = self._pending_lines, []
+            self.linesReady.emit(lines)
+        if self._pending_samples:
+            samples, self._pending_samples = self._pending_samples, []
+            self.samplesReady.emit(samples)
+
+
+class SampleUplink:
+    """
+    Forwards decoded samples for the active run to the backend recorder
+    (POST /runs/{id}/samples) from a background thread.
+
+    push() is called on the serial I/O thread and only enqueues, so a slow or
+    restarting backend never stalls serial reads. While the backend cannot be
+    reached a batch is kept and retried, backing off up to RETRY_MAX_DELAY_S.
+    A batch the backend rejects (4xx) is dropped; one that keeps failing with
+    a server error is dropped after MAX_SERVER_ERRORS attempts.
+    """
+
+    POST_INTERVAL_S = 0.2
+    RETRY_DELAY_S = 1.0
+    RETRY_MAX_DELAY_S = 10.0
+    MAX_SERVER_ERRORS = 5
+    # empty batch posted when the device is quiet, as the run's heartbeat
+    HEARTBEAT_S = 5.0
+
+    def __init__(self, api_base: str):
+        self._api_base = api_base.rstrip("/")
+        self._client = None
+        self._queue = queue.Queue()
+        self._run_id = -1
+        self._thread = threading.Thread(target=self._loop, name="sample-uplink", daemon=True)
+        self._thread.start()
+
+    def start(self, run_id: int):
+        self._run_id = run_id
+
+    def set_client(self, client):
+        """Post through an in-process backend client (backend/inproc.py) instead of HTTP."""
+        self._client = client
+
+    def stop(self):
+        """Stop recording; the final batch closes the run's recorder."""
+        if self._run_id > 0:
+            self._queue.put((self._run_id, None))
+        self._run_id = -1
+
+    def push(self, samples: list):
+        run_id = self._run_id
+        if run_id > 0 and samples:
+            self._queue.put((run_id, samples))
+
+    def _loop(self):
         while True:
-            idx = self._rx.find(b"\n")
-            if idx < 0:
-                break
+            try:
+                run_id, samples = self._queue.get(timeout=self.HEARTBEAT_S)
+            except queue.Empty:
+                if self._run_id > 0:
+                    self._post_until_ok(self._run_id, [], False, heartbeat=True)
+                continue
+            batch = [] if samples is None else list(samples)
+            final = samples is None
 
-            line = self._rx[:idx]
-            del self._rx[:idx + 1]
+            # gather whatever else arrived for the same run within the interval
+            deadline = time.monotonic() + self.POST_INTERVAL_S
+            while not final:
+                try:
+                    nxt_run, nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt_run != run_id:
+                    self._post_until_ok(run_id, batch, False)
+                    run_id, batch = nxt_run, []
+                if nxt is None:
+                    final = True
+                else:
+                    batch.extend(nxt)
 
-            text = line.decode("utf-8", errors="replace").rstrip("\r")
-            #print("RX LINE:", text)   # 🔍 DEBUG
+            self._post_until_ok(run_id, batch, final)
+
+    def _post_until_ok(self, run_id: int, batch: list, final: bool, heartbeat: bool = False):
+        if not batch and not final and not heartbeat:
+            return
+        path = f"/runs/{run_id}/samples" + ("?final=true" if final else "")
+        if self._client is not None:
+            send = lambda: self._client.call("POST", path, {"samples": batch})[0]
+        else:
+            body = json.dumps({"samples": batch}).encode("utf-8")
+            send = lambda: self._http_post(self._api_base + path, body)
+
+        delay = self.RETRY_DELAY_S
+        server_errors = 0
+        while True:
+            status = send()
+            if status is not None and 200 <= status < 300:
+                return
+            if status is not None and status < 500:
+                # rejected (run gone, invalid batch): retrying cannot help
+                log.warning("Sample uplink: run %s rejected %d samples (HTTP %s), dropping them",
+                            run_id, len(batch), status)
+                return
+            if heartbeat:
+                return      # the next one follows soon enough
+            if status is not None:
+                server_errors += 1
+                if server_errors >= self.MAX_SERVER_ERRORS:
+                    log.error("Sample uplink: run %s failed %d times (HTTP %s), dropping %d samples",
+                              run_id, server_errors, status, len(batch))
+                    return
+            # unreachable backend (restarting): keep the batch, back off
+            time.sleep(delay)
+            delay = min(delay * 2, self.RETRY_MAX_DELAY_S)
+
+    @staticmethod
+    def _http_post(url: str, body: bytes):
+        """POST body; returns the HTTP status, or None if the backend could not be reached."""
+        req = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=5) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return None
+
+
+class SerialController(QObject):
+    connectedChanged = Signal()
+    lineReceived = Signal(str)
+    samplesReceived = Signal(list)   # batch of (t, pos, force, temp) tuples, at most ~30 Hz
+    error = Signal(str)
+    commandFailed = Signal(int, str, str)   # seq, command line, reason ("timeout" or the ERR reply)
+
+    # requests to the worker (queued across threads)
+    _configureRequested = Signal(str, int)
+    _openRequested = Signal()
+    _closeRequested = Signal()
+    _writeRequested = Signal(int, str)
+
+    def __init__(self):
+        """
+        Initialize the SerialController with default serial port settings.
+        
+        Sets up the serial port connection with default values:
+        - Port: /dev/ttyAMA3 (Raspberry Pi GPIO UART)
+        - Baud rate: 115200
+        - Data bits: 8
+        - Parity: None
+        - Stop bits: 1
+        - Flow control: None
+        
+        The port itself is owned by a SerialWorker running on its own QThread;
+        this object stays on the GUI thread and forwards commands to it.
+        Binary telemetry framing is off by default (see binaryTelemetry).
+        FRICTIONTESTER_SERIAL_PORT overrides the default port, e.g. to point the
+        app at the simulator in tools/esp32_sim.py.
+        """
+        super().__init__()
+        self._port_name = os.environ.get("FRICTIONTESTER_SERIAL_PORT", "/dev/ttyAMA3")
+        self._baud = 115200
+        self._binary = False
+        self._connected = False
+        self._seq = itertools.count(1)
+
+        self._thread = QThread()
+        self._thread.setObjectName("serial-io")
+        self._worker = SerialWorker()
+        self._worker.moveToThread(self._thread)
+
+        self._configureRequested.connect(self._worker.configure)
+        self._openRequested.connect(self._worker.open_port, Qt.BlockingQueuedConnection)
+        self._closeRequested.connect(self._worker.close_port, Qt.BlockingQueuedConnection)
+        self._writeRequested.connect(self._worker.write_line)
+
+        self._worker.opened.connect(self._on_opened)
+        self._worker.linesReady.connect(self._on_lines)
+        self._worker.samplesReady.connect(self.samplesReceived)
+        self._worker.error.connect(self.error)
+        self._worker.commandFailed.connect(self._on_command_failed)
+
+        # samples for the active run go to the backend recorder off the GUI thread
+        self._uplink = SampleUplink(os.environ.get("FRICTIONTESTER_API_BASE", "http://127.0.0.1:8080"))
+        self._worker.samplesDecoded.connect(self._uplink.push, Qt.DirectConnection)
+
+        self._thread.start()
+        self._apply_settings()
+
+    def set_backend_client(self, client):
+        """Send recorded samples through an in-process backend client instead of HTTP."""
+        self._uplink.set_client(client)
+
+    @property
+    def worker(self) -> SerialWorker:
+        """The I/O worker; connect to worker.samplesDecoded to see every sample off the GUI thread."""
+        return self._worker
+
+    def shutdown(self):
+        """Close the port and stop the I/O thread (call before the app exits)."""
+        if self._thread.isRunning():
+            self._closeRequested.emit()
+            self._thread.quit()
+            self._thread.wait()
 
+    def _apply_settings(self):
+        """
+        Push the current port name and baud rate to the worker.
+        
+        Called whenever port settings change.
+        """
+        self._configureRequested.emit(self._port_name, self._baud)
+
+    def _on_opened(self, ok: bool):
+        if self._connected != ok:
+            self._connected = ok
+            self.connectedChanged.emit()
+
+    def _on_command_failed(self, seq: int, line: str, reason: str):
+        self.commandFailed.emit(seq, line, reason)
+        self.error.emit(f"Command {seq} failed ({reason}): {line}")
+
+    def _on_lines(self, lines: list):
+        for text in lines:
             self.lineReceived.emit(text)
 
     def get_connected(self):
@@ -89,7 +401,7 @@ class SerialController(QObject):
         Returns:
             bool: True if the serial port is open, False otherwise.
         """
-        return self._serial.isOpen()
+        return self._connected
 
     connected = Property(bool, get_connected, notify=connectedChanged)
 
@@ -115,7 +427,7 @@ class SerialController(QObject):
         if self._port_name == v:
             return
         self._port_name = v
-        if self._serial.isOpen():
+        if self._connected:
             self.disconnectPort()
         self._apply_settings()
         self.portNameChanged.emit()
@@ -145,7 +457,7 @@ class SerialController(QObject):
         if self._baud == v:
             return
         self._baud = int(v)
-        if self._serial.isOpen():
+        if self._connected:
             self.disconnectPort()
         self._apply_settings()
         self.baudRateChanged.emit()
@@ -153,27 +465,53 @@ class SerialController(QObject):
     baudRateChanged = Signal()
     baudRate = Property(int, get_baudRate, set_baudRate, notify=baudRateChanged)
 
+    def get_binaryTelemetry(self):
+        """
+        Get whether streams are requested in binary framed mode.
+        
+        Returns:
+            bool: True if start_stream asks the ESP32 for binary frames.
+        """
+        return self._binary
+
+    def set_binaryTelemetry(self, v):
+        """
+        Enable or disable binary framed telemetry for subsequent streams.
+        
+        Text command/response lines keep working in either mode; only the
+        stream format requested by start_stream changes.
+        
+        Args:
+            v (bool): True to request binary frames, False for text.
+        """
+        v = bool(v)
+        if self._binary == v:
+            return
+        self._binary = v
+        self.binaryTelemetryChanged.emit()
+
+    binaryTelemetryChanged = Signal()
+    binaryTelemetry = Property(bool, get_binaryTelemetry, set_binaryTelemetry, notify=binaryTelemetryChanged)
+
     @Slot(result=bool)
     def connectPort(self):
         """
         Open and connect to the serial port.
         
-        Attempts to open the serial port in ReadWrite mode. If the port is
-        already open, returns True immediately. Emits error signal if connection
-        fails, and connectedChanged signal in all cases.
+        Attempts to open the serial port in ReadWrite mode on the I/O thread and
+        waits for the result. If the port is already open, returns True
+        immediately. Emits error signal if connection fails, and
+        connectedChanged signal in all cases.
         
         Returns:
             bool: True if connection was successful or already connected,
                   False if connection failed.
         """
-        if self._serial.isOpen():
+        if self._connected:
             return True
-        ok = self._serial.open(QSerialPort.ReadWrite)
- 
-        #print("OPEN OK?", ok, "ERR:", self._serial.errorString())
-
-        if not ok:
-            self.error.emit(self._serial.errorString())
+        self._openRequested.emit()
+        ok = self._worker.last_open_ok
+        self._connected = ok
         self.connectedChanged.emit()
         return ok
 
@@ -185,26 +523,64 @@ class SerialController(QObject):
         Closes the serial port if it is currently open and emits the
         connectedChanged signal to notify listeners of the disconnection.
         """
-        if self._serial.isOpen():
-            self._serial.close()
+        if self._connected:
+            self._closeRequested.emit()
+            self._connected = False
             self.connectedChanged.emit()
 
-    @Slot(str)
+    @Slot(str, result=int)
     def send_cmd(self, cmd: str):
         """
         Send a command string to the serial port.
         
-        Encodes the command as UTF-8 and appends "\r\n" (carriage return + newline)
-        to match the expected command format. Emits an error signal if the port
-        is not open.
+        The line is handed to the I/O thread's command scheduler, which sends
+        it (UTF-8, terminated with "\r\n") when the in-flight window allows,
+        coalescing it with a queued command it supersedes. ESTOP, ABORT_JOB
+        and TEST_STOP jump the queue. Emits an error signal if the port is not
+        open, and commandFailed if the command times out or is rejected.
         
         Args:
             cmd (str): The command string to send (without line endings).
+        
+        Returns:
+            int: The command's sequence number, or -1 if the port is not open.
         """
-        if not self._serial.isOpen():
+        if not self._connected:
             self.error.emit("Serial not open. Call connectPort() first.")
-            return
-        self._serial.write((cmd + "\r\n").encode("utf-8"))  # matches echo -ne "PING\r\n"
+            return -1
+        seq = next(self._seq)
+        self._writeRequested.emit(seq, cmd)
+        return seq
+
+    @Slot(result="QVariantMap")
+    def commandMetrics(self):
+        """
+        Per-command counters and latency from the command scheduler.
+        
+        Returns:
+            dict: {"pending", "in_flight", "commands": {NAME: {"sent", "acked",
+                  "errors", "timeouts", "retries", "coalesced", "dropped",
+                  "latency_ms": {...}, "queue_ms": {...}}}}. Latencies are
+                  send -> reply and submit -> send, in milliseconds.
+        """
+        return self._worker.commands.metrics()
+
+    @Slot(int)
+    def recordRun(self, run_id: int):
+        """
+        Start forwarding stream samples to the backend recorder for a run.
+        
+        Args:
+            run_id (int): The backend run id (from POST /runs).
+        """
+        self._uplink.start(run_id)
+
+    @Slot()
+    def stopRecording(self):
+        """
+        Stop forwarding samples; the backend commits and closes the run's data.
+        """
+        self._uplink.stop()
 
     @Slot()
     def sendPing(self):
@@ -328,10 +704,16 @@ class SerialController(QObject):
         """
         Start streaming data from the ESP32 at a specified rate.
         
+        When binaryTelemetry is enabled the stream is requested as framed
+        binary records (format=bin), delivered through samplesReceived.
+        
         Args:
             rate_hz (int): Streaming rate in Hertz (updates per second).
         """
-        self.send_cmd(f"CMD START_STREAM rate_hz={rate_hz}")
+        if self._binary:
+            self.send_cmd(f"CMD START_STREAM rate_hz={rate_hz} format=bin")
+        else:
+            self.send_cmd(f"CMD START_STREAM rate_hz={rate_hz}")
 
     @Slot()
     def stop_stream(self):
@@ -420,7 +802,198 @@ class SerialController(QObject):
         """Stop jogging the specified axis."""
         self.send_cmd(f"CMD JOG_STOP axis={axis}")
 
+def log_backend_to(path: str):
+    """
+    Send the backend's log messages to a file, as run_pi.sh does for a
+    separate backend process (logs/backend.log).
+
+    Args:
+        path: Log file; its folder is created if needed.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger("backend")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+class InProcessBackend(QObject):
+    """
+    The backend running inside the UI process (FRICTIONTESTER_BACKEND=inprocess).
+
+    Exposed to QML as "inProcessBackend". request() takes the same method,
+    path and body as the HTTP API and returns a request id at once; the call
+    runs on a worker thread through backend/inproc.py (same endpoint code,
+    no HTTP or JSON) and its outcome arrives as replied(id, ok, status, data).
+
+    The backend (its imports, schema migrations, run recovery) starts on a
+    worker thread too, so it doesn't hold up the first frame; ready turns
+    true once it has, or failed (with error) if it could not start. With
+    http_port set the HTTP API is also served, for remote clients.
+    """
+
+    WORKERS = 2
+
+    readyChanged = Signal()
+    failedChanged = Signal()
+    replied = Signal(int, bool, int, "QVariant")   # request id, ok, HTTP status, data
+    _started = Signal(object)
+    _startFailed = Signal(str)
+
+    def __init__(self, http_host: str = "127.0.0.1", http_port: int = 8080):
+        super().__init__()
+        self._client = None
+        self._ready = False
+        self._error = ""
+        self._ids = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix="backend")
+        self._started.connect(self._on_started)
+        self._startFailed.connect(self._on_start_failed)
+        self._pool.submit(self._start, http_host, http_port)
+
+    def _start(self, http_host: str, http_port: int):
+        try:
+            from backend.inproc import InProcessClient, start_backend
+            start_backend(http_host, http_port)
+            self._started.emit(InProcessClient())
+        except Exception as e:
+            log.exception("In-process backend failed to start")
+            self._startFailed.emit(f"{type(e).__name__}: {e}")
+
+    @Slot(object)
+    def _on_started(self, client):
+        self._client = client
+        self._ready = True
+        self.readyChanged.emit()
+
+    @Slot(str)
+    def _on_start_failed(self, error: str):
+        self._error = error
+        self.failedChanged.emit()
+
+    @property
+    def client(self):
+        """The backend/inproc.py client, once ready (None before)."""
+        return self._client
+
+    @Property(bool, notify=readyChanged)
+    def ready(self):
+        return self._ready
+
+    @Property(bool, notify=failedChanged)
+    def failed(self):
+        return bool(self._error)
+
+    @Property(str, notify=failedChanged)
+    def error(self):
+        """Why the backend could not start ("" unless failed)."""
+        return self._error
+
+    @Slot(str, str, "QVariant", result=int)
+    def request(self, method: str, path: str, body) -> int:
+        """
+        Start an API call; the result is delivered through replied.
+
+        Args:
+            method (str): HTTP method, e.g. "GET".
+            path (str): API path with query string, e.g. "/runs?limit=50".
+            body: Request body (a JS object), or null.
+
+        Returns:
+            int: Request id, matched by the replied signal.
+        """
+        if isinstance(body, QJSValue):
+            body = body.toVariant()
+        req_id = next(self._ids)
+        self._pool.submit(self._call, req_id, method, path, body)
+        return req_id
+
+    def _call(self, req_id: int, method: str, path: str, body):
+        if self._client is None:
+            detail = f"Backend failed to start: {self._error}" if self._error else "Backend not ready"
+            self.replied.emit(req_id, False, 503, {"detail": detail})
+            return
+        try:
+            status, data = self._client.call(method, path, body)
+        except Exception as e:
+            status, data = 500, {"detail": str(e)}
+        self.replied.emit(req_id, 200 <= status < 300, status, data)
+
+    def shutdown(self):
+        """Finish pending calls and stop the backend (call before the app exits)."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._ready:
+            from backend.inproc import stop_backend
+            stop_backend()
+
+
+class StartupReport(QObject):
+    """
+    Times the kiosk's cold start and writes one line to logs/startup.log.
+
+    Marks are seconds since _BOOT_T0 (the top of main.py). main() marks the
+    Qt imports, application/engine creation and the QML load; the first
+    frame on screen is taken from the window, and QML marks backend_ready
+    once /health first answers. The report is written when both the first
+    frame and the backend are in, or after REPORT_TIMEOUT_MS regardless.
+    """
+
+    REPORT_TIMEOUT_MS = 20000
+
+    def __init__(self, log_path: str):
+        super().__init__()
+        self._log_path = log_path
+        self._marks = {}
+        self._written = False
+        self._timeout = QTimer(self)
+        self._timeout.setSingleShot(True)
+        self._timeout.timeout.connect(self.write)
+
+    @Slot(str)
+    def mark(self, name: str):
+        """
+        Record a startup mark (only its first occurrence counts).
+
+        Args:
+            name (str): Mark name, e.g. "first_frame" or "backend_ready".
+        """
+        if name in self._marks:
+            return
+        self._marks[name] = time.monotonic() - _BOOT_T0
+        if name == "first_frame":
+            self._timeout.start(self.REPORT_TIMEOUT_MS)
+        if "first_frame" in self._marks and "backend_ready" in self._marks:
+            self.write()
+
+    def watch_window(self, window: QQuickWindow):
+        """Mark first_frame when `window` first presents a frame."""
+        def _first_frame():
+            window.frameSwapped.disconnect(_first_frame)
+            self.mark("first_frame")
+        window.frameSwapped.connect(_first_frame)
+
+    @Slot()
+    def write(self):
+        if self._written:
+            return
+        self._written = True
+        self._timeout.stop()
+        line = "startup " + " ".join(f"{k}={v:.3f}s" for k, v in self._marks.items())
+        if "backend_ready" not in self._marks:
+            line += " backend_ready=pending"
+        log.info(line)
+        try:
+            os.makedirs(os.path.dirname(self._log_path), exist_ok=True)
+            with open(self._log_path, "a") as f:
+                f.write(time.strftime("%Y-%m-%dT%H:%M:%S ") + line + "\n")
+        except OSError as e:
+            log.warning("Could not write startup report: %s", e)
+
+
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     # Kiosk settings (optional)
     os.environ.setdefault("QT_QPA_PLATFORM", "eglfs")
     os.environ.setdefault("QT_QPA_EGLFS_HIDECURSOR", "1")
@@ -433,18 +1006,43 @@ def main():
         os.path.join(project_dir, "qmlmodules"),
     ]
     os.environ["QML_IMPORT_PATH"] = ":".join(qml_imports)
+    # Compiled QML is cached across boots; keep it with the app rather than
+    # in $HOME, which may be read-only or tmpfs on a kiosk image.
+    os.environ.setdefault("QML_DISK_CACHE_PATH", os.path.join(project_dir, ".qmlcache"))
+
+    report = StartupReport(os.path.join(project_dir, "logs", "startup.log"))
+    report.mark("imports")
 
     app = QGuiApplication(sys.argv)
     engine = QQmlApplicationEngine()
+    report.mark("engine")
 
     serial = SerialController()
+    app.aboutToQuit.connect(serial.shutdown)
     engine.rootContext().setContextProperty("serialController", serial)
 
+    # FRICTIONTESTER_BACKEND=inprocess: run the backend in this process; the
+    # HTTP API stays up on FRICTIONTESTER_HTTP_PORT (0 = off) for remote clients
+    if os.environ.get("FRICTIONTESTER_BACKEND") == "inprocess":
+        log_backend_to(os.path.join(project_dir, "logs", "backend.log"))
+        backend = InProcessBackend(
+            http_host=os.environ.get("FRICTIONTESTER_HTTP_HOST", "127.0.0.1"),
+            http_port=int(os.environ.get("FRICTIONTESTER_HTTP_PORT", "8080") or 0),
+        )
+        backend.readyChanged.connect(lambda: serial.set_backend_client(backend.client))
+        app.aboutToQuit.connect(backend.shutdown)
+        engine.rootContext().setContextProperty("inProcessBackend", backend)
+    engine.rootContext().setContextProperty("startupReport", report)
+
     app_qml = os.path.join(project_dir, "content", "App.qml")
     engine.load(QUrl.fromLocalFile(app_qml))
 
     if not engine.rootObjects():
         return 1
+    report.mark("qml_loaded")
+    window = engine.rootObjects()[0]
+    if isinstance(window, QQuickWindow):
+        report.watch_window(window)
 
     return app.exec()
 
@@ -26,48 +26,53 @@ fi
 # =============================
 # Backend (FastAPI)
 # =============================
+# The backend and the UI boot in parallel: the UI comes up at once and
+# queues its requests until /health answers (pythonBackend in NavShell.qml).
+#
+# FRICTIONTESTER_BACKEND=external skips starting it here, for when it runs
+# as its own (e.g. socket-activated systemd) service on 127.0.0.1:8080.
+# FRICTIONTESTER_BACKEND=inprocess runs it inside the UI process instead
+# (see InProcessBackend in main.py); the HTTP API is still served there.
 mkdir -p "$PWD/logs"
 BACKEND_LOG="$PWD/logs/backend.log"
+BACKEND_PIDFILE="$PWD/logs/backend.pid"
 
-# kill anything already using 8080
-PID=$(ss -ltnp 2>/dev/null | awk '/:8080/ {print $NF}' | sed -n 's/.*pid=\([0-9]\+\).*/\1/p' | head -n 1)
-if [ -n "$PID" ]; then
-  echo "▶ Killing process on 8080 (pid=$PID)"
-  sudo kill -9 "$PID" 2>/dev/null || true
-fi
-
-sleep 0.3
+stop_backend() {
+  local pid="$1"
+  [ -n "$pid" ] || return 0
+  kill "$pid" 2>/dev/null || return 0
+  # give uvicorn time to run the shutdown hooks (job pool, run journal)
+  for i in {1..20}; do
+    kill -0 "$pid" 2>/dev/null || return 0
+    sleep 0.1
+  done
+  kill -9 "$pid" 2>/dev/null || true
+}
 
-# start backend
-nohup python -m uvicorn backend.api:app \
-  --host 127.0.0.1 \
-  --port 8080 \
-  > "$BACKEND_LOG" 2>&1 &
-
-BACKEND_PID=$!
+# a backend left over from a previous session
+if [ -f "$BACKEND_PIDFILE" ]; then
+  OLD_PID=$(cat "$BACKEND_PIDFILE")
+  if [ -n "$OLD_PID" ] && ps -p "$OLD_PID" -o args= 2>/dev/null | grep -q "backend.api:app"; then
+    echo "▶ Stopping previous backend (pid=$OLD_PID)"
+    stop_backend "$OLD_PID"
+  fi
+  rm -f "$BACKEND_PIDFILE"
+fi
 
-# stop backend when UI exits (TERM then KILL)
-trap "echo '▶ Stopping backend (pid=$BACKEND_PID)'; kill $BACKEND_PID 2>/dev/null || true; sleep 0.2; kill -9 $BACKEND_PID 2>/dev/null || true" EXIT
+if [ "${FRICTIONTESTER_BACKEND:-local}" = "local" ]; then
+  nohup python -m uvicorn backend.api:app \
+    --host 127.0.0.1 \
+    --port 8080 \
+    > "$BACKEND_LOG" 2>&1 &
 
-# wait for backend to be ready (retry up to ~6 seconds)
-OK=0
-for i in {1..24}; do
-  if curl -s http://127.0.0.1:8080/health >/dev/null 2>&1; then
-    OK=1
-    break
-  fi
-  sleep 0.25
-done
+  BACKEND_PID=$!
+  echo "$BACKEND_PID" > "$BACKEND_PIDFILE"
+  echo "▶ Backend starting (pid=$BACKEND_PID, log: $BACKEND_LOG)"
 
-if [ "$OK" -ne 1 ]; then
-  echo "❌ Backend didn't start. Last 200 lines:"
-  tail -n 200 "$BACKEND_LOG" || true
-  echo "Port 8080 status:"
-  ss -ltnp | grep ':8080' || true
-  exit 1
+  # stop backend when UI exits
+  trap "echo '▶ Stopping backend (pid=$BACKEND_PID)'; stop_backend $BACKEND_PID; rm -f '$BACKEND_PIDFILE'" EXIT
 fi
 
-echo "✅ Backend OK"
-
 # ---- UI ----
-exec python3 "$PWD/main.py"
+# not exec: the EXIT trap above must outlive the UI
+python3 "$PWD/main.py"
@@ -0,0 +1,452 @@
+# esp32_sim.py
+"""
+Software stand-in for the ESP32 motion/telemetry controller.
+
+Opens a pseudo-terminal that behaves like the rig's UART: it answers the
+`CMD ...` grammar sent by SerialController (main.py), walks through the
+TEST_PREP / TEST_START state machine NavShell expects (PREP_COMPLETE,
+RUN_COMPLETE, INIT_ERROR) and streams friction telemetry as text STREAM
+lines or binary frames (backend/telemetry.py) at up to several kHz.
+With --replay it streams a recorded run instead, at --speed times real time.
+
+    python -m tools.esp32_sim --link /tmp/ttyESP32 --baud 0
+    FRICTIONTESTER_SERIAL_PORT=/tmp/ttyESP32 python main.py
+
+--baud emulates the UART's byte rate (0 = as fast as the reader drains the
+pty). Telemetry that does not fit the output buffer is dropped and counted,
+like a real UART overrun; command replies are never dropped.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import pty
+import select
+import signal
+import sys
+import time
+import tty
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.telemetry import FRAME_SAMPLES, MAX_PAYLOAD, SAMPLE, encode_frame
+
+G_TO_N = 9.80665e-3
+
+# Binary record layout, matching telemetry.SAMPLE (<dfff)
+SAMPLE_DTYPE = np.dtype([("t", "<f8"), ("pos", "<f4"), ("force", "<f4"), ("temp", "<f4")])
+SAMPLES_PER_FRAME = MAX_PAYLOAD // SAMPLE.size
+
+TICK_S = 0.005
+OUT_BUFFER_BYTES = 64 * 1024
+
+
+def parse_command(line: str) -> Tuple[str, Dict[str, str]]:
+    """'CMD NAME k=v k=v' -> ('NAME', {k: v}); other lines -> (line, {})."""
+    parts = line.split()
+    if not parts:
+        return "", {}
+    if parts[0] != "CMD" or len(parts) < 2:
+        return parts[0], {}
+    args = {}
+    for tok in parts[2:]:
+        k, _, v = tok.partition("=")
+        args[k] = v
+    return parts[1], args
+
+
+def load_session(path: Path) -> np.ndarray:
+    """
+    Load a recorded session for replay: a run directory (column files) or a
+    CSV export (t_s, position_mm, force_n, temp_c). Returns SAMPLE_DTYPE rows.
+    """
+    path = Path(path)
+    if path.is_dir():
+        from backend.recorder import open_columns
+        cols = open_columns(path)
+        out = np.empty(len(cols["t"]), dtype=SAMPLE_DTYPE)
+        for name in SAMPLE_DTYPE.names:
+            out[name] = cols[name]
+        return out
+    data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    out = np.empty(len(data), dtype=SAMPLE_DTYPE)
+    for i, name in enumerate(SAMPLE_DTYPE.names):
+        out[name] = data[:, i]
+    return out
+
+
+class FrictionModel:
+    """
+    Reciprocating sled: triangle-wave position over the stroke at the test
+    speed, kinetic friction opposing motion with a static-friction spike after
+    each reversal, sensor noise, and water temperature easing to its setpoint.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.mu_s = 0.45
+        self.mu_k = 0.30
+        self.noise_n = 0.01
+        self.temp = 22.0
+        self.temp_setpoint = 22.0
+        self.reset(speed_mm_s=0.0, stroke_mm=0.0, clamp_force_g=0.0)
+
+    def reset(self, speed_mm_s: float, stroke_mm: float, clamp_force_g: float) -> None:
+        self.speed = speed_mm_s
+        self.stroke = stroke_mm
+        self.normal_n = clamp_force_g * G_TO_N
+        self.travel = 0.0               # mm travelled since TEST_START
+
+    @property
+    def cycles_done(self) -> int:
+        if self.stroke <= 0:
+            return 0
+        return int(self.travel // (2 * self.stroke))
+
+    def step(self, t: np.ndarray, moving: bool, dt: float) -> np.ndarray:
+        n = len(t)
+        out = np.empty(n, dtype=SAMPLE_DTYPE)
+        out["t"] = t
+
+        if moving and self.stroke > 0 and self.speed > 0:
+            travel = self.travel + self.speed * dt * np.arange(1, n + 1) / n
+            phase = np.mod(travel, 2 * self.stroke)
+            forward = phase < self.stroke
+            pos = np.where(forward, phase, 2 * self.stroke - phase)
+            # distance since the last reversal drives the breakaway spike
+            since = np.mod(travel, self.stroke)
+            spike = (self.mu_s - self.mu_k) * np.exp(-since / max(self.stroke * 0.03, 0.1))
+            force = np.where(forward, 1.0, -1.0) * (self.mu_k + spike) * self.normal_n
+            self.travel = float(travel[-1])
+        else:
+            phase = math.fmod(self.travel, 2 * self.stroke) if self.stroke > 0 else 0.0
+            pos = np.full(n, phase if phase < self.stroke else 2 * self.stroke - phase)
+            force = np.zeros(n)
+
+        out["pos"] = pos
+        out["force"] = force + self.rng.normal(0.0, self.noise_n, n)
+
+        # first-order approach to the setpoint, ~30 s time constant
+        self.temp += (self.temp_setpoint - self.temp) * min(dt / 30.0, 1.0)
+        out["temp"] = self.temp + self.rng.normal(0.0, 0.02, n)
+        return out
+
+
+class SimDevice:
+    """
+    Command handling and telemetry generation, independent of the transport.
+    handle_line() consumes one command line; tick() advances the clock and
+    returns telemetry due since the last tick. Replies accumulate in replies.
+    """
+
+    def __init__(self, prep_s: float = 1.0, fail_prep: bool = False,
+                 replay: Optional[np.ndarray] = None, speed: float = 1.0, seed: int = 0):
+        self.model = FrictionModel(np.random.default_rng(seed))
+        self.prep_s = prep_s
+        self.fail_prep = fail_prep
+        self.replay = replay
+        self.replay_speed = speed
+        self.replies: List[str] = []
+
+        self.clock0 = time.monotonic()
+        self.state = "IDLE"             # IDLE, PREP, READY, RUNNING, PAUSED, ESTOP
+        self.estop = False
+        self.target_cycles = 0
+        self._prep_done_at: Optional[float] = None
+
+        self.stream_hz = 0
+        self.stream_bin = False
+        self._next_t = 0.0              # device time of the next stream sample
+        self._model_t = 0.0
+
+        self._replay_pos = 0
+        self._replay_t0 = 0.0           # device time when replay (re)started
+
+        self.samples_sent = 0
+
+    def now(self) -> float:
+        return time.monotonic() - self.clock0
+
+    # ---- commands ----
+
+    def handle_line(self, line: str) -> None:
+        name, args = parse_command(line.strip())
+        if not name:
+            return
+        if name == "PING":
+            self.replies.append("PONG")
+            return
+        if not line.startswith("CMD "):
+            self.replies.append(f"ERR unknown {name}")
+            return
+
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            # motion/IO commands the rig accepts without a visible result here
+            self.replies.append(f"ACK {name}")
+            return
+        try:
+            handler(args)
+        except (KeyError, ValueError) as e:
+            self.replies.append(f"ERR {name} bad_args {e}")
+
+    def _cmd_get_status(self, args) -> None:
+        self.replies.append(
+            f"STATUS state={self.state} estop={int(self.estop)} cycles={self.model.cycles_done} "
+            f"temp={self.model.temp:.2f} stream_hz={self.stream_hz}"
+        )
+
+    def _cmd_clear_fault(self, args) -> None:
+        self.replies.append("ACK CLEAR_FAULT")
+        if self.state == "ESTOP" and not self.estop:
+            self.state = "IDLE"
+
+    def _cmd_estop(self, args) -> None:
+        self.estop = args.get("state", "1") == "1"
+        self.replies.append("ACK ESTOP")
+        if self.estop:
+            self.state = "ESTOP"
+            self.replies.append("FAULT ESTOP")
+
+    def _cmd_test_prep(self, args) -> None:
+        self.replies.append("ACK TEST_PREP")
+        if self.estop:
+            self.replies.append("INIT_ERROR estop_active")
+            return
+        self.state = "PREP"
+        self._prep_done_at = self.now() + self.prep_s
+
+    def _cmd_test_start(self, args) -> None:
+        if self.estop:
+            self.replies.append("ERR TEST_START estop_active")
+            return
+        self.model.reset(
+            speed_mm_s=float(args["speed"]) * 10.0,        # cm/s -> mm/s
+            stroke_mm=float(args["stroke_length"]),
+            clamp_force_g=float(args["clamp_force"]),
+        )
+        self.model.temp_setpoint = float(args.get("water_temp", self.model.temp_setpoint))
+        self.target_cycles = int(args["cycles"])
+        self.state = "RUNNING"
+        self._replay_pos = 0
+        self._replay_t0 = self.now()
+        self.replies.append("ACK TEST_START")
+
+    def _cmd_test_pause(self, args) -> None:
+        self.replies.append("ACK TEST_PAUSE")
+        if self.state == "RUNNING":
+            self.state = "PAUSED"
+        elif self.state == "PAUSED":
+            self.state = "RUNNING"
+
+    def _cmd_test_stop(self, args) -> None:
+        self.replies.append("ACK TEST_STOP")
+        if self.state in {"RUNNING", "PAUSED"}:
+            self.state = "READY"
+
+    def _cmd_abort_job(self, args) -> None:
+        self.replies.append("ACK ABORT_JOB")
+        if self.state in {"RUNNING", "PAUSED"}:
+            self.state = "READY"
+
+    def _cmd_heater_set(self, args) -> None:
+        self.model.temp_setpoint = float(args["setpoint"])
+        self.replies.append("ACK HEATER_SET")
+
+    def _cmd_start_stream(self, args) -> None:
+        self.stream_hz = max(1, int(args.get("rate_hz", "100")))
+        self.stream_bin = args.get("format") == "bin"
+        self._next_t = self.now()
+        if self.replay is not None and self.state != "RUNNING":
+            self._replay_t0 = self.now()
+        self.replies.append("ACK START_STREAM")
+
+    def _cmd_stop_stream(self, args) -> None:
+        self.stream_hz = 0
+        self.replies.append("ACK STOP_STREAM")
+
+    # ---- clock ----
+
+    def tick(self) -> np.ndarray:
+        """Advance to now; return the telemetry rows due (possibly empty)."""
+        now = self.now()
+        if self.state == "PREP" and self._prep_done_at is not None and now >= self._prep_done_at:
+            self._prep_done_at = None
+            if self.fail_prep:
+                self.state = "IDLE"
+                self.replies.append("INIT_ERROR simulated_failure")
+            else:
+                self.state = "READY"
+                self.replies.append("PREP_COMPLETE")
+
+        if self.replay is not None:
+            return self._tick_replay(now)
+
+        rows = np.empty(0, dtype=SAMPLE_DTYPE)
+        moving = self.state == "RUNNING" and not self.estop
+        dt = now - self._model_t
+        self._model_t = now
+        if self.stream_hz and now >= self._next_t:
+            # every sample period that elapsed since the last tick, on a fixed grid
+            n = int((now - self._next_t) * self.stream_hz) + 1
+            t = self._next_t + np.arange(n) / self.stream_hz
+            self._next_t = float(t[-1]) + 1.0 / self.stream_hz
+            rows = self.model.step(t, moving, dt)
+        else:
+            self.model.step(np.array([now]), moving, dt)
+
+        if moving and self.target_cycles and self.model.cycles_done >= self.target_cycles:
+            self.state = "READY"
+            self.replies.append("RUN_COMPLETE")
+        return rows
+
+    def _tick_replay(self, now: float) -> np.ndarray:
+        data = self.replay
+        if not self.stream_hz or self._replay_pos >= len(data):
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        # session time reached at this replay speed
+        t_end = data["t"][0] + (now - self._replay_t0) * self.replay_speed
+        stop = int(np.searchsorted(data["t"], t_end, side="right"))
+        rows = data[self._replay_pos:stop]
+        self._replay_pos = stop
+        if stop >= len(data) and self.state == "RUNNING":
+            self.state = "READY"
+            self.replies.append("RUN_COMPLETE")
+        return rows
+
+    # ---- encoding ----
+
+    def encode(self, rows: np.ndarray) -> bytes:
+        if self.stream_bin:
+            raw = rows.tobytes()
+            step = SAMPLES_PER_FRAME * SAMPLE.size
+            return b"".join(encode_frame(FRAME_SAMPLES, raw[i:i + step]) for i in range(0, len(raw), step))
+        return "".join(
+            f"STREAM t={t:.4f} pos={p:.3f} force={f:.4f} temp={c:.2f}\r\n"
+            for t, p, f, c in rows.tolist()
+        ).encode()
+
+
+class PtyLink:
+    """Serves a SimDevice on a pty master; the slave path is what the app opens."""
+
+    def __init__(self, device: SimDevice, link: Optional[str], baud: int):
+        self.device = device
+        self.baud = baud
+        self.master, self._slave = pty.openpty()
+        tty.setraw(self._slave)     # no echo / line discipline, like a UART
+        os.set_blocking(self.master, False)
+        self.slave_path = os.ttyname(self._slave)
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.slave_path, link)
+
+        self._rx = bytearray()
+        self._out = bytearray()
+        self._budget = 0.0
+        self.dropped_samples = 0
+        self.bytes_sent = 0
+
+    def close(self) -> None:
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self._slave)
+
+    def _queue_replies(self) -> None:
+        dev = self.device
+        if dev.replies:
+            self._out += "".join(r + "\r\n" for r in dev.replies).encode()
+            dev.replies.clear()
+
+    def run(self, stop_after: Optional[float] = None, report_s: float = 0.0) -> None:
+        dev = self.device
+        t_start = last = last_report = time.monotonic()
+        sent_at_report = 0
+        while stop_after is None or time.monotonic() - t_start < stop_after:
+            r, w, _ = select.select([self.master], [self.master] if self._out else [], [], TICK_S)
+            if r:
+                try:
+                    self._rx += os.read(self.master, 4096)
+                except OSError:
+                    pass
+                while True:
+                    nl = self._rx.find(b"\n")
+                    if nl < 0:
+                        break
+                    line = self._rx[:nl].decode("utf-8", errors="replace").rstrip("\r")
+                    del self._rx[:nl + 1]
+                    dev.handle_line(line)
+
+            self._queue_replies()
+            rows = dev.tick()
+            self._queue_replies()
+            if len(rows):
+                if len(self._out) < OUT_BUFFER_BYTES:
+                    self._out += dev.encode(rows)
+                    dev.samples_sent += len(rows)
+                else:
+                    self.dropped_samples += len(rows)
+
+            now = time.monotonic()
+            if self._out:
+                limit = len(self._out)
+                if self.baud:
+                    # 10 bits per byte on the wire (start + 8 data + stop)
+                    self._budget = min(self._budget + (now - last) * self.baud / 10, self.baud / 10)
+                    limit = min(limit, int(self._budget))
+                if limit:
+                    try:
+                        n = os.write(self.master, self._out[:limit])
+                    except (BlockingIOError, OSError):
+                        n = 0
+                    del self._out[:n]
+                    self._budget -= n
+                    self.bytes_sent += n
+            last = now
+
+            if report_s and now - last_report >= report_s:
+                rate = (dev.samples_sent - sent_at_report) / (now - last_report)
+                print(f"[sim] state={dev.state} sent={dev.samples_sent} rate={rate:.0f}/s "
+                      f"dropped={self.dropped_samples} bytes={self.bytes_sent}", file=sys.stderr)
+                last_report, sent_at_report = now, dev.samples_sent
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Simulated ESP32 friction rig on a pty.")
+    ap.add_argument("--link", default="/tmp/ttyESP32", help="symlink to create for the pty slave ('' for none)")
+    ap.add_argument("--baud", type=int, default=0, help="emulated UART rate in bit/s (0 = unthrottled)")
+    ap.add_argument("--prep-s", type=float, default=1.0, help="seconds TEST_PREP takes")
+    ap.add_argument("--fail-prep", action="store_true", help="answer TEST_PREP with INIT_ERROR")
+    ap.add_argument("--replay", type=Path, help="run directory or CSV export to stream instead of the model")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--duration", type=float, help="exit after this many seconds")
+    ap.add_argument("--report", type=float, default=0.0, help="print throughput every N seconds")
+    args = ap.parse_args(argv)
+
+    replay = load_session(args.replay) if args.replay else None
+    device = SimDevice(prep_s=args.prep_s, fail_prep=args.fail_prep,
+                       replay=replay, speed=args.speed, seed=args.seed)
+    link = PtyLink(device, args.link or None, args.baud)
+    print(f"[sim] serving on {link.slave_path}" + (f" (-> {args.link})" if args.link else ""), flush=True)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        link.run(stop_after=args.duration, report_s=args.report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[sim] sent={device.samples_sent} dropped={link.dropped_samples} bytes={link.bytes_sent}",
+              file=sys.stderr)
+        link.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())